@@ -79,6 +79,10 @@ def read_from_h5(file_name, **kwargs):
         is present in the H5 file (which is not common) that value will override this argument.  If neither the file
         nor these parameters are present, defaults will be applied, assuming that the frame is inertial, R and M are
         both scaled out, and the data type (psi4, hdot, or h) can be gleaned from `file_name`.
+    dtype : numpy dtype, optional
+        Type of the data array in the returned waveform.  The default is `complex` (double precision); passing
+        `np.complex64` stores the data in single precision, halving the memory needed.  See `WaveformBase.astype`
+        for a discussion of the accuracy of single-precision data.
 
     """
 
@@ -92,6 +96,7 @@ def read_from_h5(file_name, **kwargs):
 
     # Initialize an empty object to be filled with goodies
     w = WaveformModes(constructor_statement='scri.SpEC.read_from_h5("{0}", **{1})'.format(file_name, kwargs))
+    dtype = kwargs.pop('dtype', complex)
 
     # Get an h5py handle to the desired part of the h5 file
     try:
@@ -213,7 +218,7 @@ def read_from_h5(file_name, **kwargs):
         n_times = len(w.t)
 
         # Loop through, setting data in each mode
-        w.data = np.empty((n_times, n_modes), dtype=complex)
+        w.data = np.empty((n_times, n_modes), dtype=dtype)
         for m, DataSet in enumerate(YLMdata):
             if f[DataSet].shape[0] != n_times:
                 raise ValueError("The number of time steps in this dataset should be {0}; ".format(n_times) +
@@ -285,7 +290,7 @@ def write_to_h5(w, file_name, file_write_mode='w'):
         for i_m in range(w.n_modes):
             ell, m = w.LM[i_m]
             Data_m = g.create_dataset("Y_l{0}_m{1}.dat".format(ell, m),
-                                      data=[[t, d.real, d.imag] for t, d in zip(w.t, w.data[:, i_m])],
+                                      data=np.column_stack((w.t, w.data[:, i_m].real, w.data[:, i_m].imag)),
                                       compression="gzip", shuffle=True)
             Data_m.attrs['ell'] = ell
             Data_m.attrs['m'] = m
@@ -14,6 +14,8 @@ WaveformGrid: Complex quantity evaluated along world lines of grid points on the
     To perform translations or boosts, we need to transform to physical space, along a series of selected world lines
     distributed evenly across the sphere.  These values may need to be interpolated to new time values, and they will
     presumably need to be transformed back to `WaveformModes`.
+WaveformModesFT: Fourier transforms in time of the modes of a `WaveformModes` object
+    Since the modes are complex, this contains both positive and negative frequencies.
 WaveformInDetector: Real quantities as observed in an inertial detector
     Detectors only measure one polarization, so they deal with real quantities.  Also, data is measured in evenly
     spaced time steps.  This object can be created from a `WaveformModes` object.
@@ -83,7 +85,12 @@ DataNamesLaTeX = [r"\mathrm{unknown data type}", r"\psi_0", r"\psi_1", r"\psi_2"
 # - \eth in the original NP formalism has undefined boost weight
 # - It seems like `M` should have boost weight 1, but I'll have to think about the implications
 
+ValidationLevel = [NoValidation, StructuralValidation, FullValidation] = range(3)
+ValidationLevelNames = ["NoValidation", "StructuralValidation", "FullValidation"]
+
 # Set up the WaveformModes object, by adding some methods
+from .waveform_base import set_validation_level, get_validation_level
+from .parallel import set_parallel, get_parallel, set_num_threads, get_num_threads
 from .waveform_modes import WaveformModes
 from .mode_calculations import (LdtVector, LVector, LLComparisonMatrix, LLMatrix,
                                 LLDominantEigenvector, angular_velocity, corotating_frame)
@@ -103,15 +110,27 @@ WaveformModes.rotate_physical_system = rotate_physical_system
 WaveformModes.to_corotating_frame = to_corotating_frame
 WaveformModes.to_inertial_frame = to_inertial_frame
 WaveformModes.align_decomposition_frame_to_modes = align_decomposition_frame_to_modes
+from .time_integration import integrate, differentiate
+WaveformModes.integrate = integrate
+WaveformModes.differentiate = differentiate
+from .alignment import align, get_alignment
+WaveformModes.align = align
 
 from .waveform_grid import WaveformGrid
+from .waveform_modes_batch import WaveformModesBatch
+from .waveform_modes_ft import WaveformModesFT
 from .waveform_in_detector import WaveformInDetector
+from . import inner_products
+from .streaming import CorotatingFrameStream
 from .extrapolation import extrapolate
 
 from . import sample_waveforms, SpEC
 
-__all__ = ['WaveformModes', 'WaveformGrid', 'WaveformInDetector',
+__all__ = ['WaveformModes', 'WaveformGrid', 'WaveformInDetector', 'WaveformModesBatch', 'WaveformModesFT',
            'FrameType', 'UnknownFrameType', 'Inertial', 'Coprecessing', 'Coorbital', 'Corotating', 'FrameNames',
            'DataType', 'UnknownDataType', 'psi0', 'psi1', 'psi2', 'psi3', 'psi4', 'sigma', 'h', 'hdot', 'news', 'psin',
            'DataNames', 'DataNamesLaTeX', 'SpinWeights', 'ConformalWeights', 'RScaling', 'MScaling',
+           'ValidationLevel', 'NoValidation', 'StructuralValidation', 'FullValidation', 'ValidationLevelNames',
+           'set_validation_level', 'get_validation_level',
+           'set_parallel', 'get_parallel', 'set_num_threads', 'get_num_threads',
            'speed_of_light', 'm_sun_in_meters', 'm_sun_in_seconds', 'parsec_in_meters']
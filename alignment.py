@@ -0,0 +1,267 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+"""Alignment of one waveform to another in time and orientation
+
+Two waveforms describing the same system -- for example, simulations at different resolutions, or a numerical
+waveform and a model to be hybridized with it -- generally differ by a time translation and a rotation.  The
+functions in this module find the time shift `delta_t` and the rotation `R_delta` minimizing
+
+    cost = int_{t1}^{t2} sum_{ell,m} |A_{ell,m}(t) - (R_delta B)_{ell,m}(t + delta_t)|^2 dt / int_{t1}^{t2} |A(t)|^2 dt,
+
+where `A` is the fixed waveform, `B` is the waveform to be aligned, and `R_delta B` denotes the physical rotation
+of `B` (see `rotate_physical_system`).  The search proceeds in stages:
+
+  1. Both waveforms are interpolated onto a uniform grid, extended for `B` by the range of allowed time shifts.
+     The norms (summed over modes) are invariant under rotations, so the squared difference of the norms is
+     evaluated for every discrete time shift at once -- the only nontrivial part being a cross-correlation, which is
+     computed with an FFT.  Local minima lower than both neighbors of the global minimum are retained as candidates.
+  2. For each candidate, the averaged angular velocities of the waveforms are aligned.
+  3. The remaining rotation about that axis is scanned: the cost is a trigonometric polynomial in the rotation angle,
+     so it is evaluated at many angles with a single small FFT.
+  4. All four degrees of freedom are optimized together, starting from the best angle, using analytic gradients of
+     the cost.  The derivative with respect to the time shift uses the derivative of the spline through `B`, and the
+     derivative with respect to infinitesimal rotations is given by the angular-momentum operator acting on the
+     modes.
+
+The candidate with the lowest cost is returned.  The data are compared as they are, so both waveforms should be
+given in the same kind of frame -- usually inertial.
+
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import quaternion
+import spherical_functions as sf
+import scipy.signal
+import scipy.optimize
+from .waveform_base import waveform_alterations
+from .interpolation import _bspline_basis_matrix
+from .differentiation import derivative_plan
+from .mode_calculations import angular_velocity, _LVector
+from .rotations import rotate_physical_system
+
+
+def _rotation_blocks(R_phys, ell_min, ell_max):
+    """Wigner D matrices of a physical rotation, as a list of (slice of modes, matrix acting on that slice)"""
+    R_basis = np.conjugate(R_phys)
+    D = np.empty((sf.WignerD._total_size_D_matrices(ell_min, ell_max),), dtype=complex)
+    sf._Wigner_D_matrices(R_basis.a, R_basis.b, ell_min, ell_max, D)
+    blocks = []
+    for ell in range(ell_min, ell_max + 1):
+        i_D = sf._linear_matrix_offset(ell, ell_min)
+        i_data = ell ** 2 - ell_min ** 2
+        blocks.append((slice(i_data, i_data + 2 * ell + 1),
+                       D[i_D:i_D + (2 * ell + 1) ** 2].reshape((2 * ell + 1, 2 * ell + 1))))
+    return blocks
+
+
+def _rotate(data, blocks):
+    """Physically rotate mode data of shape (n_times, n_modes), given the output of `_rotation_blocks`"""
+    rotated = np.empty_like(data)
+    for modes, matrix in blocks:
+        rotated[:, modes] = data[:, modes].dot(matrix)
+    return rotated
+
+
+def _rotor_between(a, b):
+    """Rotor taking the unit vector `a` onto the unit vector `b` by the smallest rotation"""
+    a, b = quaternion.from_vector_part(a), quaternion.from_vector_part(b)
+    R = 1 - b * a
+    if R.abs() < 1e-6:
+        # Antiparallel vectors; rotate by pi about any perpendicular axis
+        axis = np.cross(quaternion.as_vector_part(a), [1.0, 0.0, 0.0])
+        if np.linalg.norm(axis) < 1e-6:
+            axis = np.cross(quaternion.as_vector_part(a), [0.0, 1.0, 0.0])
+        return quaternion.from_vector_part(axis / np.linalg.norm(axis))
+    return R.normalized()
+
+
+def _mean_direction(omega):
+    mean = np.mean(omega, axis=0)
+    return mean / np.linalg.norm(mean)
+
+
+def _left_jacobian(v):
+    """Matrix J such that rotating by `v + dv` is rotating by `v` and then by `J dv`, to first order in dv"""
+    theta = np.linalg.norm(v)
+    K = np.array([[0.0, -v[2], v[1]], [v[2], 0.0, -v[0]], [-v[1], v[0], 0.0]])
+    if theta < 1e-8:
+        return np.eye(3) + K / 2.0
+    return np.eye(3) + (1 - np.cos(theta)) / theta ** 2 * K + (theta - np.sin(theta)) / theta ** 3 * K.dot(K)
+
+
+def _time_shift_candidates(norm_fixed, norm_moving, max_candidates):
+    """Promising shifts of `norm_fixed` along `norm_moving`, and the squared norm differences for every shift"""
+    n = norm_fixed.size
+    # sum_j (n_f[j] - n_m[j+k])^2 = sum_j n_f[j]^2 + sum_j n_m[j+k]^2 - 2 sum_j n_f[j] n_m[j+k]
+    correlation = scipy.signal.fftconvolve(norm_moving, norm_fixed[::-1], mode='valid')
+    cumulative = np.concatenate(([0.0], np.cumsum(norm_moving ** 2)))
+    differences = np.sum(norm_fixed ** 2) + (cumulative[n:] - cumulative[:-n]) - 2 * correlation
+    if differences.size < 3:
+        return np.argsort(differences)[:max_candidates], differences
+    i_min = np.argmin(differences)
+    threshold = max(differences[max(i_min - 1, 0)], differences[min(i_min + 1, differences.size - 1)])
+    padded = np.concatenate(([np.inf], differences, [np.inf]))
+    local_minima = np.flatnonzero((differences <= padded[:-2]) & (differences <= padded[2:])
+                                  & (differences <= threshold))
+    candidates = local_minima[np.argsort(differences[local_minima])]
+    return candidates[:max_candidates], differences
+
+
+def get_alignment(W_fixed, W_moving, t1, t2, max_time_shift=None, n_points=None, max_candidates=5,
+                  n_angles=None):
+    """Find the time shift and rotation best aligning one waveform to another over an interval
+
+    See the documentation of the `scri.alignment` module for the definition of the cost and the algorithm.
+
+    Parameters
+    ----------
+    W_fixed : WaveformModes
+        Waveform to which `W_moving` is aligned.  Its data must cover the interval `[t1, t2]`.
+    W_moving : WaveformModes
+        Waveform to be aligned.  It must have the same range of ell values as `W_fixed`.
+    t1, t2 : float
+        Beginning and end of the interval of `W_fixed` over which the waveforms are compared.
+    max_time_shift : float, optional
+        Largest magnitude of the time shift to be considered.  The shifts are also restricted so that the data of
+        `W_moving` cover the shifted interval.  Default is `t2-t1`.
+    n_points : int, optional
+        Number of uniformly spaced points in the interval used for the comparison.  Default is the number of time
+        steps of `W_fixed` in the interval (and at least 100).
+    max_candidates : int, optional
+        Maximum number of time shifts from the initial search to refine.  Default is 5.
+    n_angles : int, optional
+        Number of rotation angles about the angular-velocity axis to evaluate for each candidate.  Default is
+        `8*ell_max`.
+
+    Returns
+    -------
+    delta_t : float
+        Time shift such that `W_moving` at time `t + delta_t` corresponds to `W_fixed` at time `t`.
+    R_delta : quaternion
+        Physical rotation to be applied to `W_moving`.
+    cost : float
+        Relative squared difference of the aligned waveforms over the interval.
+
+    """
+    if (W_fixed.ell_min, W_fixed.ell_max) != (W_moving.ell_min, W_moving.ell_max):
+        raise ValueError("Waveforms must have the same range of ell values; got [{0}, {1}] and [{2}, {3}]".format(
+            W_fixed.ell_min, W_fixed.ell_max, W_moving.ell_min, W_moving.ell_max))
+    if not W_fixed.t[0] <= t1 < t2 <= W_fixed.t[-1]:
+        raise ValueError("Interval [{0}, {1}] is not contained in the fixed waveform's time span [{2}, {3}]".format(
+            t1, t2, W_fixed.t[0], W_fixed.t[-1]))
+    ell_min, ell_max = W_fixed.ell_min, W_fixed.ell_max
+    if max_time_shift is None:
+        max_time_shift = t2 - t1
+    if n_points is None:
+        n_points = max(100, np.count_nonzero((W_fixed.t >= t1) & (W_fixed.t <= t2)))
+    if n_angles is None:
+        n_angles = 8 * ell_max
+    n_angles = max(int(n_angles), 2 * ell_max + 1)
+
+    # Uniform grids: the interval for the fixed waveform, and the interval extended by all allowed shifts for the
+    # moving waveform, with the same spacing, so that each discrete shift is a whole number of steps
+    t_window = np.linspace(t1, t2, num=n_points)
+    dt = t_window[1] - t_window[0]
+    k_min = int(np.ceil(max(-max_time_shift, W_moving.t[0] - t1) / dt - 1e-10))
+    k_max = int(np.floor(min(max_time_shift, W_moving.t[-1] - t2) / dt + 1e-10))
+    if k_max < k_min:
+        raise ValueError("The moving waveform does not cover the interval [{0}, {1}] for any allowed time shift".format(
+            t1, t2))
+    t_extended = np.clip(t1 + dt * np.arange(k_min, k_max + n_points), W_moving.t[0], W_moving.t[-1])
+    W_fixed_window = W_fixed.interpolate(t_window)
+    W_moving_extended = W_moving.interpolate(t_extended)
+    A = W_fixed_window.data
+    B = W_moving_extended.data
+
+    # Stage 1: discrete time shifts from the rotation-invariant norms
+    candidates, differences = _time_shift_candidates(np.sum(np.abs(A) ** 2, axis=1), np.sum(np.abs(B) ** 2, axis=1),
+                                                     max_candidates)
+
+    # Quantities used by all candidates
+    weights = np.full(n_points, dt)
+    weights[[0, -1]] = dt / 2.0
+    norm_A = np.sum(weights * np.sum(np.abs(A) ** 2, axis=1))
+    omega_hat_fixed = _mean_direction(angular_velocity(W_fixed_window))
+    omega_moving = angular_velocity(W_moving_extended)
+    Q = _rotor_between(omega_hat_fixed, [0.0, 0.0, 1.0])
+    A_Q = _rotate(A, _rotation_blocks(Q, ell_min, ell_max))
+    m = W_fixed.LM[:, 1]
+    i1 = max(W_moving.t.searchsorted(t_extended[0]) - 3, 0)
+    i2 = min(W_moving.t.searchsorted(t_extended[-1], side='right') + 3, W_moving.n_times)
+    # The spline through the moving waveform (the same one used by `interpolate`, with the factorization of its
+    # system shared through the plan cache), and its derivative, are evaluated at each shifted time directly from
+    # the coefficients, rather than through a new plan for every trial shift
+    spline_plan = derivative_plan(W_moving.t[i1:i2], 'spline')
+    spline_coefficients = spline_plan.spline_coefficients(W_moving.data[i1:i2])
+
+    def spline(t, derivative=0):
+        return _bspline_basis_matrix(t, spline_plan.knots, derivative=derivative).dot(spline_coefficients)
+
+    LM = W_fixed.LM.astype(np.int64)
+    delta_t_bounds = (t_extended[0] - t1, t_extended[-1] - t2)
+
+    def cost_and_gradient(x, R_start):
+        delta_t, v = x[0], x[1:]
+        R = quaternion.from_rotation_vector(v) * R_start
+        blocks = _rotation_blocks(R, ell_min, ell_max)
+        B_R = _rotate(spline(t_window + delta_t), blocks)
+        B_R_dot = _rotate(spline(t_window + delta_t, 1), blocks)
+        difference = A - B_R
+        cost = np.sum(weights * np.sum(np.abs(difference) ** 2, axis=1)) / norm_A
+        gradient = np.empty(4)
+        gradient[0] = -2 * np.sum(weights * np.sum(np.conjugate(difference) * B_R_dot, axis=1)).real / norm_A
+        # Infinitesimal physical rotations act on the modes as -i L, so the cost changes by -2 Im <A|L|R B>
+        L = np.zeros((n_points, 3), dtype=complex)
+        _LVector(A, B_R, LM, L)
+        gradient_rotation = -2 * np.sum(weights[:, np.newaxis] * L, axis=0).imag / norm_A
+        gradient[1:] = _left_jacobian(v).T.dot(gradient_rotation)
+        return cost, gradient
+
+    best = None
+    for k in candidates:
+        delta_t = t_extended[k] - t1
+        B_k = B[k:k + n_points]
+
+        # Stage 2: align the mean angular velocities
+        R_axis = _rotor_between(_mean_direction(omega_moving[k:k + n_points]), omega_hat_fixed)
+
+        # Stage 3: scan rotations about the fixed waveform's axis.  In the frame where that axis is z, rotating by
+        # phi multiplies each mode by exp(-i m phi), so the overlap is a trigonometric polynomial evaluated by FFT.
+        B_Q = _rotate(B_k, _rotation_blocks(Q * R_axis, ell_min, ell_max))
+        overlaps = np.sum(weights[:, np.newaxis] * np.conjugate(A_Q) * B_Q, axis=0)
+        coefficients = np.zeros(n_angles, dtype=complex)
+        np.add.at(coefficients, m % n_angles, overlaps)
+        phi = 2 * np.pi * np.argmax(np.fft.fft(coefficients).real) / n_angles
+        R_start = Q.conjugate() * np.exp(phi / 2 * quaternion.z) * Q * R_axis
+
+        # Stage 4: optimize over all four degrees of freedom
+        result = scipy.optimize.minimize(cost_and_gradient, np.array([delta_t, 0.0, 0.0, 0.0]), args=(R_start,),
+                                         jac=True, method='L-BFGS-B',
+                                         bounds=[delta_t_bounds, (None, None), (None, None), (None, None)],
+                                         options={'ftol': 1e-15, 'gtol': 1e-12})
+        if best is None or result.fun < best[2]:
+            R_delta = quaternion.from_rotation_vector(result.x[1:]) * R_start
+            best = (result.x[0], R_delta, result.fun)
+    return best
+
+
+@waveform_alterations
+def align(W_moving, W_fixed, t1, t2, max_time_shift=None, n_points=None, max_candidates=5, n_angles=None):
+    """Align a waveform in place to another over an interval, by shifting its time and rotating it
+
+    The time shift and rotation are found with `get_alignment` (see its documentation for the parameters).  The times
+    of `W_moving` are reduced by `delta_t`, and the physical rotation `R_delta` is applied to its data.  Returns the
+    relative cost of the alignment.
+
+    """
+    delta_t, R_delta, cost = get_alignment(W_fixed, W_moving, t1, t2, max_time_shift, n_points, max_candidates,
+                                           n_angles)
+    W_moving.t = W_moving.t - delta_t
+    rotate_physical_system(W_moving, R_delta)
+    W_moving.__history_depth__ -= 1
+    W_moving._append_history('{0}.align({1}, {2}, {3})  # delta_t={4}, R_delta={5}, cost={6}'.format(
+        W_moving, W_fixed, t1, t2, delta_t, R_delta, cost))
+    return cost
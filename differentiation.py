@@ -0,0 +1,188 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+"""Batched time derivatives of many data sets sharing a common time grid
+
+As with `scri.interpolation`, the derivative of every column of the data (modes, grid points, etc., with real and
+imaginary parts treated separately) is computed with a single operator built once per time grid.  Several engines
+are available, selected by the `engine` argument of `derivative` and `derivative_plan`:
+
+  * 'spline': the derivative of the not-a-knot cubic spline through the data (the default).  This is the same
+    spline as `scipy.interpolate.splrep` with `s=0` or `InterpolatedUnivariateSpline` with `k=3`, so the results
+    agree with `quaternion.calculus.derivative`, but the spline system is factored once and solved for all columns
+    together, and the derivatives are evaluated with a single sparse matrix product.
+  * 'finite_difference': finite differences accurate to order `order` (default 4) in the time step, using stencils
+    of `order+1` points, centered where possible.  The weights are computed with Fornberg's algorithm, so the time
+    steps need not be uniform.  This is cheaper than the spline, and entirely local.
+  * 'spectral': multiplication by the angular frequency in the Fourier domain.  This requires uniformly spaced
+    times, and is only accurate for data that are smooth and periodic over the time span -- for example, data that
+    have been tapered to zero at both ends.  Otherwise, the discontinuity between the ends pollutes the result.
+
+The operators are stored in a `DerivativePlan`, and cached with the interpolation plans of `scri.interpolation`
+(see `set_plan_cache_size` and `clear_plan_cache` in that module).
+
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+from .interpolation import (_bspline_basis_matrix, _sparse_from_stencils, _uniform_spacing, _spline_factorization,
+                            _as_real_columns, _from_real_columns, _grid_fingerprint, _plan_cache)
+
+DerivativeEngines = ['spline', 'finite_difference', 'spectral']
+_default_orders = {'finite_difference': 4}
+
+
+def _fornberg_weights(z, x, derivative_order=1):
+    """Finite-difference weights for a derivative at each point `z` using the corresponding row of nodes `x`
+
+    This is the algorithm of Fornberg [Math. Comp. 51, 699 (1988)], applied to all rows at once.  The input `z` has
+    shape `(n,)` and `x` has shape `(n, width)`; the returned weights have the same shape as `x`.
+
+    """
+    n, width = x.shape
+    c = np.zeros((n, width, derivative_order + 1))
+    c[:, 0, 0] = 1.0
+    c1 = np.ones(n)
+    c4 = x[:, 0] - z
+    for i in range(1, width):
+        mn = min(i, derivative_order)
+        c2 = np.ones(n)
+        c5 = c4
+        c4 = x[:, i] - z
+        for j in range(i):
+            c3 = x[:, i] - x[:, j]
+            c2 = c2 * c3
+            if j == i - 1:
+                for k in range(mn, 0, -1):
+                    c[:, i, k] = c1 * (k * c[:, i - 1, k - 1] - c5 * c[:, i - 1, k]) / c2
+                c[:, i, 0] = -c1 * c5 * c[:, i - 1, 0] / c2
+            for k in range(mn, 0, -1):
+                c[:, j, k] = (c4 * c[:, j, k] - k * c[:, j, k - 1]) / c3
+            c[:, j, 0] = c4 * c[:, j, 0] / c3
+        c1 = c2
+    return c[:, :, derivative_order]
+
+
+def _finite_difference_matrix(t, order):
+    """Sparse matrix of finite-difference first-derivative weights, accurate to the given order"""
+    width = order + 1
+    first = np.clip(np.arange(t.size) - order // 2, 0, t.size - width)
+    nodes = t[first[:, np.newaxis] + np.arange(width)[np.newaxis, :]]
+    return _sparse_from_stencils(first, _fornberg_weights(t, nodes), t.size)
+
+
+class DerivativePlan(object):
+    """Precomputed time derivative on a given time grid
+
+    Parameters
+    ----------
+    t : float array
+        Increasing array of times.
+    engine : str, optional
+        One of the elements of `DerivativeEngines`; see the module documentation.  Default is 'spline'.
+    order : int, optional
+        Order of accuracy of the 'finite_difference' engine.  Ignored otherwise.
+
+    """
+
+    def __init__(self, t, engine='spline', order=None):
+        t = np.array(t, dtype=float)
+        if t.ndim != 1:
+            raise ValueError("Input `t` must be 1-d; got t.shape={0}".format(t.shape))
+        if engine not in DerivativeEngines:
+            raise ValueError("Unknown derivative engine '{0}'; must be one of {1}".format(engine, DerivativeEngines))
+        if order is None:
+            order = _default_orders.get(engine)
+        if engine == 'finite_difference' and order < 1:
+            raise ValueError("Finite-difference order must be at least 1; got {0}".format(order))
+        minimum_size = {'spline': 4, 'finite_difference': (order or 0) + 1, 'spectral': 2}[engine]
+        if t.size < minimum_size:
+            raise TypeError("Derivative engine '{0}' requires at least {1} time steps; got {2}".format(
+                engine, minimum_size, t.size))
+        self.t = t
+        self.engine = engine
+        self.order = order
+        self.factorization = None
+        self.matrix = None
+        if engine == 'spline':
+            self.knots, self.factorization = _spline_factorization(t)
+            self.matrix = _bspline_basis_matrix(t, self.knots, derivative=1)
+        elif engine == 'finite_difference':
+            self.matrix = _finite_difference_matrix(t, order)
+        else:
+            dt = _uniform_spacing(t)
+            if dt is None:
+                raise ValueError("Derivative engine 'spectral' requires uniformly spaced times")
+            self.angular_frequencies = 2 * np.pi * np.fft.rfftfreq(t.size, dt)
+            if t.size % 2 == 0:
+                self.angular_frequencies[-1] = 0.0  # The Nyquist mode has no well-defined derivative
+
+    def spline_coefficients(self, data):
+        """B-spline coefficients of the spline through `data`, for the 'spline' engine
+
+        The derivative of `data` is `matrix.dot(coefficients)`; since each row of `matrix` has at most four nonzero
+        elements, the derivative at any time step can be computed cheaply from the coefficients when needed.  The
+        coefficients have the same shape as `data`, and are complex if `data` is, in double precision.
+
+        """
+        if self.engine != 'spline':
+            raise ValueError("Spline coefficients are only available for the 'spline' engine; got '{0}'".format(
+                self.engine))
+        data = np.asarray(data)
+        if data.shape[0] != self.t.size:
+            raise ValueError("First dimension of `data` must have the same length as `t`; "
+                             "got t.shape={0} and data.shape={1}".format(self.t.shape, data.shape))
+        coefficients = self.factorization.solve(_as_real_columns(data).astype(float))
+        return _from_real_columns(coefficients, np.result_type(data.dtype, np.float64), data.shape)
+
+    def __call__(self, data):
+        """Differentiate `data`, whose first dimension must match `t`"""
+        data = np.asarray(data)
+        if data.shape[0] != self.t.size:
+            raise ValueError("First dimension of `data` must have the same length as `t`; "
+                             "got t.shape={0} and data.shape={1}".format(self.t.shape, data.shape))
+        columns = _as_real_columns(data).astype(float)
+        if self.engine == 'spectral':
+            columns = np.fft.irfft(1j * self.angular_frequencies[:, np.newaxis] * np.fft.rfft(columns, axis=0),
+                                   self.t.size, axis=0)
+        else:
+            if self.factorization is not None:
+                columns = self.factorization.solve(columns)
+            columns = self.matrix.dot(columns)
+        return _from_real_columns(columns, data.dtype, data.shape)
+
+
+def derivative_plan(t, engine='spline', order=None):
+    """Return a `DerivativePlan` for times `t`, reusing a cached plan if possible"""
+    key = ('derivative', _grid_fingerprint(t), engine, order)
+    plan = _plan_cache.get(key)
+    if plan is None:
+        plan = DerivativePlan(t, engine, order)
+        _plan_cache.put(key, plan)
+    return plan
+
+
+def derivative(t, data, engine='spline', order=None):
+    """Differentiate every column of `data` with respect to the times `t`
+
+    Parameters
+    ----------
+    t : float array
+        Increasing array of times at which `data` is given.
+    data : float or complex array
+        First dimension must have the same size as `t`.  The remaining dimensions may have any shape.
+    engine : str, optional
+        One of the elements of `DerivativeEngines`; see the module documentation.  Default is 'spline'.
+    order : int, optional
+        Order of accuracy of the 'finite_difference' engine (default 4).
+
+    Returns
+    -------
+    array of same shape and dtype as `data`
+
+    """
+    t = np.asarray(t, dtype=float)
+    if t.ndim != 1:
+        raise ValueError("Input `t` must be 1-d; got t.shape={0}".format(t.shape))
+    return derivative_plan(t, engine, order)(data)
@@ -0,0 +1,215 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+
+class _HistoryNode(object):
+    """Immutable block of history lines, pointing back to the block that preceded it"""
+    __slots__ = ('parent', 'lines', 'length', 'depth')
+
+    def __init__(self, parent, lines):
+        self.parent = parent
+        self.lines = tuple(lines)
+        if parent is None:
+            self.length = len(self.lines)
+            self.depth = 1
+        else:
+            self.length = parent.length + len(self.lines)
+            self.depth = parent.depth + 1
+
+
+class WaveformHistory(object):
+    """Structurally shared log of the operations applied to a waveform
+
+    This object behaves much like the list of strings that used to be stored in a waveform's `history` attribute: it
+    can be iterated over, indexed, sliced, compared to lists, extended with `+=`, and so on.  Internally, however,
+    the lines are stored as a chain of immutable blocks, each of which points back to the block before it.  Copying a
+    history -- which happens every time a waveform is copied, sliced, or interpolated -- simply creates a new head
+    pointing at the same chain, so it costs O(1) regardless of the number of lines.  Appending to one copy never
+    affects any other copy.
+
+    Iterating over the chain gets slower as the number of blocks grows, so the chain is automatically flattened into
+    a single block whenever its depth exceeds both `compaction_depth` and `compaction_fraction` times the number of
+    lines.  This keeps indexing and iteration O(n) for n lines.  Because the threshold grows with the number of
+    lines, the O(n) cost of flattening is incurred only after O(n) new lines have been appended since the last
+    flattening, so the cost is amortized O(1) per appended line.
+
+    Very long pipelines can also limit the total size of the history with `max_length`.  If the number of lines
+    grows beyond this value, the oldest lines are dropped -- leaving only the most recent half -- and replaced by a
+    single line noting how many lines were removed.  The default value for new histories is taken from the class
+    attribute `default_max_length`, which is `None` (no limit) unless changed by the user.
+
+    Parameters
+    ----------
+    lines : iterable of str or WaveformHistory, optional
+        Initial content of the log.  If this is another `WaveformHistory`, its content is shared, rather than copied.
+    max_length : int or None, optional
+        Maximum number of lines to keep; see above.  Defaults to `WaveformHistory.default_max_length`, or the value
+        of the input history if that is a `WaveformHistory`.
+
+    """
+
+    compaction_depth = 256
+    compaction_fraction = 0.25
+    default_max_length = None
+
+    def __init__(self, lines=(), max_length=None):
+        if isinstance(lines, WaveformHistory):
+            self._head = lines._head
+            if max_length is None:
+                max_length = lines.max_length
+        else:
+            if isinstance(lines, str):
+                lines = lines.split('\n')
+            lines = list(lines)
+            self._head = _HistoryNode(None, lines) if lines else None
+        if max_length is None:
+            max_length = type(self).default_max_length
+        self.max_length = max_length
+        self._enforce_max_length()
+
+    def __len__(self):
+        return 0 if self._head is None else self._head.length
+
+    def __bool__(self):
+        return self._head is not None and self._head.length > 0
+
+    __nonzero__ = __bool__
+
+    def _nodes(self):
+        """Return list of nodes in the chain, from the oldest to the newest"""
+        nodes = []
+        node = self._head
+        while node is not None:
+            nodes.append(node)
+            node = node.parent
+        nodes.reverse()
+        return nodes
+
+    def __iter__(self):
+        for node in self._nodes():
+            for line in node.lines:
+                yield line
+
+    def __reversed__(self):
+        node = self._head
+        while node is not None:
+            for line in reversed(node.lines):
+                yield line
+            node = node.parent
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self)[key]
+        length = len(self)
+        if key < 0:
+            key += length
+        if key < 0 or key >= length:
+            raise IndexError("history index out of range")
+        node = self._head
+        while node.length - len(node.lines) > key:
+            node = node.parent
+        return node.lines[key - (node.length - len(node.lines))]
+
+    def __eq__(self, other):
+        if isinstance(other, (WaveformHistory, list, tuple)):
+            if len(self) != len(other):
+                return False
+            if isinstance(other, WaveformHistory) and self._head is other._head:
+                return True
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
+    def __contains__(self, line):
+        return any(line == l for l in reversed(self))
+
+    def append(self, line):
+        self.extend([line])
+
+    def extend(self, lines):
+        if isinstance(lines, str):
+            lines = [lines]
+        lines = list(lines)
+        if not lines:
+            return
+        self._head = _HistoryNode(self._head, lines)
+        if self._head.depth > max(self.compaction_depth, self.compaction_fraction * self._head.length):
+            self.compact()
+        self._enforce_max_length()
+
+    def __iadd__(self, lines):
+        self.extend(lines)
+        return self
+
+    def __add__(self, lines):
+        new = WaveformHistory(self)
+        new.extend(lines)
+        return new
+
+    def __radd__(self, lines):
+        return WaveformHistory(list(lines) + list(self), max_length=self.max_length)
+
+    def pop(self, index=-1):
+        """Remove and return the line at `index` (the last line, by default)"""
+        if self._head is None:
+            raise IndexError("pop from empty history")
+        if index == -1 or index == len(self) - 1:
+            node = self._head
+            line = node.lines[-1]
+            if len(node.lines) > 1:
+                self._head = _HistoryNode(node.parent, node.lines[:-1])
+            else:
+                self._head = node.parent
+            return line
+        lines = list(self)
+        line = lines.pop(index)
+        self._head = _HistoryNode(None, lines) if lines else None
+        return line
+
+    def compact(self):
+        """Flatten the chain of blocks into a single block
+
+        This does not change the content of the history, and does not affect any other history sharing blocks with
+        this one.
+
+        """
+        if self._head is not None and self._head.depth > 1:
+            self._head = _HistoryNode(None, list(self))
+
+    def _enforce_max_length(self):
+        if self.max_length is None or len(self) <= self.max_length:
+            return
+        keep = max(self.max_length // 2, 1)
+        lines = list(self)
+        n_dropped = len(lines) - keep + 1
+        lines = ['# [{0} earlier lines of history were removed]'.format(n_dropped)] + lines[n_dropped:]
+        self._head = _HistoryNode(None, lines)
+
+    def __copy__(self):
+        return WaveformHistory(self)
+
+    def __deepcopy__(self, memo):
+        return WaveformHistory(self)
+
+    def __getstate__(self):
+        return {'lines': list(self), 'max_length': self.max_length}
+
+    def __setstate__(self, state):
+        lines = state['lines']
+        self._head = _HistoryNode(None, lines) if lines else None
+        self.max_length = state['max_length']
+
+    def __str__(self):
+        return '\n'.join(self)
+
+    def __repr__(self):
+        return 'WaveformHistory({0!r})'.format(list(self))
@@ -0,0 +1,253 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+"""Noise-weighted inner products, matches, and mismatches between waveforms
+
+The inner product of two waveforms `a` and `b` is
+
+    <a|b> = Re sum_c int a_c(f) conj(b_c(f)) / S(|f|) df,
+
+where `a_c(f)` is the Fourier transform of channel `c` and `S` is the (one-sided) power spectral density of the
+noise.  For `WaveformModes`, the channels are the modes, which are complex, so the integral runs over positive and
+negative frequencies; this is the inner product of the complex strain `h+ - i hx` integrated over the sphere.  For
+`WaveformInDetector`, the channels are the detectors, which are real, so the integral is replaced by the usual
+`4 int_0^infinity`, and a separate result is given for each angle.
+
+The match is the normalized inner product `<a|b> / sqrt(<a|a> <b|b>)`, maximized over a relative time shift and a
+phase -- an overall complex phase of the modes (equivalently, the polarization angle of `h+ - i hx`), or the phase
+of the analytic signal for detector data.  As a function of the time shift, the complex inner product is the inverse
+Fourier transform of the weighted cross spectrum, so the maximization requires a single inverse FFT per pair; the
+data are zero-padded so that all time shifts are included without wrapping around.  The time shift is maximized over
+the discrete time steps of the data.  The mismatch is `1 - match`.
+
+All waveforms compared with each other must share the same uniformly spaced time steps; see `WaveformBase.interpolate`
+otherwise.  The data should go smoothly to zero at both ends (see `scri.waveform_modes_ft.taper_window`).  To make
+large numbers of comparisons cheap, the Fourier transform of each waveform is cached with the waveform (and recomputed
+only if its times or data change, which is detected as described in `WaveformBase.derivative`), and the noise weights
+are interpolated once onto each frequency grid and cached with the plans of `scri.interpolation` (see
+`set_plan_cache_size` and `clear_plan_cache` in that module).  Comparisons between lists of waveforms, as in
+`match_matrix`, transform each waveform once, and compute all the cross spectra with batched matrix products and all
+the time shifts with batched inverse FFTs.
+
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import weakref
+import numpy as np
+import scipy.fft
+from . import WaveformModes
+from .waveform_in_detector import WaveformInDetector
+from .interpolation import _uniform_spacing, _array_fingerprint, _plan_cache
+from .waveform_modes_ft import _fft_workers
+
+_spectrum_caches = weakref.WeakKeyDictionary()
+
+
+def _channels(w):
+    """Data of shape (n_times, n_groups, n_channels), along with the shape of the groups"""
+    if isinstance(w, WaveformModes):
+        return w.data.reshape((w.n_times, 1, -1)), ()
+    if isinstance(w, WaveformInDetector):
+        return w.data, (w.n_angles,)
+    raise TypeError("Expected WaveformModes or WaveformInDetector object; got `{0}` instead.".format(type(w).__name__))
+
+
+def _common_grid(waveforms):
+    """Time step and number of time steps shared by all waveforms, along with whether the data are real"""
+    t = waveforms[0].t
+    dt = _uniform_spacing(t)
+    if dt is None:
+        raise ValueError("Inner products require uniformly spaced times; interpolate onto uniform time steps first")
+    fingerprint = _array_fingerprint(t)
+    shapes = set()
+    for w in waveforms:
+        if w.t is not t and _array_fingerprint(w.t) != fingerprint:
+            raise ValueError("All waveforms must have the same time steps; interpolate onto common time steps first")
+        data = _channels(w)[0]
+        shapes.add((type(w), data.shape[1:], data.dtype.kind))
+    if len(shapes) != 1:
+        raise ValueError("All waveforms must be of the same type, with the same modes or angles and detectors")
+    return dt, t.size, np.isrealobj(waveforms[0].data)
+
+
+def _n_fft(n_times):
+    # Padding to twice the length includes every time shift without wrapping around
+    return scipy.fft.next_fast_len(2 * n_times)
+
+
+def _spectrum(w, n_fft, real):
+    """Read-only Fourier transform of the waveform's channels, reusing the cached transform if possible"""
+    cache = _spectrum_caches.setdefault(w, {})
+    version = w._data_version()
+    cached = cache.get(n_fft)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    data = _channels(w)[0]
+    dt = w.t[1] - w.t[0]
+    if real:
+        spectrum = scipy.fft.rfft(data, n=n_fft, axis=0, workers=_fft_workers()) * dt
+    else:
+        spectrum = scipy.fft.fft(data, n=n_fft, axis=0, workers=_fft_workers()) * dt
+    spectrum.flags.writeable = False
+    cache[n_fft] = (version, spectrum)
+    return spectrum
+
+
+def _psd_key(psd):
+    if psd is None:
+        return None
+    if callable(psd):
+        return psd
+    f_psd, s_psd = psd
+    return (_array_fingerprint(np.asarray(f_psd, dtype=float)), _array_fingerprint(np.asarray(s_psd, dtype=float)))
+
+
+def noise_weights(n_fft, dt, real, psd=None, f_min=None, f_max=None):
+    """Weights `df / S(|f|)` for the frequencies of an FFT of length `n_fft`, reusing cached weights if possible
+
+    Parameters
+    ----------
+    n_fft : int
+        Length of the FFT.
+    dt : float
+        Time step of the data.
+    real : bool
+        If True, the weights are for the nonnegative frequencies of a real FFT, and include the factor converting the
+        integral over all frequencies to `4 int_0^infinity`.
+    psd : callable, or pair of float arrays, optional
+        The one-sided power spectral density of the noise.  If callable, it is called with an array of nonnegative
+        frequencies, and must return an array of the same shape.  If a pair `(f_psd, S_psd)` is given, the PSD is
+        interpolated linearly from those values, and taken to be infinite outside their range.  Frequencies at which
+        the PSD is not positive and finite are given zero weight.  The default is white noise, with `S=1`.
+    f_min, f_max : float, optional
+        Frequencies with `|f|` outside of this range are given zero weight.
+
+    """
+    key = ('noise_weights', n_fft, dt, real, _psd_key(psd), f_min, f_max)
+    weights = _plan_cache.get(key)
+    if weights is not None:
+        return weights
+    frequencies = np.abs(scipy.fft.rfftfreq(n_fft, dt) if real else scipy.fft.fftfreq(n_fft, dt))
+    if psd is None:
+        s = np.ones_like(frequencies)
+    elif callable(psd):
+        s = np.asarray(psd(frequencies), dtype=float)
+    else:
+        f_psd, s_psd = psd
+        s = np.interp(frequencies, np.asarray(f_psd, dtype=float), np.asarray(s_psd, dtype=float),
+                      left=np.inf, right=np.inf)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.where((s > 0) & np.isfinite(s), 1.0 / s, 0.0) / (n_fft * dt)
+    if f_min is not None:
+        weights[frequencies < f_min] = 0.0
+    if f_max is not None:
+        weights[frequencies > f_max] = 0.0
+    if real:
+        # 4 int_0^infinity; f=0 and the Nyquist frequency (if present) have no negative-frequency partners
+        weights[1:(n_fft + 1) // 2] *= 4.0
+        weights[0] *= 2.0
+        if n_fft % 2 == 0:
+            weights[-1] *= 2.0
+    weights.flags.writeable = False
+    _plan_cache.put(key, weights)
+    return weights
+
+
+def _prepare(waveforms_a, waveforms_b, psd, f_min, f_max):
+    dt, n_times, real = _common_grid(list(waveforms_a) + list(waveforms_b))
+    n_fft = _n_fft(n_times)
+    weights = noise_weights(n_fft, dt, real, psd, f_min, f_max)
+    group_shape = _channels(waveforms_a[0])[1]
+    # Spectra with shape (n_frequencies, n_groups, n_waveforms, n_channels)
+    spectra_a = np.stack([_spectrum(w, n_fft, real) for w in waveforms_a], axis=2)
+    spectra_b = np.stack([_spectrum(w, n_fft, real) for w in waveforms_b], axis=2)
+    return n_fft, weights, group_shape, spectra_a, spectra_b
+
+
+def _self_products(spectra, weights):
+    """<a|a> for each waveform, with shape (n_groups, n_waveforms)"""
+    return np.einsum('f,fgwc->gw', weights, spectra.real ** 2 + spectra.imag ** 2)
+
+
+def _weighted(spectra, weights):
+    return spectra * weights[:, np.newaxis, np.newaxis, np.newaxis]
+
+
+def _cross_products(weighted_spectra_a, spectra_b, n_fft, maximize):
+    """Inner products with shape (n_groups, n_a, n_b), maximized over time and phase if requested"""
+    # Weighted cross spectra, with shape (n_frequencies, n_groups, n_a, n_b)
+    cross = np.matmul(weighted_spectra_a, np.conjugate(np.swapaxes(spectra_b, 2, 3)))
+    if not maximize:
+        return np.sum(cross, axis=0).real
+    # The FFT normalization is already included in the weights
+    z = scipy.fft.ifft(cross, n=n_fft, axis=0, norm='forward', workers=_fft_workers())
+    return np.max(np.abs(z), axis=0)
+
+
+def inner_product(a, b, psd=None, f_min=None, f_max=None):
+    """Noise-weighted inner product `<a|b>` of two waveforms, without any maximization
+
+    See the documentation of the `scri.inner_products` module for the definitions, and `noise_weights` for the
+    parameters describing the noise.  The result is a float for `WaveformModes`, or an array with one element per
+    angle for `WaveformInDetector`.
+
+    """
+    n_fft, weights, group_shape, spectra_a, spectra_b = _prepare([a], [b], psd, f_min, f_max)
+    return _cross_products(_weighted(spectra_a, weights), spectra_b, n_fft, False)[:, 0, 0].reshape(group_shape)[()]
+
+
+def match_matrix(waveforms_a, waveforms_b=None, psd=None, f_min=None, f_max=None, maximize=True, chunk_size=None):
+    """Matches between every waveform in one list and every waveform in another
+
+    Parameters
+    ----------
+    waveforms_a : list of WaveformModes or WaveformInDetector objects
+    waveforms_b : list of WaveformModes or WaveformInDetector objects, optional
+        All waveforms must have the same time steps, and the same modes (or angles and detectors).  If not given,
+        `waveforms_a` is compared with itself.
+    psd, f_min, f_max : optional
+        Description of the noise; see `noise_weights`.
+    maximize : bool, optional
+        If True (the default), maximize over time and phase shifts; otherwise, just normalize the inner product.
+    chunk_size : int, optional
+        Number of waveforms from `waveforms_b` to compare with all of `waveforms_a` at once, to limit the memory used.
+        By default, all are compared at once.
+
+    Returns
+    -------
+    float array of shape `(len(waveforms_a), len(waveforms_b))`, or `(len(waveforms_a), len(waveforms_b), n_angles)`
+    for `WaveformInDetector` objects
+
+    """
+    if waveforms_b is None:
+        waveforms_b = waveforms_a
+    waveforms_a, waveforms_b = list(waveforms_a), list(waveforms_b)
+    n_fft, weights, group_shape, spectra_a, spectra_b = _prepare(waveforms_a, waveforms_b, psd, f_min, f_max)
+    norms_a = np.sqrt(_self_products(spectra_a, weights))
+    norms_b = np.sqrt(_self_products(spectra_b, weights))
+    n_b = len(waveforms_b)
+    chunk_size = n_b if chunk_size is None else max(1, int(chunk_size))
+    weighted_spectra_a = _weighted(spectra_a, weights)
+    matches = np.empty((norms_a.shape[0], len(waveforms_a), n_b))
+    for i1 in range(0, n_b, chunk_size):
+        i2 = min(i1 + chunk_size, n_b)
+        products = _cross_products(weighted_spectra_a, spectra_b[:, :, i1:i2], n_fft, maximize)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matches[:, :, i1:i2] = products / (norms_a[:, :, np.newaxis] * norms_b[:, np.newaxis, i1:i2])
+    return np.moveaxis(matches, 0, -1).reshape((len(waveforms_a), n_b) + group_shape)
+
+
+def mismatch_matrix(waveforms_a, waveforms_b=None, psd=None, f_min=None, f_max=None, maximize=True, chunk_size=None):
+    """Mismatches `1 - match` between every waveform in one list and every waveform in another; see `match_matrix`"""
+    return 1.0 - match_matrix(waveforms_a, waveforms_b, psd, f_min, f_max, maximize, chunk_size)
+
+
+def match(a, b, psd=None, f_min=None, f_max=None, maximize=True):
+    """Match between two waveforms, maximized over time and phase shifts by default; see `match_matrix`"""
+    return match_matrix([a], [b], psd, f_min, f_max, maximize)[0, 0][()]
+
+
+def mismatch(a, b, psd=None, f_min=None, f_max=None, maximize=True):
+    """Mismatch `1 - match` between two waveforms, maximized over time and phase shifts by default"""
+    return 1.0 - match(a, b, psd, f_min, f_max, maximize)
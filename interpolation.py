@@ -0,0 +1,459 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+"""Batched interpolation of many data sets sharing a common time grid
+
+Waveform data typically consist of many columns (modes, grid points, etc.), all sampled on the same time steps.
+Rather than constructing an independent spline for each column -- and for the real and imaginary parts of each
+column separately -- the functions in this module build the linear system defining the spline once per time grid,
+factor it once, and solve for the coefficients of all columns simultaneously.  Evaluation onto the new times then
+uses a single sparse matrix of basis-function values, shared by all columns.
+
+The factored spline system and the evaluation matrix are stored together in an `InterpolationPlan`.  Since the same
+pair of time grids tends to be used repeatedly -- for example, when interpolating the waveforms from every
+extraction radius onto a common set of times, or in alignment loops -- plans are kept in a small least-recently-used
+cache keyed by fingerprints of the input and output grids.  Factorizations of the input grid are cached separately,
+so that interpolating from one grid onto many different grids only factors the spline system once.  Applying a
+cached plan to new data costs just a banded triangular solve and a sparse matrix product.
+
+Cheaper schemes are also available, selected by the `scheme` argument of `interpolate` and `interpolation_plan`:
+
+  * 'linear': piecewise-linear interpolation
+  * 'hermite': piecewise-cubic Hermite interpolation, with derivatives estimated by second-order finite differences
+  * 'cubic': the not-a-knot cubic spline described above (the default)
+  * 'lagrange': local Lagrange polynomials through `width` points (default 4); requires uniformly spaced input
+  * 'sinc': Lanczos-windowed sinc interpolation using `width` points (default 8); requires uniformly spaced input,
+    and is most accurate for smooth data away from the ends of the input, since the stencils are truncated there
+
+Each of these is linear in the data and local, so the plan is just a sparse matrix that is applied to all data sets
+with a single product.  When the input times are uniformly spaced, the intervals containing the output times are
+found by index arithmetic rather than searching, and the stencil weights depend only on the fractional offset.
+Frames are interpolated with `quaternion.slerp` for the 'linear' scheme and with `quaternion.squad` otherwise.
+
+The splines are the same as those produced by `scipy.interpolate.splrep` with `s=0`: cubic B-splines interpolating
+the data at every input time, with knots at the input times except for the second and second-to-last ones (the
+"not-a-knot" condition).  Evaluation outside the input range extrapolates the first or last polynomial piece, as
+`splev` does by default.
+
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import quaternion
+import scipy.sparse
+import scipy.sparse.linalg
+
+
+def _not_a_knot_knots(t, degree=3):
+    """Knot vector for the interpolating spline of odd degree with the not-a-knot condition"""
+    half = (degree + 1) // 2
+    return np.concatenate(([t[0]] * (degree + 1), t[half:-half], [t[-1]] * (degree + 1)))
+
+
+def _bspline_values(x, knots, i, degree):
+    """Values of the `degree+1` B-splines of the given degree that may be nonzero on knot interval `i` at each `x`
+
+    Column `r` of the result holds the value of B-spline number `i-degree+r`, computed using the Cox-de Boor
+    recursion.  The points need not lie inside their intervals, in which case the polynomial pieces are extended.
+
+    """
+    left = np.empty((x.size, degree + 1))
+    right = np.empty((x.size, degree + 1))
+    N = np.zeros((x.size, degree + 1))
+    N[:, 0] = 1.0
+    for j in range(1, degree + 1):
+        left[:, j] = x - knots[i + 1 - j]
+        right[:, j] = knots[i + j] - x
+        saved = np.zeros(x.size)
+        for r in range(j):
+            temp = N[:, r] / (right[:, r + 1] + left[:, j - r])
+            N[:, r] = saved + right[:, r + 1] * temp
+            saved = left[:, j - r] * temp
+        N[:, j] = saved
+    return N
+
+
+def _bspline_basis_matrix(x, knots, degree=3, derivative=0):
+    """Sparse matrix of B-spline basis-function values
+
+    The returned matrix `B` has shape `(len(x), len(knots)-degree-1)`, so that `B.dot(c)` evaluates the spline with
+    coefficients `c` at the points `x`.  Each row has at most `degree+1` nonzero entries, which are computed for all
+    points at once using the Cox-de Boor recursion.  Points outside the knot range are evaluated using the first or
+    last polynomial piece.  If `derivative` is 1, the matrix instead evaluates the first derivative of the spline,
+    using the standard expression for derivatives of B-splines in terms of B-splines of one lower degree.
+
+    """
+    x = np.asarray(x, dtype=float)
+    n_coefficients = len(knots) - degree - 1
+    # Index `i` of the knot interval [knots[i], knots[i+1]) containing each point
+    i = np.searchsorted(knots, x, side='right') - 1
+    i = np.clip(i, degree, n_coefficients - 1)
+    if derivative == 0:
+        N = _bspline_values(x, knots, i, degree)
+    elif derivative == 1:
+        # B'_{j,k} = k * [B_{j,k-1} / (knots[j+k] - knots[j]) - B_{j+1,k-1} / (knots[j+k+1] - knots[j+1])]
+        M = _bspline_values(x, knots, i, degree - 1)
+        N = np.zeros((x.size, degree + 1))
+        for r in range(degree + 1):
+            j = i - degree + r
+            if r > 0:
+                N[:, r] += degree * M[:, r - 1] / (knots[j + degree] - knots[j])
+            if r < degree:
+                N[:, r] -= degree * M[:, r] / (knots[j + degree + 1] - knots[j + 1])
+    else:
+        raise ValueError("Only the spline values and first derivatives are implemented; got derivative={0}".format(
+            derivative))
+    rows = np.repeat(np.arange(x.size), degree + 1)
+    columns = (i[:, np.newaxis] - degree + np.arange(degree + 1)[np.newaxis, :]).ravel()
+    return scipy.sparse.csr_matrix((N.ravel(), (rows, columns)), shape=(x.size, n_coefficients))
+
+
+InterpolationSchemes = ['linear', 'hermite', 'cubic', 'lagrange', 'sinc']
+_default_widths = {'lagrange': 4, 'sinc': 8}
+
+
+def _uniform_spacing(t, rtol=1e-10):
+    """Return the time step if `t` is uniformly spaced (to within `rtol`), or None otherwise"""
+    if t.size < 2:
+        return None
+    dt = (t[-1] - t[0]) / (t.size - 1)
+    if dt > 0 and np.all(np.abs(np.diff(t) - dt) <= rtol * dt):
+        return dt
+    return None
+
+
+def _interval_indices(t, x, dt=None):
+    """Index `i` of the interval [t[i], t[i+1]] containing (or nearest to) each point of `x`
+
+    If `dt` is given, `t` is assumed to be uniformly spaced with that step, and the indices are found arithmetically.
+
+    """
+    if dt is not None:
+        i = np.floor((x - t[0]) / dt).astype(int)
+    else:
+        i = np.searchsorted(t, x, side='right') - 1
+    return np.clip(i, 0, t.size - 2)
+
+
+def _sparse_from_stencils(first_column, weights, n_columns):
+    """Build sparse matrix whose row `r` has `weights[r, k]` in column `first_column[r]+k`
+
+    Entries falling outside the range of columns are dropped.
+
+    """
+    n_rows, width = weights.shape
+    rows = np.repeat(np.arange(n_rows), width)
+    columns = (first_column[:, np.newaxis] + np.arange(width)[np.newaxis, :]).ravel()
+    weights = weights.ravel()
+    inside = (columns >= 0) & (columns < n_columns)
+    if not np.all(inside):
+        rows, columns, weights = rows[inside], columns[inside], weights[inside]
+    return scipy.sparse.csr_matrix((weights, (rows, columns)), shape=(n_rows, n_columns))
+
+
+def _linear_matrix(t, tprime, dt=None):
+    i = _interval_indices(t, tprime, dt)
+    tau = (tprime - t[i]) / (t[i + 1] - t[i])
+    return _sparse_from_stencils(i, np.column_stack((1 - tau, tau)), t.size)
+
+
+def _derivative_matrix(t):
+    """Sparse matrix of second-order finite-difference derivative weights, matching `np.gradient(edge_order=2)`"""
+    n = t.size
+    h = np.diff(t)
+    weights = np.empty((n, 3))
+    h_l, h_r = h[:-1], h[1:]
+    weights[1:-1, 0] = -h_r / (h_l * (h_l + h_r))
+    weights[1:-1, 1] = (h_r - h_l) / (h_l * h_r)
+    weights[1:-1, 2] = h_l / (h_r * (h_l + h_r))
+    h1, h2 = h[0], h[1]
+    weights[0] = [-(2 * h1 + h2) / (h1 * (h1 + h2)), (h1 + h2) / (h1 * h2), -h1 / (h2 * (h1 + h2))]
+    h1, h2 = h[-2], h[-1]
+    weights[-1] = [h2 / (h1 * (h1 + h2)), -(h1 + h2) / (h1 * h2), (2 * h2 + h1) / (h2 * (h1 + h2))]
+    first_column = np.clip(np.arange(n) - 1, 0, n - 3)
+    return _sparse_from_stencils(first_column, weights, n)
+
+
+def _hermite_matrix(t, tprime, dt=None):
+    i = _interval_indices(t, tprime, dt)
+    h = t[i + 1] - t[i]
+    tau = (tprime - t[i]) / h
+    tau2, tau3 = tau ** 2, tau ** 3
+    values = np.column_stack((2 * tau3 - 3 * tau2 + 1, -2 * tau3 + 3 * tau2))
+    slopes = np.column_stack((h * (tau3 - 2 * tau2 + tau), h * (tau3 - tau2)))
+    return (_sparse_from_stencils(i, values, t.size)
+            + _sparse_from_stencils(i, slopes, t.size).dot(_derivative_matrix(t))).tocsr()
+
+
+def _lagrange_matrix(t, tprime, dt, width):
+    u = (tprime - t[0]) / dt
+    first = np.clip(np.floor(u).astype(int) - (width // 2 - 1), 0, t.size - width)
+    s = u - first
+    weights = np.ones((tprime.size, width))
+    for k in range(width):
+        for m in range(width):
+            if m != k:
+                weights[:, k] *= (s - m) / (k - m)
+    return _sparse_from_stencils(first, weights, t.size)
+
+
+def _sinc_matrix(t, tprime, dt, width):
+    if tprime.size > 0 and (np.min(tprime) < t[0] or np.max(tprime) > t[-1]):
+        raise ValueError("Scheme 'sinc' cannot extrapolate; "
+                         "output times must lie within [{0}, {1}]".format(t[0], t[-1]))
+    a = width / 2.0
+    u = (tprime - t[0]) / dt
+    first = np.floor(u).astype(int) - (width // 2 - 1)
+    taps = first[:, np.newaxis] + np.arange(width)[np.newaxis, :]
+    x = u[:, np.newaxis] - taps
+    weights = np.sinc(x) * np.sinc(x / a)
+    outside = (taps < 0) | (taps >= t.size)
+    weights[outside] = 0.0
+    weights /= np.sum(weights, axis=1)[:, np.newaxis]
+    return _sparse_from_stencils(first, weights, t.size)
+
+
+def _as_real_columns(data):
+    """View data as a contiguous 2-d float array, with real and imaginary parts as separate columns"""
+    data = np.ascontiguousarray(data.reshape((data.shape[0], -1)))
+    if np.iscomplexobj(data):
+        return data.view(dtype=data.real.dtype)
+    return data
+
+
+def _from_real_columns(columns, dtype, shape):
+    """Invert `_as_real_columns`, given the dtype and trailing shape of the original data"""
+    columns = np.ascontiguousarray(columns, dtype=np.dtype(dtype).type(0).real.dtype)
+    if np.issubdtype(dtype, np.complexfloating):
+        columns = columns.view(dtype=dtype)
+    return columns.reshape(shape)
+
+
+class _LRUCache(object):
+    """Minimal least-recently-used mapping with a bounded number of entries
+
+    Every access reorders the entries, so all accesses are serialized with a lock; this makes the module-level
+    caches safe to use from the threads of a pool, as encouraged by `scri.parallel`.
+
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self._entries[key] = value
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            if self.max_size > 0:
+                self._entries[key] = value
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def resize(self, max_size):
+        with self._lock:
+            self.max_size = max_size
+            while len(self._entries) > max(self.max_size, 0):
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_plan_cache = _LRUCache(16)
+_factorization_cache = _LRUCache(16)
+
+
+def _grid_fingerprint(t):
+    """Hashable summary of the content of a 1-d float array"""
+    t = np.ascontiguousarray(t, dtype=float)
+    return (t.size, hashlib.sha1(t.view(np.uint8)).hexdigest())
+
+
+def _array_fingerprint(a):
+    """Hashable summary of the shape, type, and content of an array"""
+    a = np.ascontiguousarray(a)
+    return (a.shape, a.dtype.str, hashlib.sha1(a.reshape(-1).view(np.uint8)).hexdigest())
+
+
+def set_plan_cache_size(max_size):
+    """Set the maximum number of interpolation plans (and input-grid factorizations) to cache
+
+    Derivative plans from `scri.differentiation` are stored in the same cache.  Setting the size to 0 disables
+    caching.  Returns the previous size.
+
+    """
+    previous = _plan_cache.max_size
+    for cache in [_plan_cache, _factorization_cache]:
+        cache.resize(int(max_size))
+    return previous
+
+
+def clear_plan_cache():
+    """Remove all cached interpolation and derivative plans, and input-grid factorizations"""
+    _plan_cache.clear()
+    _factorization_cache.clear()
+
+
+def _spline_factorization(t):
+    """Return knots and LU factorization of the collocation matrix for the spline through times `t`"""
+    fingerprint = _grid_fingerprint(t)
+    factorization = _factorization_cache.get(fingerprint)
+    if factorization is None:
+        knots = _not_a_knot_knots(t)
+        collocation = _bspline_basis_matrix(t, knots)
+        # The collocation matrix is totally positive, so elimination without pivoting is stable
+        factorization = (knots, scipy.sparse.linalg.splu(collocation.tocsc(), permc_spec='NATURAL'))
+        _factorization_cache.put(fingerprint, factorization)
+    return factorization
+
+
+class InterpolationPlan(object):
+    """Precomputed interpolation from one time grid onto another
+
+    For the default 'cubic' scheme, constructing the plan factors the spline system for the input times `t` and
+    evaluates the B-spline basis at the output times `tprime`; each application then costs a triangular solve and a
+    sparse matrix product.  For the other schemes, the plan is a single sparse matrix mapping data on `t` to data on
+    `tprime`.  Either way, the plan can be applied to any number of data sets given on `t`.  Plans are usually
+    obtained through `interpolation_plan`, which caches them.
+
+    Parameters
+    ----------
+    t : float array
+        Increasing array of input times.
+    tprime : float array
+        Times at which to evaluate the interpolant.
+    scheme : str, optional
+        One of the elements of `InterpolationSchemes`; see the module documentation.  Default is 'cubic'.
+    width : int, optional
+        Number of input points in each stencil for the 'lagrange' and 'sinc' schemes.  Ignored otherwise.
+
+    """
+
+    def __init__(self, t, tprime, scheme='cubic', width=None):
+        t = np.array(t, dtype=float)
+        tprime = np.array(tprime, dtype=float)
+        if t.ndim != 1:
+            raise ValueError("Input `t` must be 1-d; got t.shape={0}".format(t.shape))
+        if scheme not in InterpolationSchemes:
+            raise ValueError("Unknown interpolation scheme '{0}'; must be one of {1}".format(scheme,
+                                                                                           InterpolationSchemes))
+        if width is None:
+            width = _default_widths.get(scheme)
+        minimum_size = {'linear': 2, 'hermite': 3, 'cubic': 4}.get(scheme, width)
+        if t.size < minimum_size:
+            raise TypeError("Interpolation scheme '{0}' requires at least {1} time steps; got {2}".format(
+                scheme, minimum_size, t.size))
+        self.t = t
+        self.tprime = tprime
+        self.scheme = scheme
+        self.width = width
+        self.factorization = None
+        dt = _uniform_spacing(t)
+        if scheme == 'cubic':
+            self.knots, self.factorization = _spline_factorization(t)
+            self.matrix = _bspline_basis_matrix(tprime, self.knots)
+        elif scheme == 'linear':
+            self.matrix = _linear_matrix(t, tprime, dt)
+        elif scheme == 'hermite':
+            self.matrix = _hermite_matrix(t, tprime, dt)
+        else:
+            if dt is None:
+                raise ValueError("Interpolation scheme '{0}' requires uniformly spaced input times".format(scheme))
+            if scheme == 'lagrange':
+                self.matrix = _lagrange_matrix(t, tprime, dt, width)
+            else:
+                self.matrix = _sinc_matrix(t, tprime, dt, width)
+
+    def __call__(self, data):
+        """Interpolate `data`, whose first dimension must match `t`, onto `tprime`"""
+        data = np.asarray(data)
+        if data.shape[0] != self.t.size:
+            raise ValueError("First dimension of `data` must have the same length as `t`; "
+                             "got t.shape={0} and data.shape={1}".format(self.t.shape, data.shape))
+        columns = _as_real_columns(data).astype(float)
+        if self.factorization is not None:
+            columns = self.factorization.solve(columns)
+        return _from_real_columns(self.matrix.dot(columns), data.dtype, (self.tprime.size,) + data.shape[1:])
+
+
+def interpolation_plan(t, tprime, scheme='cubic', width=None):
+    """Return an `InterpolationPlan` from `t` to `tprime`, reusing a cached plan if possible"""
+    key = (_grid_fingerprint(t), _grid_fingerprint(tprime), scheme, width)
+    plan = _plan_cache.get(key)
+    if plan is None:
+        plan = InterpolationPlan(t, tprime, scheme, width)
+        _plan_cache.put(key, plan)
+    return plan
+
+
+def interpolate(t, data, tprime, scheme='cubic', width=None):
+    """Interpolate every column of `data` from times `t` onto times `tprime`
+
+    Parameters
+    ----------
+    t : float array
+        Increasing array of times at which `data` is given.
+    data : float or complex array
+        First dimension must have the same size as `t`.  The remaining dimensions may have any shape; each element
+        is interpolated independently (and the real and imaginary parts of complex data independently), but all
+        are processed together.
+    tprime : float array
+        Times at which to evaluate the interpolant.
+    scheme : str, optional
+        One of the elements of `InterpolationSchemes`; see the module documentation.  Default is 'cubic'.
+    width : int, optional
+        Number of input points in each stencil for the 'lagrange' and 'sinc' schemes.
+
+    Returns
+    -------
+    array of same dtype as `data`, with first dimension of size `len(tprime)`
+
+    """
+    t = np.asarray(t, dtype=float)
+    if t.ndim != 1:
+        raise ValueError("Input `t` must be 1-d; got t.shape={0}".format(t.shape))
+    return interpolation_plan(t, tprime, scheme, width)(data)
+
+
+def spline_interpolate(t, data, tprime):
+    """Interpolate every column of `data` with not-a-knot cubic splines; see `interpolate`"""
+    return interpolate(t, data, tprime, scheme='cubic')
+
+
+def interpolate_frame(frame, t, tprime, scheme='cubic'):
+    """Interpolate a time series of rotors onto `tprime`
+
+    The 'linear' scheme uses spherical linear interpolation (slerp) between neighboring rotors; all other schemes
+    use `quaternion.squad`.  As for `squad`, the input rotors are assumed to be reasonably continuous; the first
+    dimension of `frame` must match `t`, but additional dimensions may follow.  Empty and constant (single-rotor)
+    frames are returned unchanged.
+
+    """
+    tprime = np.asarray(tprime, dtype=float)
+    if frame.size == 0 or (frame.ndim == 1 and frame.size == 1):
+        return np.copy(frame)
+    if scheme != 'linear':
+        return quaternion.squad(frame, t, tprime)
+    if tprime.size == 0:
+        return np.array((), dtype=np.quaternion)
+    i = _interval_indices(t, tprime, _uniform_spacing(t))
+    tau = (tprime - t[i]) / (t[i + 1] - t[i])
+    tau = tau.reshape(tau.shape + (1,) * (frame.ndim - 1))  # Broadcast over any additional axes of `frame`
+    return np.slerp_vectorized(frame[i], frame[i + 1], tau)
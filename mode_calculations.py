@@ -3,16 +3,25 @@
 
 from __future__ import print_function, division, absolute_import
 
-from math import sqrt
+import warnings
+from math import sqrt, sin, cos, acos, atan2
 
 import numpy as np
 import quaternion
 
 from spherical_functions import ladder_operator_coefficient as ladder
-from quaternion.numba_wrapper import jit, njit, xrange
+from quaternion.numba_wrapper import jit, xrange
+from .parallel import prange, kernel, parallel_variant, select
 
 
-@njit('void(c16[:,:], c16[:,:], i8[:,:], f8[:,:])')
+def _matching_precision(data1, data2):
+    """Return the two data arrays with a common precision, converting to double precision if they differ"""
+    if data1.dtype != data2.dtype:
+        return np.asarray(data1, dtype=complex), np.asarray(data2, dtype=complex)
+    return data1, data2
+
+
+@kernel
 def _LdtVector(data, datadot, lm, Ldt):
     """Helper function for the LdtVector function"""
     # Big, bad, ugly, obvious way to do the calculation
@@ -20,10 +29,10 @@ def _LdtVector(data, datadot, lm, Ldt):
     # L+ = Lx + i Ly      Lx =    (L+ + L-) / 2
     # L- = Lx - i Ly      Ly = -i (L+ - L-) / 2
 
-    for i_mode in xrange(lm.shape[0]):
-        L = lm[i_mode, 0]
-        M = lm[i_mode, 1]
-        for i_time in xrange(data.shape[0]):
+    for i_time in prange(data.shape[0]):
+        for i_mode in xrange(lm.shape[0]):
+            L = lm[i_mode, 0]
+            M = lm[i_mode, 1]
             # Compute first in (+,-,z) basis
             Lp = (np.conjugate(data[i_time, i_mode + 1]) * datadot[i_time, i_mode] * ladder(L, M)
                   if M + 1 <= L
@@ -40,6 +49,9 @@ def _LdtVector(data, datadot, lm, Ldt):
     return
 
 
+_LdtVector_parallel = parallel_variant(_LdtVector)
+
+
 def LdtVector(W):
     r"""Calculate the <Ldt> quantity with respect to the modes
 
@@ -50,11 +62,11 @@ def LdtVector(W):
 
     """
     Ldt = np.zeros((W.n_times, 3), dtype=float)
-    _LdtVector(W.data, W.data_dot, W.LM, Ldt)
+    select(_LdtVector, _LdtVector_parallel, W.n_times)(W.data, W.data_dot, W.LM, Ldt)
     return Ldt
 
 
-@njit('void(c16[:,:], c16[:,:], i8[:,:], c16[:,:])')
+@kernel
 def _LVector(data1, data2, lm, Lvec):
     """Helper function for the LVector function"""
     # Big, bad, ugly, obvious way to do the calculation
@@ -62,10 +74,10 @@ def _LVector(data1, data2, lm, Lvec):
     # L+ = Lx + i Ly      Lx =    (L+ + L-) / 2
     # L- = Lx - i Ly      Ly = -i (L+ - L-) / 2
 
-    for i_mode in xrange(lm.shape[0]):
-        L = lm[i_mode, 0]
-        M = lm[i_mode, 1]
-        for i_time in xrange(data1.shape[0]):
+    for i_time in prange(data1.shape[0]):
+        for i_mode in xrange(lm.shape[0]):
+            L = lm[i_mode, 0]
+            M = lm[i_mode, 1]
             # Compute first in (+,-,z) basis
             Lp = (np.conjugate(data1[i_time, i_mode + 1]) * data2[i_time, i_mode] * ladder(L, M)
                   if M + 1 <= L
@@ -82,6 +94,9 @@ def _LVector(data1, data2, lm, Lvec):
     return
 
 
+_LVector_parallel = parallel_variant(_LVector)
+
+
 def LVector(W1, W2):
     r"""Calculate the <L> quantity with respect to the modes
 
@@ -92,11 +107,12 @@ def LVector(W1, W2):
 
     """
     L = np.zeros((W1.n_times, 3), dtype=complex)
-    _LVector(W1.data, W2.data, W1.LM, L)
+    data1, data2 = _matching_precision(W1.data, W2.data)
+    select(_LVector, _LVector_parallel, W1.n_times)(data1, data2, W1.LM, L)
     return L
 
 
-@njit('void(c16[:,:], c16[:,:], i8[:,:], c16[:,:,:])')
+@kernel
 def _LLComparisonMatrix(data1, data2, lm, LL):
     """Helper function for the LLComparisonMatrix function"""
     # Big, bad, ugly, obvious way to do the calculation
@@ -114,10 +130,10 @@ def _LLComparisonMatrix(data1, data2, lm, LL):
     # LzLy = -i(  Lz   )(L+ - L-) / 2
     # LzLz =   (  Lz   )(  Lz   )
 
-    for i_mode in xrange(lm.shape[0]):
-        L = lm[i_mode, 0]
-        M = lm[i_mode, 1]
-        for i_time in xrange(data1.shape[0]):
+    for i_time in prange(data1.shape[0]):
+        for i_mode in xrange(lm.shape[0]):
+            L = lm[i_mode, 0]
+            M = lm[i_mode, 1]
             # Compute first in (+,-,z) basis
             LpLp = (np.conjugate(data1[i_time, i_mode + 2]) * data2[i_time, i_mode] * (ladder(L, M + 1) * ladder(L, M))
                     if M + 2 <= L
@@ -152,7 +168,7 @@ def _LLComparisonMatrix(data1, data2, lm, LL):
             LL[i_time, 0, 2] += 0.5 * (LpLz + LmLz)
             LL[i_time, 1, 0] += -0.25j * (LpLp - LmLp + LpLm - LmLm)
             LL[i_time, 1, 1] += -0.25 * (LpLp - LmLp - LpLm + LmLm)
-            LL[i_time, 1, 1] += -0.5j * (LpLz - LmLz)
+            LL[i_time, 1, 2] += -0.5j * (LpLz - LmLz)
             LL[i_time, 2, 0] += 0.5 * (LzLp + LzLm)
             LL[i_time, 2, 1] += -0.5j * (LzLp - LzLm)
             LL[i_time, 2, 2] += LzLz
@@ -170,6 +186,9 @@ def _LLComparisonMatrix(data1, data2, lm, LL):
     return
 
 
+_LLComparisonMatrix_parallel = parallel_variant(_LLComparisonMatrix)
+
+
 def LLComparisonMatrix(W1, W2):
     r"""Calculate the <LL> quantity with respect to the modes of two Waveforms
 
@@ -180,11 +199,107 @@ def LLComparisonMatrix(W1, W2):
 
     """
     LL = np.zeros((W1.n_times, 3, 3), dtype=complex)
-    _LLComparisonMatrix(W1.data, W2.data, W1.LM, LL)
+    data1, data2 = _matching_precision(W1.data, W2.data)
+    select(_LLComparisonMatrix, _LLComparisonMatrix_parallel, W1.n_times)(data1, data2, W1.LM, LL)
     return LL
 
 
-@njit('void(c16[:,:], i8[:,:], f8[:,:,:])')
+@kernel
+def _LVector_pairs(data1, data2, pairs, lm, ladder_plus, ladder_minus, Lvec):
+    """Helper function for WaveformModesBatch.LVector
+
+    The inputs `data1` and `data2` are stacks of waveforms with shape (K, n_times, n_modes), and `Lvec[i_pair]` is
+    the <L> vector of `data1[pairs[i_pair, 0]]` and `data2[pairs[i_pair, 1]]`, computed as in `_LVector`.  All pairs
+    are computed in the same loop over time steps, with the ladder-operator coefficients `ladder(L, M)` and
+    `ladder(L, -M)` of each mode passed in as `ladder_plus` and `ladder_minus`.
+
+    """
+    for i_time in prange(data1.shape[1]):
+        for i_pair in xrange(pairs.shape[0]):
+            i1 = pairs[i_pair, 0]
+            i2 = pairs[i_pair, 1]
+            Lp = 0.0j
+            Lm = 0.0j
+            Lz = 0.0j
+            for i_mode in xrange(lm.shape[0]):
+                L = lm[i_mode, 0]
+                M = lm[i_mode, 1]
+                g = data2[i2, i_time, i_mode]
+                if M + 1 <= L:
+                    Lp += np.conjugate(data1[i1, i_time, i_mode + 1]) * g * ladder_plus[i_mode]
+                if M - 1 >= -L:
+                    Lm += np.conjugate(data1[i1, i_time, i_mode - 1]) * g * ladder_minus[i_mode]
+                Lz += np.conjugate(data1[i1, i_time, i_mode]) * g * M
+            Lvec[i_pair, i_time, 0] = 0.5 * (Lp + Lm)
+            Lvec[i_pair, i_time, 1] = -0.5j * (Lp - Lm)
+            Lvec[i_pair, i_time, 2] = Lz
+    return
+
+
+_LVector_pairs_parallel = parallel_variant(_LVector_pairs)
+
+
+@kernel
+def _LLComparisonMatrix_pairs(data1, data2, pairs, lm, ladder_plus, ladder_minus, LL):
+    """Helper function for WaveformModesBatch.LLComparisonMatrix
+
+    As in `_LVector_pairs`, `LL[i_pair]` is the <LL> matrix of `data1[pairs[i_pair, 0]]` and
+    `data2[pairs[i_pair, 1]]`, computed as in `_LLComparisonMatrix`.  The sums are first accumulated in the (+,-,z)
+    basis, and converted to the (x,y,z) basis once per pair and time step.
+
+    """
+    for i_time in prange(data1.shape[1]):
+        for i_pair in xrange(pairs.shape[0]):
+            i1 = pairs[i_pair, 0]
+            i2 = pairs[i_pair, 1]
+            LpLp = 0.0j
+            LpLm = 0.0j
+            LmLp = 0.0j
+            LmLm = 0.0j
+            LpLz = 0.0j
+            LzLp = 0.0j
+            LmLz = 0.0j
+            LzLm = 0.0j
+            LzLz = 0.0j
+            for i_mode in xrange(lm.shape[0]):
+                L = lm[i_mode, 0]
+                M = lm[i_mode, 1]
+                g = data2[i2, i_time, i_mode]
+                lp = ladder_plus[i_mode]
+                lm_ = ladder_minus[i_mode]
+                # Note that ladder(L, M-1) = ladder(L, -M), and ladder(L, -(M+1)) = ladder(L, M)
+                f_g = np.conjugate(data1[i1, i_time, i_mode]) * g
+                LpLm += f_g * lm_ ** 2
+                LmLp += f_g * lp ** 2
+                LzLz += f_g * M ** 2
+                if M + 2 <= L:
+                    LpLp += np.conjugate(data1[i1, i_time, i_mode + 2]) * g * (ladder_plus[i_mode + 1] * lp)
+                if M - 2 >= -L:
+                    LmLm += np.conjugate(data1[i1, i_time, i_mode - 2]) * g * (ladder_minus[i_mode - 1] * lm_)
+                if M + 1 <= L:
+                    f_plus_g = np.conjugate(data1[i1, i_time, i_mode + 1]) * g * lp
+                    LpLz += f_plus_g * M
+                    LzLp += f_plus_g * (M + 1)
+                if M - 1 >= -L:
+                    f_minus_g = np.conjugate(data1[i1, i_time, i_mode - 1]) * g * lm_
+                    LmLz += f_minus_g * M
+                    LzLm += f_minus_g * (M - 1)
+            LL[i_pair, i_time, 0, 0] = 0.25 * (LpLp + LmLm + LmLp + LpLm)
+            LL[i_pair, i_time, 0, 1] = -0.25j * (LpLp - LmLm + LmLp - LpLm)
+            LL[i_pair, i_time, 0, 2] = 0.5 * (LpLz + LmLz)
+            LL[i_pair, i_time, 1, 0] = -0.25j * (LpLp - LmLp + LpLm - LmLm)
+            LL[i_pair, i_time, 1, 1] = -0.25 * (LpLp - LmLp - LpLm + LmLm)
+            LL[i_pair, i_time, 1, 2] = -0.5j * (LpLz - LmLz)
+            LL[i_pair, i_time, 2, 0] = 0.5 * (LzLp + LzLm)
+            LL[i_pair, i_time, 2, 1] = -0.5j * (LzLp - LzLm)
+            LL[i_pair, i_time, 2, 2] = LzLz
+    return
+
+
+_LLComparisonMatrix_pairs_parallel = parallel_variant(_LLComparisonMatrix_pairs)
+
+
+@kernel
 def _LLMatrix(data, lm, LL):
     """Helper function for the LLMatrix function"""
     # Big, bad, ugly, obvious way to do the calculation
@@ -202,10 +317,10 @@ def _LLMatrix(data, lm, LL):
     # LzLy = -i(  Lz   )(L+ - L-) / 2
     # LzLz =   (  Lz   )(  Lz   )
 
-    for i_mode in xrange(lm.shape[0]):
-        L = lm[i_mode, 0]
-        M = lm[i_mode, 1]
-        for i_time in xrange(data.shape[0]):
+    for i_time in prange(data.shape[0]):
+        for i_mode in xrange(lm.shape[0]):
+            L = lm[i_mode, 0]
+            M = lm[i_mode, 1]
             # Compute first in (+,-,z) basis
             LpLp = (np.conjugate(data[i_time, i_mode + 2]) * data[i_time, i_mode] * (ladder(L, M + 1) * ladder(L, M))
                     if M + 2 <= L
@@ -258,6 +373,9 @@ def _LLMatrix(data, lm, LL):
     return
 
 
+_LLMatrix_parallel = parallel_variant(_LLMatrix)
+
+
 def LLMatrix(W):
     r"""Calculate the <LL> quantity with respect to the modes
 
@@ -272,62 +390,180 @@ def LLMatrix(W):
 
     """
     LL = np.zeros((W.n_times, 3, 3), dtype=float)
-    _LLMatrix(W.data, W.LM, LL)
+    select(_LLMatrix, _LLMatrix_parallel, W.n_times)(W.data, W.LM, LL)
     return LL
 
 
-@njit('void(f8[:,:], f8[:], i8)')
-def _LLDominantEigenvector(dpa, dpa_i, i_index):
-    """Jitted helper function for LLDominantEigenvector"""
-    # Make the initial direction closer to RoughInitialEllDirection than not
-    if (dpa_i[0] * dpa[i_index, 0] + dpa_i[1] * dpa[i_index, 1] + dpa_i[2] * dpa[i_index, 2]) < 0.:
+@kernel
+def _null_vector(A00, A01, A02, A11, A12, A22):
+    """Unit vector annihilated by the symmetric matrix A, which is assumed to have rank 2
+
+    The rows of a symmetric 3x3 matrix with rank 2 span the plane orthogonal to its null vector, so the cross product
+    of any two independent rows is parallel to that vector; the largest of the three cross products is the best
+    conditioned.
+
+    """
+    c0x = A01 * A12 - A02 * A11
+    c0y = A02 * A01 - A00 * A12
+    c0z = A00 * A11 - A01 * A01
+    c1x = A01 * A22 - A02 * A12
+    c1y = A02 * A02 - A00 * A22
+    c1z = A00 * A12 - A01 * A02
+    c2x = A11 * A22 - A12 * A12
+    c2y = A12 * A02 - A01 * A22
+    c2z = A01 * A12 - A11 * A02
+    n0 = c0x ** 2 + c0y ** 2 + c0z ** 2
+    n1 = c1x ** 2 + c1y ** 2 + c1z ** 2
+    n2 = c2x ** 2 + c2y ** 2 + c2z ** 2
+    if n0 >= n1 and n0 >= n2:
+        n = sqrt(n0)
+        return c0x / n, c0y / n, c0z / n
+    elif n1 >= n2:
+        n = sqrt(n1)
+        return c1x / n, c1y / n, c1z / n
+    n = sqrt(n2)
+    return c2x / n, c2y / n, c2z / n
+
+
+@kernel
+def _isolated_eigenvector(A00, A01, A02, A11, A12, A22, eigenvalue):
+    """Unit eigenvector of the symmetric matrix A for a simple eigenvalue, refined once by the Rayleigh quotient"""
+    x, y, z = _null_vector(A00 - eigenvalue, A01, A02, A11 - eigenvalue, A12, A22 - eigenvalue)
+    eigenvalue = A00 * x * x + A11 * y * y + A22 * z * z + 2 * (A01 * x * y + A02 * x * z + A12 * y * z)
+    return _null_vector(A00 - eigenvalue, A01, A02, A11 - eigenvalue, A12, A22 - eigenvalue)
+
+
+@kernel
+def _dominant_eigenvector(A00, A01, A02, A11, A12, A22):
+    """Unit eigenvector of the symmetric matrix A with the largest eigenvalue
+
+    The eigenvalues are found in closed form, using the trigonometric solution of the characteristic cubic.  If the
+    largest eigenvalue is well separated from the other two, its eigenvector is the null vector of `A - lambda I`.
+    Otherwise, the smallest eigenvalue is well separated, so its eigenvector is found instead, and the dominant
+    eigenvector is found by solving the remaining 2x2 problem in the orthogonal plane exactly.  This avoids the loss
+    of precision in the closed-form eigenvalues when two of them are nearly equal.  When the largest eigenvalue is
+    degenerate, an arbitrary vector in its eigenspace is returned; when A is proportional to the identity, this is
+    (0,0,1).
+
+    """
+    q = (A00 + A11 + A22) / 3.0
+    B00 = A00 - q
+    B11 = A11 - q
+    B22 = A22 - q
+    p2 = B00 ** 2 + B11 ** 2 + B22 ** 2 + 2 * (A01 ** 2 + A02 ** 2 + A12 ** 2)
+    if p2 == 0.0:
+        return 0.0, 0.0, 1.0
+    p = sqrt(p2 / 6.0)
+    determinant = B00 * (B11 * B22 - A12 * A12) - A01 * (A01 * B22 - A12 * A02) + A02 * (A01 * A12 - B11 * A02)
+    r = min(max(determinant / (2 * p ** 3), -1.0), 1.0)
+    phi = acos(r) / 3.0
+    if r >= 0.0:
+        return _isolated_eigenvector(A00, A01, A02, A11, A12, A22, q + 2 * p * cos(phi))
+    ux, uy, uz = _isolated_eigenvector(A00, A01, A02, A11, A12, A22, q + 2 * p * cos(phi + 2.0943951023931957))
+    # Orthonormal basis (v, w) of the plane orthogonal to u, starting from the axis least aligned with u
+    if abs(ux) <= abs(uy) and abs(ux) <= abs(uz):
+        n = sqrt(uy ** 2 + uz ** 2)
+        vx, vy, vz = 0.0, uz / n, -uy / n
+    elif abs(uy) <= abs(uz):
+        n = sqrt(ux ** 2 + uz ** 2)
+        vx, vy, vz = -uz / n, 0.0, ux / n
+    else:
+        n = sqrt(ux ** 2 + uy ** 2)
+        vx, vy, vz = uy / n, -ux / n, 0.0
+    wx = uy * vz - uz * vy
+    wy = uz * vx - ux * vz
+    wz = ux * vy - uy * vx
+    # The 2x2 matrix [[a, b], [b, c]] of A in this basis has dominant eigenvector (cos(theta), sin(theta))
+    Avx = A00 * vx + A01 * vy + A02 * vz
+    Avy = A01 * vx + A11 * vy + A12 * vz
+    Avz = A02 * vx + A12 * vy + A22 * vz
+    a = vx * Avx + vy * Avy + vz * Avz
+    b = wx * Avx + wy * Avy + wz * Avz
+    c = (wx * (A00 * wx + A01 * wy + A02 * wz) + wy * (A01 * wx + A11 * wy + A12 * wz)
+         + wz * (A02 * wx + A12 * wy + A22 * wz))
+    theta = 0.5 * atan2(2 * b, a - c)
+    cos_theta = cos(theta)
+    sin_theta = sin(theta)
+    return cos_theta * vx + sin_theta * wx, cos_theta * vy + sin_theta * wy, cos_theta * vz + sin_theta * wz
+
+
+@kernel
+def _LLDominantEigenvector(data, lm, ladder_plus, ladder_minus, rough_direction, i_index, dpa):
+    """Helper function for the LLDominantEigenvector function
+
+    This accumulates the six independent components of `<LL>` at each instant (using the same expressions as
+    `_angular_velocity`), and stores the dominant eigenvector directly in `dpa`, so that the full `<LL>` matrix is
+    never stored.  The signs are then chosen to be continuous, as described in `LLDominantEigenvector`.
+
+    """
+    for i_time in prange(data.shape[0]):
+        LL00 = 0.0
+        LL01 = 0.0
+        LL02 = 0.0
+        LL11 = 0.0
+        LL12 = 0.0
+        LL22 = 0.0
+        for i_mode in xrange(lm.shape[0]):
+            L = lm[i_mode, 0]
+            M = lm[i_mode, 1]
+            f = data[i_time, i_mode]
+            f_plus = np.conjugate(data[i_time, i_mode + 1]) if M + 1 <= L else 0.0j
+            f_minus = np.conjugate(data[i_time, i_mode - 1]) if M - 1 >= -L else 0.0j
+            f_plus_plus = np.conjugate(data[i_time, i_mode + 2]) if M + 2 <= L else 0.0j
+            f_minus_minus = np.conjugate(data[i_time, i_mode - 2]) if M - 2 >= -L else 0.0j
+            norm = f.real ** 2 + f.imag ** 2
+            lp = ladder_plus[i_mode]
+            lm_ = ladder_minus[i_mode]
+            LpLp = f_plus_plus * f * (ladder_plus[i_mode + 1] * lp if M + 2 <= L else 0.0)
+            LpLm = norm * lm_ ** 2
+            LmLp = norm * lp ** 2
+            LmLm = f_minus_minus * f * (ladder_minus[i_mode - 1] * lm_ if M - 2 >= -L else 0.0)
+            LpLz = f_plus * f * (lp * M)
+            LzLp = f_plus * f * ((M + 1) * lp)
+            LmLz = f_minus * f * (lm_ * M)
+            LzLm = f_minus * f * ((M - 1) * lm_)
+            LL00 += 0.25 * (LpLp + LmLm).real + 0.25 * (LmLp + LpLm)
+            LL01 += 0.25 * (LpLp - LmLm).imag
+            LL02 += 0.25 * (LpLz + LmLz + LzLp + LzLm).real
+            LL11 += -0.25 * (LpLp + LmLm).real + 0.25 * (LmLp + LpLm)
+            LL12 += 0.25 * (LpLz - LmLz + LzLp - LzLm).imag
+            LL22 += norm * M ** 2
+        x, y, z = _dominant_eigenvector(LL00, LL01, LL02, LL11, LL12, LL22)
+        dpa[i_time, 0] = x
+        dpa[i_time, 1] = y
+        dpa[i_time, 2] = z
+
+    # Make the initial direction closer to RoughDirection than not
+    if (rough_direction[0] * dpa[i_index, 0] + rough_direction[1] * dpa[i_index, 1]
+            + rough_direction[2] * dpa[i_index, 2]) < 0.0:
         dpa[i_index, 0] *= -1
         dpa[i_index, 1] *= -1
         dpa[i_index, 2] *= -1
-    # Now, go through and make the vectors reasonably continuous.
-    d = -1
-    LastNorm = sqrt(dpa[i_index, 0] ** 2 + dpa[i_index, 1] ** 2 + dpa[i_index, 2] ** 2)
-    for i in xrange(i_index-1, -1, -1):
-        Norm = dpa[i, 0] ** 2 + dpa[i, 1] ** 2 + dpa[i, 2] ** 2
-        dNorm = ((dpa[i, 0] - dpa[i - d, 0]) ** 2 + (dpa[i, 1] - dpa[i - d, 1]) ** 2
-                 + (dpa[i, 2] - dpa[i - d, 2]) ** 2)
-        if dNorm > Norm:
+    # Now, go through and make the vectors reasonably continuous.  For unit vectors, the condition `|a-b|^2 > |a|^2`
+    # is equivalent to `a.b < 1/2`.
+    for i in xrange(i_index - 1, -1, -1):
+        if dpa[i, 0] * dpa[i + 1, 0] + dpa[i, 1] * dpa[i + 1, 1] + dpa[i, 2] * dpa[i + 1, 2] < 0.5:
             dpa[i, 0] *= -1
             dpa[i, 1] *= -1
             dpa[i, 2] *= -1
-        # While we're here, let's just normalize that last one
-        if LastNorm != 0.0 and LastNorm != 1.0:
-            dpa[i - d, 0] /= LastNorm
-            dpa[i - d, 1] /= LastNorm
-            dpa[i - d, 2] /= LastNorm
-        LastNorm = sqrt(Norm)
-    if LastNorm != 0.0 and LastNorm != 1.0:
-        dpa[0, 0] /= LastNorm
-        dpa[0, 1] /= LastNorm
-        dpa[0, 2] /= LastNorm
-    d = 1
-    LastNorm = sqrt(dpa[i_index, 0] ** 2 + dpa[i_index, 1] ** 2 + dpa[i_index, 2] ** 2)
-    for i in xrange(i_index+1, dpa.shape[0]):
-        Norm = dpa[i, 0] ** 2 + dpa[i, 1] ** 2 + dpa[i, 2] ** 2
-        dNorm = ((dpa[i, 0] - dpa[i - d, 0]) ** 2 + (dpa[i, 1] - dpa[i - d, 1]) ** 2
-                 + (dpa[i, 2] - dpa[i - d, 2]) ** 2)
-        if dNorm > Norm:
+    for i in xrange(i_index + 1, dpa.shape[0]):
+        if dpa[i, 0] * dpa[i - 1, 0] + dpa[i, 1] * dpa[i - 1, 1] + dpa[i, 2] * dpa[i - 1, 2] < 0.5:
             dpa[i, 0] *= -1
             dpa[i, 1] *= -1
             dpa[i, 2] *= -1
-        # While we're here, let's just normalize that last one
-        if LastNorm != 0.0 and LastNorm != 1.0:
-            dpa[i - d, 0] /= LastNorm
-            dpa[i - d, 1] /= LastNorm
-            dpa[i - d, 2] /= LastNorm
-        LastNorm = sqrt(Norm)
-    if LastNorm != 0.0 and LastNorm != 1.0:
-        dpa[-1, 0] /= LastNorm
-        dpa[-1, 1] /= LastNorm
-        dpa[-1, 2] /= LastNorm
     return
 
 
+_LLDominantEigenvector_parallel = parallel_variant(_LLDominantEigenvector)
+
+
+def _ladder_coefficients(lm):
+    """Arrays of `ladder(L, M)` and `ladder(L, -M)` for each mode, with zeros where the ladder operator vanishes"""
+    ladder_plus = np.array([ladder(L, M) if M < L else 0.0 for L, M in lm])
+    ladder_minus = np.array([ladder(L, -M) if M > -L else 0.0 for L, M in lm])
+    return ladder_plus, ladder_minus
+
+
 def LLDominantEigenvector(W, RoughDirection=np.array([0.0, 0.0, 1.0]), RoughDirectionIndex=0):
     """Calculate the principal axis of the LL matrix
 
@@ -348,22 +584,109 @@ def LLDominantEigenvector(W, RoughDirection=np.array([0.0, 0.0, 1.0]), RoughDire
     The vector is given in the (possibly rotating) mode frame
     (X,Y,Z), rather than the inertial frame (x,y,z).
 
-    """
-    # Calculate the LL matrix at each instant
-    LL = np.zeros((W.n_times, 3, 3), dtype=float)
-    _LLMatrix(W.data, W.LM, LL)
+    The LL matrix is not stored; the dominant eigenvector of each
+    instant's 3x3 matrix is found in closed form as soon as the
+    matrix is accumulated, and the signs are made continuous in the
+    same compiled function.
 
-    # This is the eigensystem
-    eigenvals, eigenvecs = np.linalg.eigh(LL)
+    """
+    return _dominant_eigenvectors(W.data, W.LM, RoughDirection, RoughDirectionIndex)
 
-    # Now we find and normalize the dominant principal axis at each
-    # moment, made continuous
-    dpa = eigenvecs[:, :, 2]  # `eigh` always returns eigenvals in *increasing* order
-    _LLDominantEigenvector(dpa, RoughDirection, RoughDirectionIndex)
 
+def _dominant_eigenvectors(data, lm, rough_direction, rough_direction_index):
+    """Compute LLDominantEigenvector directly from the data array, which may be a view of a subset of time steps"""
+    ladder_plus, ladder_minus = _ladder_coefficients(lm)
+    dpa = np.empty((data.shape[0], 3), dtype=float)
+    if data.shape[0] == 0:
+        return dpa
+    select(_LLDominantEigenvector, _LLDominantEigenvector_parallel, data.shape[0])(
+        data, lm, ladder_plus, ladder_minus, np.asarray(rough_direction, dtype=float), rough_direction_index, dpa)
     return dpa
 
 
+@kernel
+def _angular_velocity(data, coefficients, indptr, indices, weights, lm, ladder_plus, ladder_minus, omega):
+    """Helper function for the angular_velocity function
+
+    This fuses `_LdtVector` and `_LLMatrix` into a single pass over the data, and solves for the angular velocity at
+    each instant.  The time derivative of the data at time step `i_time` is evaluated as needed from the spline
+    coefficients, as `sum(weights[k] * coefficients[indices[k]] for k in range(indptr[i_time], indptr[i_time+1]))`,
+    where `indptr`, `indices`, and `weights` are the CSR representation of the sparse derivative operator.  The
+    ladder-operator coefficients `ladder(L, M)` and `ladder(L, -M)` for each mode are passed in as `ladder_plus` and
+    `ladder_minus`, so that they need not be recomputed at each instant.
+
+    """
+    for i_time in prange(data.shape[0]):
+        Ldt0 = 0.0
+        Ldt1 = 0.0
+        Ldt2 = 0.0
+        LL00 = 0.0
+        LL01 = 0.0
+        LL02 = 0.0
+        LL11 = 0.0
+        LL12 = 0.0
+        LL22 = 0.0
+        for i_mode in xrange(lm.shape[0]):
+            L = lm[i_mode, 0]
+            M = lm[i_mode, 1]
+            f = data[i_time, i_mode]
+            fdot = 0.0j
+            for k in xrange(indptr[i_time], indptr[i_time + 1]):
+                fdot += weights[k] * coefficients[indices[k], i_mode]
+            f_plus = np.conjugate(data[i_time, i_mode + 1]) if M + 1 <= L else 0.0j
+            f_minus = np.conjugate(data[i_time, i_mode - 1]) if M - 1 >= -L else 0.0j
+            f_plus_plus = np.conjugate(data[i_time, i_mode + 2]) if M + 2 <= L else 0.0j
+            f_minus_minus = np.conjugate(data[i_time, i_mode - 2]) if M - 2 >= -L else 0.0j
+            norm = f.real ** 2 + f.imag ** 2
+            lp = ladder_plus[i_mode]
+            lm_ = ladder_minus[i_mode]
+
+            # <Ldt>; see _LdtVector
+            Lp = f_plus * fdot * lp
+            Lm = f_minus * fdot * lm_
+            Lz = np.conjugate(f) * fdot * M
+            Ldt0 += 0.5 * (Lp.imag + Lm.imag)
+            Ldt1 += -0.5 * (Lp.real - Lm.real)
+            Ldt2 += Lz.imag
+
+            # <LL>; see _LLMatrix.  Note that ladder(L, M-1) = ladder(L, -M), and ladder(L, -(M+1)) = ladder(L, M).
+            LpLp = f_plus_plus * f * (ladder_plus[i_mode + 1] * lp if M + 2 <= L else 0.0)
+            LpLm = norm * lm_ ** 2
+            LmLp = norm * lp ** 2
+            LmLm = f_minus_minus * f * (ladder_minus[i_mode - 1] * lm_ if M - 2 >= -L else 0.0)
+            LpLz = f_plus * f * (lp * M)
+            LzLp = f_plus * f * ((M + 1) * lp)
+            LmLz = f_minus * f * (lm_ * M)
+            LzLm = f_minus * f * ((M - 1) * lm_)
+            LL00 += 0.25 * (LpLp + LmLm).real + 0.25 * (LmLp + LpLm)
+            LL01 += 0.25 * (LpLp - LmLm).imag
+            LL02 += 0.25 * (LpLz + LmLz + LzLp + LzLm).real
+            LL11 += -0.25 * (LpLp + LmLm).real + 0.25 * (LmLp + LpLm)
+            LL12 += 0.25 * (LpLz - LmLz + LzLp - LzLm).imag
+            LL22 += norm * M ** 2
+
+        # Solve <Ldt> = - <LL> . omega, using the cofactors of the symmetric matrix <LL>
+        C00 = LL11 * LL22 - LL12 * LL12
+        C01 = LL02 * LL12 - LL01 * LL22
+        C02 = LL01 * LL12 - LL02 * LL11
+        C11 = LL00 * LL22 - LL02 * LL02
+        C12 = LL01 * LL02 - LL00 * LL12
+        C22 = LL00 * LL11 - LL01 * LL01
+        determinant = LL00 * C00 + LL01 * C01 + LL02 * C02
+        if determinant == 0.0:
+            omega[i_time, 0] = np.nan
+            omega[i_time, 1] = np.nan
+            omega[i_time, 2] = np.nan
+        else:
+            omega[i_time, 0] = -(C00 * Ldt0 + C01 * Ldt1 + C02 * Ldt2) / determinant
+            omega[i_time, 1] = -(C01 * Ldt0 + C11 * Ldt1 + C12 * Ldt2) / determinant
+            omega[i_time, 2] = -(C02 * Ldt0 + C12 * Ldt1 + C22 * Ldt2) / determinant
+    return
+
+
+_angular_velocity_parallel = parallel_variant(_angular_velocity)
+
+
 #@jit
 def angular_velocity(W):
     """Angular velocity of Waveform
@@ -378,20 +701,128 @@ def angular_velocity(W):
     The vector is given in the (possibly rotating) mode frame (X,Y,Z),
     which is not necessarily equal to the inertial frame (x,y,z).
 
+    This is equivalent to solving `<Ldt> = - <LL> . omega` with the outputs of
+    `LdtVector` and `LLMatrix`, but computes both quantities in a single pass
+    over the data, and evaluates the time derivative of the data from (cached)
+    spline coefficients at each step, rather than storing it for all times.
+    Instants at which `<LL>` is singular (e.g., where the data vanish) give
+    NaN.
+
     """
+    coefficients, derivative_matrix = W._cached_spline_coefficients()
+    lm = W.LM
+    ladder_plus, ladder_minus = _ladder_coefficients(lm)
+    omega = np.empty((W.n_times, 3), dtype=float)
+    select(_angular_velocity, _angular_velocity_parallel, W.n_times)(
+        W.data, coefficients, derivative_matrix.indptr, derivative_matrix.indices, derivative_matrix.data, lm,
+        ladder_plus, ladder_minus, omega)
+    return omega
 
-    # Calculate the <Ldt> vector and <LL> matrix at each instant
-    l = W.LdtVector()
-    ll = W.LLMatrix()
 
-    # Solve <Ldt> = - <LL> . omega
-    omega = -np.linalg.solve(ll, l)
+@kernel
+def _magnus_frame(t, omega_nodes, R0, frame):
+    """Helper function for the frame_from_angular_velocity function
 
-    return omega
+    Each interval `[t[i], t[i+1]]` is divided into `n_substeps` equal substeps, and `omega_nodes[i, 2*k]` and
+    `omega_nodes[i, 2*k+1]` hold the angular velocity at the two Gauss-Legendre nodes of substep `k`.  Each substep
+    multiplies the frame on the left by the exponential of the fourth-order Magnus expansion for `dR/dt = Omega R / 2`,
+    which is a pure quaternion because the commutator of two pure quaternions is twice their cross product.
+
+    """
+    n_substeps = omega_nodes.shape[1] // 2
+    c = sqrt(3.0) / 24.0
+    w = R0[0]
+    x = R0[1]
+    y = R0[2]
+    z = R0[3]
+    frame[0, 0] = w
+    frame[0, 1] = x
+    frame[0, 2] = y
+    frame[0, 3] = z
+    for i in xrange(t.size - 1):
+        h = (t[i + 1] - t[i]) / n_substeps
+        for k in xrange(n_substeps):
+            a0 = omega_nodes[i, 2 * k, 0]
+            a1 = omega_nodes[i, 2 * k, 1]
+            a2 = omega_nodes[i, 2 * k, 2]
+            b0 = omega_nodes[i, 2 * k + 1, 0]
+            b1 = omega_nodes[i, 2 * k + 1, 1]
+            b2 = omega_nodes[i, 2 * k + 1, 2]
+            v0 = 0.25 * h * (a0 + b0) + c * h * h * (b1 * a2 - b2 * a1)
+            v1 = 0.25 * h * (a1 + b1) + c * h * h * (b2 * a0 - b0 * a2)
+            v2 = 0.25 * h * (a2 + b2) + c * h * h * (b0 * a1 - b1 * a0)
+            angle = sqrt(v0 ** 2 + v1 ** 2 + v2 ** 2)
+            e0 = cos(angle)
+            s = sin(angle) / angle if angle > 1e-8 else 1.0 - angle ** 2 / 6.0
+            e1 = s * v0
+            e2 = s * v1
+            e3 = s * v2
+            w, x, y, z = (e0 * w - e1 * x - e2 * y - e3 * z,
+                          e0 * x + e1 * w + e2 * z - e3 * y,
+                          e0 * y - e1 * z + e2 * w + e3 * x,
+                          e0 * z + e1 * y - e2 * x + e3 * w)
+        norm = sqrt(w ** 2 + x ** 2 + y ** 2 + z ** 2)
+        w /= norm
+        x /= norm
+        y /= norm
+        z /= norm
+        frame[i + 1, 0] = w
+        frame[i + 1, 1] = x
+        frame[i + 1, 2] = y
+        frame[i + 1, 3] = z
+    return
+
+
+def _magnus_integration(t, omega_spline, R0, n_substeps):
+    nodes = (np.arange(n_substeps)[:, np.newaxis] + (0.5 + np.array([-1.0, 1.0]) * sqrt(3.0) / 6.0)).ravel()
+    t_nodes = t[:-1, np.newaxis] + np.diff(t)[:, np.newaxis] * (nodes / n_substeps)
+    frame = np.empty((t.size, 4), dtype=float)
+    _magnus_frame(t, omega_spline(t_nodes), quaternion.as_float_array(R0).astype(float), frame)
+    return frame
+
+
+def frame_from_angular_velocity(t, omega, R0=quaternion.one, error_estimate=False):
+    """Integrate sampled angular velocity to find the frame on the same time steps
+
+    This solves `dR/dt = Omega R / 2`, where `Omega` is the angular velocity as a pure quaternion, with the initial
+    condition `R(t[0]) = R0`.  As in `quaternion.quaternion_time_series.integrate_angular_velocity`, the angular
+    velocity is interpolated by a cubic spline; but rather than using an adaptive ODE solver, this takes one
+    fourth-order Magnus step (the exponential of a pure quaternion evaluated from the spline at the two Gauss-Legendre
+    nodes) for each time step of the input, in a compiled loop.  This is very much faster for large data sets, and
+    is accurate whenever the time steps resolve the rotation well.
+
+    Parameters
+    ----------
+    t: array of floats
+        Increasing times at which the angular velocity is sampled, and at which the frame is returned
+    omega: array of floats, shape (t.size, 3)
+        Angular velocity at each time
+    R0: quaternion [defaults to 1]
+        Value of the frame at the first time step
+    error_estimate: bool [defaults to False]
+        If True, the integration is repeated with two steps per time step, and the largest absolute difference in
+        any component of the frame is used to estimate the error of the returned frame, which is returned along
+        with it.  This estimate is comparable to the absolute `tolerance` used by the adaptive solver.
+
+    """
+    from scipy.interpolate import CubicSpline
+    t = np.asarray(t, dtype=float)
+    omega = np.asarray(omega, dtype=float)
+    if t.size < 2:
+        frame = np.array([R0] * t.size)
+        return (frame, 0.0) if error_estimate else frame
+    omega_spline = CubicSpline(t, omega)
+    frame = _magnus_integration(t, omega_spline, R0, 1)
+    if not error_estimate:
+        return quaternion.as_quat_array(frame)
+    # The local error of the fourth-order steps is proportional to h^5, so halving the step reduces the global error
+    # by a factor of 16, and the difference between the two integrations is 15/16 of the error of the first.
+    error = np.max(np.abs(frame - _magnus_integration(t, omega_spline, R0, 2))) * 16.0 / 15.0
+    return quaternion.as_quat_array(frame), error
 
 
 #def corotating_frame(W, Ri=quaternion.one, ti=0.0, tolerance=1e-12):
-def corotating_frame(W, R0=quaternion.one, tolerance=1e-12, z_alignment_region=None):
+def corotating_frame(W, R0=quaternion.one, tolerance=1e-12, z_alignment_region=None, method='adaptive'):
     """Return rotor taking current mode frame into corotating frame
 
     This function simply evaluates the angular velocity of the waveform, and
@@ -414,10 +845,25 @@ def corotating_frame(W, R0=quaternion.one, tolerance=1e-12, z_alignment_region=N
         considered fractions of the inspiral at which to begin and end the average.  For example,
         (0.1, 0.9) would lead to starting 10% of the time from the first time step to the max norm
         time, and ending at 90% of that time.
+    method: {'adaptive', 'magnus'} [defaults to 'adaptive']
+        If 'adaptive', the angular velocity is integrated by an adaptive ODE solver to the given tolerance.  If
+        'magnus', it is integrated on the time steps of the waveform by `frame_from_angular_velocity`, which is much
+        faster for large data sets; a warning is issued if the estimated error of that integration exceeds
+        `tolerance`.
 
     """
     from quaternion.quaternion_time_series import integrate_angular_velocity, squad
-    t, frame = integrate_angular_velocity((W.t, angular_velocity(W)), t0=W.t[0], t1=W.t[-1], R0=R0, tolerance=tolerance)
+    omega = angular_velocity(W)
+    if method == 'adaptive':
+        t, frame = integrate_angular_velocity((W.t, omega), t0=W.t[0], t1=W.t[-1], R0=R0, tolerance=tolerance)
+    elif method == 'magnus':
+        frame, error = frame_from_angular_velocity(W.t, omega, R0=R0, error_estimate=True)
+        if error > tolerance:
+            warnings.warn("Estimated error {0:.3g} of the Magnus integration exceeds the tolerance {1:.3g}; the time "
+                          "steps may be too coarse, and method='adaptive' may be more accurate".format(error,
+                                                                                                      tolerance))
+    else:
+        raise ValueError("Unknown integration method '{0}'; use 'adaptive' or 'magnus'".format(method))
     if z_alignment_region is None:
         correction_rotor = quaternion.one
     else:
@@ -428,14 +874,13 @@ def corotating_frame(W, R0=quaternion.one, tolerance=1e-12, z_alignment_region=N
         i1 = np.argmin(np.abs(W.t-t1))
         i2 = np.argmin(np.abs(W.t-t2))
         R = frame[i1:i2]
-        i1m = max(0, i1-10)
-        i1p = i1m + 21
-        RoughDirection = W[i1m:i1p].angular_velocity()[10]
-        Vhat = W[i1:i2].LLDominantEigenvector(RoughDirection=RoughDirection, RoughDirectionIndex=0)
-        Vhat_corot = np.array([(Ri.conjugate() * quaternion.quaternion(*Vhati) * Ri).vec
-                               for Ri, Vhati in zip(R, Vhat)])
+        # The angular velocity near the start of the region is a rough guess for the sign of the eigenvectors.  The
+        # eigenvectors are computed from a view of the data in the region, and rotated into the corotating frame
+        # all at once, so that no intermediate waveforms are constructed.
+        RoughDirection = omega[min(max(0, i1-10) + 10, W.n_times-1)]
+        Vhat = _dominant_eigenvectors(W.data[i1:i2], W.LM, RoughDirection, 0)
+        Vhat_corot = quaternion.as_vector_part(np.conjugate(R) * quaternion.from_vector_part(Vhat) * R)
         Vhat_corot_mean = quaternion.quaternion(*np.mean(Vhat_corot, axis=0)).normalized()
-        # print(i1, i2, i1m, i1p, RoughDirection, Vhat[0], Vhat_corot[0], Vhat_corot_mean)
-        correction_rotor = np.sqrt_of_rotor(-quaternion.z * Vhat_corot_mean).inverse()
+        correction_rotor = np.sqrt(-quaternion.z * Vhat_corot_mean).inverse()
     # R = squad(R, t, W.t)
     return frame * correction_rotor
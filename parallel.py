@@ -0,0 +1,144 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+"""Compilation and runtime selection of compiled kernels
+
+The compiled (numba) kernels used throughout scri -- norms, rotations, and the angular-momentum operators of
+`scri.mode_calculations` -- are declared with the `kernel` decorator, and come in two variants, compiled from the
+same source:
+
+  * The serial variant.  It releases the GIL (`nogil=True`), so that several waveforms can be processed
+    concurrently by a pool of Python threads.
+  * The parallel variant, compiled with `parallel=True`.  Its loop over time steps is split among numba's worker
+    threads, so that a single long waveform can use every core of a node.
+
+Neither variant is compiled when scri is imported.  Each is compiled the first time it is called with a given
+combination of argument types, and the result is cached on disk (in `__pycache__`, or in the directory given by the
+`NUMBA_CACHE_DIR` environment variable if that is not writable), so that later processes load the machine code
+rather than compiling again.  Note that numba only invalidates this cache when the file defining the kernel changes;
+after upgrading numba's dependencies, the cache may be cleared by deleting the `*.nbi` and `*.nbc` files.
+
+By default, the serial variants are used.  Call `set_parallel(True)` to use the parallel variants, and
+`set_num_threads` to choose how many threads they use.  These settings are global -- they apply to kernels called
+from any Python thread -- and are consulted each time a kernel is called.  For small data sets, the overhead of
+starting the threads may exceed the time they save; how small depends on the machine, so no threshold is applied by
+default, but `set_minimum_parallel_size` can be used to keep the serial variants for data sets with fewer time steps
+than a value found by timing both variants on the machine in question.  When processing many waveforms in a Python
+thread pool, the serial kernels are usually best.
+
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import types
+from quaternion.numba_wrapper import xrange, GOT_NUMBA
+
+if GOT_NUMBA:
+    import numba
+    from numba import prange
+else:
+    prange = xrange
+
+_use_parallel = False
+_minimum_parallel_size = 0
+_num_threads = None
+
+
+def kernel(function):
+    """Decorator compiling a function as a GIL-releasing numba kernel
+
+    Compilation is lazy and cached on disk, as described in the module docstring.  Without numba, the input is
+    returned unchanged.
+
+    """
+    if not GOT_NUMBA:
+        return function
+    return numba.njit(nogil=True, cache=True)(function)
+
+
+def parallel_variant(kernel):
+    """Return a multi-threaded variant of a compiled kernel
+
+    The input should be a numba-compiled function whose outer loop over time steps uses `prange`; the same Python
+    source is recompiled with `parallel=True` and `nogil=True`.  Like `kernel`, this happens lazily, and the result is
+    cached on disk.  Without numba, the input is returned unchanged.
+
+    """
+    if not GOT_NUMBA:
+        return kernel
+    function = getattr(kernel, 'py_func', kernel)
+    # numba's on-disk cache is keyed by the function's qualified name, and not by the compilation options, so the
+    # parallel variant must be compiled from a renamed copy of the function to get its own cache entry.
+    variant = types.FunctionType(function.__code__, function.__globals__, function.__name__ + '_parallel',
+                                 function.__defaults__, function.__closure__)
+    variant.__qualname__ = function.__qualname__ + '_parallel'
+    variant.__doc__ = function.__doc__
+    return numba.njit(nogil=True, parallel=True, cache=True)(variant)
+
+
+def set_parallel(use_parallel=True, num_threads=None):
+    """Choose whether multi-threaded kernels are used, and optionally how many threads they use
+
+    Returns the previous setting.
+
+    """
+    global _use_parallel
+    previous = _use_parallel
+    _use_parallel = bool(use_parallel) and GOT_NUMBA
+    if num_threads is not None:
+        set_num_threads(num_threads)
+    return previous
+
+
+def get_parallel():
+    """Return True if multi-threaded kernels are used for sufficiently large data sets"""
+    return _use_parallel
+
+
+def set_minimum_parallel_size(n_times):
+    """Set the smallest number of time steps for which multi-threaded kernels are used; returns the previous value"""
+    global _minimum_parallel_size
+    previous = _minimum_parallel_size
+    _minimum_parallel_size = int(n_times)
+    return previous
+
+
+def get_minimum_parallel_size():
+    return _minimum_parallel_size
+
+
+def set_num_threads(num_threads):
+    """Set the number of threads used by multi-threaded kernels
+
+    This cannot exceed the number of threads numba was started with, which is controlled by the `NUMBA_NUM_THREADS`
+    environment variable and defaults to the number of cores.  Unlike `numba.set_num_threads`, which only affects
+    the calling thread, this setting applies to kernels called from any thread: `select` applies it in the calling
+    thread before returning a parallel variant.  Returns the previous value.
+
+    """
+    global _num_threads
+    if not GOT_NUMBA:
+        return 1
+    previous = get_num_threads()
+    numba.set_num_threads(int(num_threads))
+    _num_threads = int(num_threads)
+    return previous
+
+
+def get_num_threads():
+    """Return the number of threads used by multi-threaded kernels"""
+    if not GOT_NUMBA:
+        return 1
+    if _num_threads is not None:
+        return _num_threads
+    return numba.get_num_threads()
+
+
+def select(serial, parallel, n_times):
+    """Return the kernel variant to be used for data with `n_times` time steps, given the current settings"""
+    if _use_parallel and n_times >= _minimum_parallel_size:
+        # numba's thread count is thread-local, so the global setting is applied in the calling thread
+        if _num_threads is not None and numba.get_num_threads() != _num_threads:
+            numba.set_num_threads(_num_threads)
+        return parallel
+    return serial
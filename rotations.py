@@ -7,14 +7,15 @@ import math
 import numpy as np
 import quaternion
 import spherical_functions as sf
-from quaternion.numba_wrapper import njit, xrange
+from quaternion.numba_wrapper import xrange
 from .waveform_base import waveform_alterations
+from .parallel import prange, kernel, parallel_variant, select
 from .mode_calculations import corotating_frame, angular_velocity, LLDominantEigenvector
 from . import Coprecessing, Coorbital, Corotating, Inertial
 
 
 @waveform_alterations
-def to_corotating_frame(W, R0=quaternion.one, tolerance=1e-12, z_alignment_region=None):
+def to_corotating_frame(W, R0=quaternion.one, tolerance=1e-12, z_alignment_region=None, method='adaptive'):
     """Transform waveform in place to a corotating frame
 
     Parameters
@@ -31,9 +32,11 @@ def to_corotating_frame(W, R0=quaternion.one, tolerance=1e-12, z_alignment_regio
         considered fractions of the inspiral at which to begin and end the average.  For example,
         (0.1, 0.9) would lead to starting 10% of the time from the first time step to the max norm
         time, and ending at 90% of that time.
+    method: {'adaptive', 'magnus'} [defaults to 'adaptive']
+        Method used to integrate the angular velocity; see `scri.mode_calculations.corotating_frame`
 
     """
-    frame = corotating_frame(W, R0=R0, tolerance=tolerance, z_alignment_region=z_alignment_region)
+    frame = corotating_frame(W, R0=R0, tolerance=tolerance, z_alignment_region=z_alignment_region, method=method)
     # if z_alignment_region is None:
     #     correction_rotor = quaternion.one
     # else:
@@ -55,7 +58,8 @@ def to_corotating_frame(W, R0=quaternion.one, tolerance=1e-12, z_alignment_regio
     #     correction_rotor = np.sqrt_of_rotor(-quaternion.z * Vhat_corot_mean).inverse()
     # W.rotate_decomposition_basis(frame * correction_rotor)
     W.rotate_decomposition_basis(frame)
-    W._append_history('{0}.to_corotating_frame({1}, {2}, {3})'.format(W, R0, tolerance, z_alignment_region))
+    W._append_history('{0}.to_corotating_frame({1}, {2}, {3}, method={4!r})'.format(W, R0, tolerance,
+                                                                                   z_alignment_region, method))
     W.frameType = Corotating
     return W
 
@@ -245,10 +249,17 @@ def rotate_decomposition_basis(W, R_basis):
     the decomposition basis of the modes in the Waveform.  The change
     in basis is also recorded in the Waveform's `frame` data.
 
+    If `W` shares its data with a slice (or is itself a slice), the
+    data are copied before being rotated, so that the other object is
+    not affected.
+
     For more information on the analytical details, see
     http://moble.github.io/spherical_functions/SWSHs.html#rotating-swshs
 
     """
+    # The data are altered in place below, so make sure they are not shared with a slice
+    W._copy_on_write()
+
     # This will be used in the jitted functions below to store the
     # Wigner D matrix at each time step
     D = np.empty((sf.WignerD._total_size_D_matrices(W.ell_min, W.ell_max),), dtype=complex)
@@ -262,7 +273,8 @@ def rotate_decomposition_basis(W, R_basis):
         if (W.n_times != len(R_basis)):
             raise ValueError(
                 "Input dimension mismatch.  (W.n_times={0}) != (len(R_basis)={1})".format(W.n_times, len(R_basis)))
-        _rotate_decomposition_basis_by_series(W.data, quaternion.as_spinor_array(R_basis), W.ell_min, W.ell_max, D)
+        select(_rotate_decomposition_basis_by_series, _rotate_decomposition_basis_by_series_parallel, W.n_times)(
+            W.data, quaternion.as_spinor_array(R_basis), W.ell_min, W.ell_max, D)
 
         # Update the frame data, using right-multiplication
         if (W.frame.size):
@@ -280,7 +292,8 @@ def rotate_decomposition_basis(W, R_basis):
     if (isinstance(R_basis, np.quaternion)):
         sf._Wigner_D_matrices(R_basis.a, R_basis.b, W.ell_min, W.ell_max, D)
         tmp = np.empty((2 * W.ell_max + 1,), dtype=complex)
-        _rotate_decomposition_basis_by_constant(W.data, W.ell_min, W.ell_max, D, tmp)
+        select(_rotate_decomposition_basis_by_constant, _rotate_decomposition_basis_by_constant_parallel, W.n_times)(
+            W.data, W.ell_min, W.ell_max, D, tmp)
 
         # Update the frame data, using right-multiplication
         if (W.frame.size):
@@ -298,7 +311,7 @@ def rotate_decomposition_basis(W, R_basis):
     return W
 
 
-@njit('void(c16[:,:], i8, i8, c16[:], c16[:])')
+@kernel
 def _rotate_decomposition_basis_by_constant(data, ell_min, ell_max, D, tmp):
     """Rotate data by the same rotor at each point in time
 
@@ -322,7 +335,7 @@ def _rotate_decomposition_basis_by_constant(data, ell_min, ell_max, D, tmp):
                 data[i_t, i_data + i_m] = tmp[i_m]
 
 
-@njit('void(c16[:,:], c16[:,:], i8, i8, c16[:])')
+@kernel
 def _rotate_decomposition_basis_by_series(data, R_basis, ell_min, ell_max, D):
     """Rotate data by a different rotor at each point in time
 
@@ -345,3 +358,52 @@ def _rotate_decomposition_basis_by_series(data, R_basis, ell_min, ell_max, D):
                 D[i_D + i_m] = new_data_mp
             for i_m in xrange(2 * ell + 1):
                 data[i_t, i_data + i_m] = D[i_D + i_m]
+
+
+def _rotate_decomposition_basis_by_constant_threaded(data, ell_min, ell_max, D, tmp):
+    """Multi-threaded equivalent of `_rotate_decomposition_basis_by_constant`
+
+    The input `tmp` is ignored; each time step uses its own workspace, so that the time steps can be processed
+    concurrently.
+
+    """
+    for i_t in prange(data.shape[0]):
+        tmp_t = np.empty((2 * ell_max + 1,), dtype=np.complex128)
+        for ell in xrange(ell_min, ell_max + 1):
+            i_data = ell ** 2 - ell_min ** 2
+            i_D = sf._linear_matrix_offset(ell, ell_min)
+
+            for i_m in xrange(2 * ell + 1):
+                tmp_t[i_m] = 0j
+            for i_mp in xrange(2 * ell + 1):
+                for i_m in xrange(2 * ell + 1):
+                    tmp_t[i_m] += data[i_t, i_data + i_mp] * D[i_D + (2 * ell + 1) * i_mp + i_m]
+            for i_m in xrange(2 * ell + 1):
+                data[i_t, i_data + i_m] = tmp_t[i_m]
+
+
+def _rotate_decomposition_basis_by_series_threaded(data, R_basis, ell_min, ell_max, D):
+    """Multi-threaded equivalent of `_rotate_decomposition_basis_by_series`
+
+    The input `D` is used only for its size; each time step uses its own workspace, so that the time steps can be
+    processed concurrently.
+
+    """
+    for i_t in prange(data.shape[0]):
+        D_t = np.empty_like(D)
+        sf._Wigner_D_matrices(R_basis[i_t, 0], R_basis[i_t, 1], ell_min, ell_max, D_t)
+        for ell in xrange(ell_min, ell_max + 1):
+            i_data = ell ** 2 - ell_min ** 2
+            i_D = sf._linear_matrix_offset(ell, ell_min)
+
+            for i_m in xrange(2 * ell + 1):
+                new_data_mp = 0j
+                for i_mp in xrange(2 * ell + 1):
+                    new_data_mp += data[i_t, i_data + i_mp] * D_t[i_D + i_m + (2 * ell + 1) * i_mp]
+                D_t[i_D + i_m] = new_data_mp
+            for i_m in xrange(2 * ell + 1):
+                data[i_t, i_data + i_m] = D_t[i_D + i_m]
+
+
+_rotate_decomposition_basis_by_constant_parallel = parallel_variant(_rotate_decomposition_basis_by_constant_threaded)
+_rotate_decomposition_basis_by_series_parallel = parallel_variant(_rotate_decomposition_basis_by_series_threaded)
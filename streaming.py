@@ -0,0 +1,205 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+"""Incremental angular velocity and corotating frame for data that arrive in pieces
+
+When monitoring a running simulation, new samples of the waveform are appended every so often, and recomputing
+`angular_velocity` and `corotating_frame` over the full history each time costs O(n_times) per update.  The
+`CorotatingFrameStream` object defined here instead keeps the state needed to extend both quantities over newly
+appended samples only, at a cost proportional to the number of new samples.
+
+The batch computations are not strictly local: the derivative of the data is that of the not-a-knot cubic spline
+through all the data, and the frame is integrated from a cubic spline through all of the angular velocity (see
+`scri.mode_calculations.frame_from_angular_velocity`).  However, the influence of any sample on the spline decays by
+a factor of roughly 2-sqrt(3) = 0.27 per time step, so these splines can be computed over a window extending
+`margin` steps to either side of the samples of interest with results that agree with the batch computation to
+roundoff for the default `margin`.  The cost of this is a lag: a value of the angular velocity is only final once
+`margin` more samples have arrived, and a value of the frame once `2*margin` more samples have arrived.  When the
+data are complete, `finalize` computes the remaining values, using the same end conditions as the batch computation.
+
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import quaternion
+import spherical_functions as sf
+
+from .differentiation import DerivativePlan
+from .mode_calculations import _angular_velocity, _ladder_coefficients, _magnus_integration
+
+
+class CorotatingFrameStream(object):
+    """Angular velocity and corotating frame of modes, extended incrementally as data are appended
+
+    The results agree with `angular_velocity(W)` and `corotating_frame(W, R0, method='magnus')` for the waveform `W`
+    made of all the appended data (though the z-alignment of `corotating_frame` is not available, since it requires
+    the full inspiral).
+
+    Parameters
+    ----------
+    ell_min, ell_max : int
+        Range of ell values of the modes, which are ordered as in `WaveformModes`.
+    R0 : quaternion, optional
+        Value of the frame at the first time step.  Default is 1.
+    margin : int, optional
+        Number of time steps beyond which the influence of the end of the data on the splines is ignored; see the
+        module documentation.  Default is 32.
+
+    Attributes
+    ----------
+    t, omega, frame : arrays
+        Times, angular velocity, and frame at the time steps for which the frame is final.  The latest values of the
+        angular velocity, which may not have a final frame yet, are given by `t_omega` and `omega_latest`.
+
+    """
+
+    def __init__(self, ell_min, ell_max, R0=quaternion.one, margin=32):
+        if margin < 4:
+            raise ValueError("Input `margin` must be at least 4; got {0}".format(margin))
+        self.ell_min = ell_min
+        self.ell_max = ell_max
+        self.margin = margin
+        self.LM = sf.LM_range(ell_min, ell_max)
+        self._ladder_plus, self._ladder_minus = _ladder_coefficients(self.LM)
+        self._R = R0
+        self.finalized = False
+        # Total numbers of samples received, with final angular velocity, and with final frame
+        self._n_times = 0
+        self._n_omega = 0
+        self._n_frame = 0
+        # Data from index `_data_offset`, and angular velocity from index `_omega_offset`, to the latest
+        self._data_offset = 0
+        self._t_data = np.empty((0,), dtype=float)
+        self._data = np.empty((0, self.LM.shape[0]), dtype=complex)
+        self._omega_offset = 0
+        self._t_omega = np.empty((0,), dtype=float)
+        self._omega = np.empty((0, 3), dtype=float)
+        # Final results, in chunks
+        self._chunks = []
+
+    @property
+    def n_times(self):
+        """Number of time steps for which the frame is final"""
+        return self._n_frame
+
+    @property
+    def t(self):
+        return self._concatenated(0, (0,))
+
+    @property
+    def omega(self):
+        return self._concatenated(1, (0, 3))
+
+    @property
+    def frame(self):
+        return quaternion.as_quat_array(self._concatenated(2, (0, 4)))
+
+    @property
+    def t_omega(self):
+        """Times at which the angular velocity is final, beginning with the first time step without a final frame"""
+        return self._t_omega[self._n_frame - self._omega_offset:]
+
+    @property
+    def omega_latest(self):
+        """Final angular velocity at the times `t_omega`"""
+        return self._omega[self._n_frame - self._omega_offset:]
+
+    def _concatenated(self, i, empty_shape):
+        if not self._chunks:
+            return np.empty(empty_shape, dtype=float)
+        if len(self._chunks) > 1:
+            self._chunks = [tuple(np.concatenate([chunk[j] for chunk in self._chunks]) for j in range(3))]
+        return self._chunks[0][i]
+
+    def append(self, t, data):
+        """Append new samples, and extend the angular velocity and frame as far as possible
+
+        Parameters
+        ----------
+        t : float array
+            New times, which must be increasing and later than any previous times.
+        data : complex array
+            Mode data at the new times, with shape `(t.size, n_modes)`.
+
+        Returns
+        -------
+        t, omega, frame : arrays
+            Times, angular velocity, and frame of the time steps whose frame became final with this call.
+
+        """
+        if self.finalized:
+            raise ValueError("Cannot append data to a finalized CorotatingFrameStream")
+        t = np.asarray(t, dtype=float)
+        data = np.asarray(data, dtype=complex)
+        if t.ndim != 1 or data.shape != (t.size, self.LM.shape[0]):
+            raise ValueError("Input `data` must have shape (t.size, n_modes)=({0}, {1}); got {2}".format(
+                t.size, self.LM.shape[0], data.shape))
+        if np.any(np.diff(t) <= 0) or (t.size > 0 and self._t_data.size > 0 and t[0] <= self._t_data[-1]):
+            raise ValueError("Input `t` must be increasing, and later than any previous times")
+        self._t_data = np.concatenate((self._t_data, t))
+        self._data = np.concatenate((self._data, data))
+        self._n_times += t.size
+        return self._update(self._n_times - self.margin, self._n_times - 2 * self.margin)
+
+    def finalize(self):
+        """Compute the angular velocity and frame at all remaining time steps, after the last data are appended
+
+        Returns
+        -------
+        t, omega, frame : arrays
+            Times, angular velocity, and frame of the time steps whose frame became final with this call.
+
+        """
+        if self._n_times < 4:
+            raise ValueError("At least 4 time steps are needed; got {0}".format(self._n_times))
+        self.finalized = True
+        return self._update(self._n_times, self._n_times)
+
+    def _update(self, n_omega, n_frame):
+        margin = self.margin
+        # Extend the angular velocity, using the spline through the data within `margin` steps of the new values
+        if n_omega > self._n_omega:
+            window = DerivativePlan(self._t_data)
+            coefficients = window.spline_coefficients(self._data)
+            i1 = self._n_omega - self._data_offset
+            i2 = n_omega - self._data_offset
+            matrix = window.matrix[i1:i2]
+            omega = np.empty((i2 - i1, 3), dtype=float)
+            _angular_velocity(self._data[i1:i2], coefficients, matrix.indptr, matrix.indices, matrix.data, self.LM,
+                              self._ladder_plus, self._ladder_minus, omega)
+            self._t_omega = np.concatenate((self._t_omega, self._t_data[i1:i2]))
+            self._omega = np.concatenate((self._omega, omega))
+            self._n_omega = n_omega
+            # Only the last `margin` data before the first value without final angular velocity are still needed
+            self._discard_data(max(0, n_omega - margin))
+        # Extend the frame, using the spline through the angular velocity within `margin` steps of the new values
+        n_frame = min(n_frame, self._n_omega)
+        if n_frame <= self._n_frame:
+            return np.empty((0,), dtype=float), np.empty((0, 3), dtype=float), np.empty((0,), dtype=np.quaternion)
+        from scipy.interpolate import CubicSpline
+        i0 = max(0, self._n_frame - 1) - self._omega_offset
+        i2 = n_frame - self._omega_offset
+        omega_spline = CubicSpline(self._t_omega, self._omega)
+        frame = _magnus_integration(self._t_omega[i0:i2], omega_spline, self._R, 1)
+        if self._n_frame > 0:
+            frame = frame[1:]  # The first step begins at the last final value
+        i1 = self._n_frame - self._omega_offset
+        chunk = (self._t_omega[i1:i2], self._omega[i1:i2], frame)
+        self._chunks.append(chunk)
+        self._R = quaternion.quaternion(*frame[-1])
+        self._n_frame = n_frame
+        self._discard_omega(max(0, n_frame - 1 - margin))
+        return chunk[0], chunk[1], quaternion.as_quat_array(chunk[2])
+
+    def _discard_data(self, n):
+        if n > self._data_offset:
+            self._t_data = self._t_data[n - self._data_offset:].copy()
+            self._data = self._data[n - self._data_offset:].copy()
+            self._data_offset = n
+
+    def _discard_omega(self, n):
+        if n > self._omega_offset:
+            self._t_omega = self._t_omega[n - self._omega_offset:].copy()
+            self._omega = self._omega[n - self._omega_offset:].copy()
+            self._omega_offset = n
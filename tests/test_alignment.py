@@ -0,0 +1,75 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import quaternion
+import spherical_functions as sf
+import pytest
+import scri
+from scri import alignment
+
+
+def chirp_waveform(t, ell_max=4):
+    """Quasicircular-looking modes with slowly increasing frequency and amplitude"""
+    LM = sf.LM_range(2, ell_max)
+    phase = 0.05 * t + 0.0001 * t ** 2
+    amplitude = 1 + 0.002 * t
+    data = np.zeros((t.size, LM.shape[0]), dtype=complex)
+    for i, (ell, m) in enumerate(LM):
+        if m != 0:
+            a = 1.0 if (ell, abs(m)) == (2, 2) else 0.1 / ell
+            data[:, i] = a * amplitude * np.exp(-1j * m * phase + 0.3j * ell)
+    return scri.WaveformModes(t=t, frame=np.array([], dtype=np.quaternion), data=data, ell_min=2, ell_max=ell_max,
+                              history=['# Called from chirp_waveform'], frameType=scri.Inertial,
+                              dataType=scri.h, r_is_scaled_out=True, m_is_scaled_out=True)
+
+
+def test_rotation_helpers():
+    np.random.seed(1234)
+    W = chirp_waveform(np.linspace(0.0, 10.0, num=5))
+    W.data += np.random.normal(size=W.data.shape)
+    R = quaternion.from_rotation_vector([0.3, -0.2, 1.1])
+    rotated = alignment._rotate(W.data, alignment._rotation_blocks(R, W.ell_min, W.ell_max))
+    W.rotate_physical_system(R)
+    assert np.allclose(rotated, W.data, rtol=1e-14, atol=1e-14)
+    for a, b in [([0, 0, 1], [0.6, 0, 0.8]), ([1, 0, 0], [1, 0, 0]), ([0, 0, 1], [0, 0, -1])]:
+        R = alignment._rotor_between(np.array(a, dtype=float), np.array(b, dtype=float))
+        assert np.allclose(quaternion.as_vector_part(R * quaternion.from_vector_part(a) * R.conjugate()), b)
+    v, dv = np.array([0.4, -1.0, 0.7]), 1e-7 * np.array([0.3, 0.5, -0.2])
+    J = alignment._left_jacobian(v)
+    difference = quaternion.from_rotation_vector(v + dv) * quaternion.from_rotation_vector(v).conjugate()
+    assert np.allclose(quaternion.as_rotation_vector(difference), J.dot(dv), rtol=1e-6, atol=1e-14)
+
+
+def test_time_shift_candidates():
+    t = np.linspace(0.0, 100.0, num=1001)
+    norm_moving = 1.0 + np.exp(-(t - 60.0) ** 2 / 10.0)
+    norm_fixed = norm_moving[400:700]
+    candidates, differences = alignment._time_shift_candidates(norm_fixed, norm_moving, 5)
+    brute_force = np.array([np.sum((norm_fixed - norm_moving[k:k + 300]) ** 2) for k in range(702)])
+    assert np.allclose(differences, brute_force, rtol=1e-10, atol=1e-10)
+    assert candidates[0] == 400
+
+
+def test_alignment():
+    t = np.linspace(0.0, 1000.0, num=4001)
+    W_fixed = chirp_waveform(t)
+    delta_t, R = 13.7, quaternion.from_rotation_vector([0.3, -0.2, 1.1])
+    W_moving = chirp_waveform(t + delta_t)
+    W_moving.t = t
+    W_moving.rotate_physical_system(R.conjugate())
+    delta_t_found, R_found, cost = alignment.get_alignment(W_fixed, W_moving, 300.0, 700.0)
+    assert abs(delta_t_found + delta_t) < 1e-6
+    assert min((R_found - R).abs(), (R_found + R).abs()) < 1e-7
+    assert cost < 1e-12
+    W_aligned = W_moving.copy()
+    assert W_aligned.align(W_fixed, 300.0, 700.0) == cost
+    assert np.allclose(W_aligned.t, t + delta_t, rtol=0, atol=1e-6)
+    W_check = W_fixed.interpolate(np.linspace(400.0, 600.0, num=101))
+    assert np.allclose(W_aligned.interpolate(W_check.t).data, W_check.data, rtol=1e-6, atol=1e-6)
+    with pytest.raises(ValueError):
+        alignment.get_alignment(W_fixed, W_moving[:, :3], 300.0, 700.0)
+    with pytest.raises(ValueError):
+        alignment.get_alignment(W_fixed, W_moving, 300.0, 1200.0)
@@ -0,0 +1,61 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import quaternion
+import pytest
+import scri
+from scri.differentiation import derivative
+
+from conftest import random_waveform
+
+
+def test_derivative_engines():
+    np.random.seed(1234)
+    t = np.sort(np.random.uniform(0, 10, size=400))
+    f = np.exp(1j * t) * np.sin(0.3 * t)
+    f_dot = 1j * f + 0.3 * np.exp(1j * t) * np.cos(0.3 * t)
+    data = np.outer(f, np.arange(1, 4))
+    data_dot = np.outer(f_dot, np.arange(1, 4))
+    # The spline engine reproduces the per-column splines of `quaternion.calculus.derivative`
+    assert np.allclose(derivative(t, data), quaternion.calculus.derivative(data, t), rtol=1e-9, atol=1e-9)
+    assert np.allclose(derivative(t, data), data_dot, rtol=1e-4, atol=1e-4)
+    errors = [np.max(np.abs(derivative(t, data, 'finite_difference', order) - data_dot)) for order in [2, 4, 6]]
+    assert errors[0] > errors[1] > errors[2]
+    assert errors[2] < 1e-6
+    t_uniform = np.linspace(0, 2 * np.pi, 256, endpoint=False)
+    g = np.exp(3j * t_uniform)[:, np.newaxis] * np.ones((1, 2))
+    assert np.allclose(derivative(t_uniform, g, 'spectral'), 3j * g, rtol=1e-12, atol=1e-12)
+    with pytest.raises(ValueError):
+        derivative(t, data, 'spectral')
+    with pytest.raises(ValueError):
+        derivative(t, data, 'magic')
+    assert derivative(t, data.astype(np.complex64)).dtype == np.complex64
+
+
+def test_cached_data_dot():
+    w = random_waveform()
+    data_dot = w.data_dot
+    assert np.allclose(data_dot, quaternion.calculus.derivative(w.data, w.t), rtol=1e-9, atol=1e-9)
+    assert w.data_dot is data_dot
+    assert not data_dot.flags.writeable
+    w.data *= 2  # Altering the data in place invalidates the cache
+    assert w.data_dot is not data_dot
+    assert np.allclose(w.data_dot, 2 * data_dot, rtol=1e-12, atol=1e-12)
+    w.t = w.t * 2
+    assert np.allclose(w.data_dot, data_dot, rtol=1e-12, atol=1e-12)
+    assert w.copy().data_dot is not w.data_dot
+    data_dot = w.data_dot
+    w.rotate_decomposition_basis(quaternion.x)  # Altering the data in place by scri also invalidates the cache
+    assert w.data_dot is not data_dot
+    assert np.allclose(w.data_dot, quaternion.calculus.derivative(w.data, w.t), rtol=1e-9, atol=1e-9)
+    fd = w.derivative('finite_difference', 6)
+    assert fd is w.derivative('finite_difference', 6)
+    assert fd is not w.data_dot
+    i1, i2 = w.index(3, -3), w.index(4, 4) + 1
+    assert np.array_equal(w.derivative(ell_min=3, ell_max=4), w.data_dot[:, i1:i2])
+    assert np.array_equal(w.derivative(ell_min=7), w.data_dot[:, w.index(7, -7):])
+    with pytest.raises(ValueError):
+        w.derivative(ell_min=1)
@@ -0,0 +1,91 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import copy
+import pickle
+import numpy as np
+import pytest
+import scri
+from scri.history import WaveformHistory
+
+from conftest import linear_waveform
+
+
+def test_history_list_behavior():
+    h = WaveformHistory(['a', 'b'])
+    h += ['c']
+    h.append('d')
+    assert len(h) == 4
+    assert h == ['a', 'b', 'c', 'd']
+    assert h[0] == 'a'
+    assert h[-1] == 'd'
+    assert h[1:3] == ['b', 'c']
+    assert h.pop() == 'd'
+    assert list(h) == ['a', 'b', 'c']
+    assert (h + ['e'])[-1] == 'e'
+    assert len(h) == 3
+    assert 'b' in h
+    with pytest.raises(IndexError):
+        h[3]
+
+
+def test_history_structural_sharing():
+    h1 = WaveformHistory(['line {0}'.format(i) for i in range(1000)])
+    h2 = copy.deepcopy(h1)
+    assert h2._head is h1._head
+    h2 += ['only in h2']
+    h1 += ['only in h1']
+    assert h1[-1] == 'only in h1'
+    assert h2[-1] == 'only in h2'
+    assert h1[:1000] == h2[:1000]
+    h2.pop()
+    h2.pop()
+    assert h2 == h1[:999]
+
+
+def test_history_compaction_and_max_length():
+    h = WaveformHistory()
+    for i in range(3 * WaveformHistory.compaction_depth):
+        h.append(str(i))
+    assert h._head.depth <= WaveformHistory.compaction_depth
+    assert list(h) == [str(i) for i in range(3 * WaveformHistory.compaction_depth)]
+
+    # The depth stays proportional to the length, and the number of compactions grows only logarithmically
+    h = WaveformHistory()
+    n_compactions = 0
+    for i in range(100000):
+        h.append(str(i))
+        assert h._head.depth <= max(WaveformHistory.compaction_depth, WaveformHistory.compaction_fraction * len(h))
+        n_compactions += (i > 0 and h._head.depth == 1)
+    assert n_compactions < 30
+    assert h[12345] == '12345'
+
+    h = WaveformHistory(max_length=100)
+    for i in range(1000):
+        h.append(str(i))
+        assert len(h) <= 100
+    assert h[-1] == '999'
+    assert h[0].startswith('# [')
+
+
+def test_history_pickling():
+    h = WaveformHistory(['a'])
+    h += ['b', 'c']
+    h2 = pickle.loads(pickle.dumps(h))
+    assert h2 == h
+    assert h2._head.depth == 1
+
+
+def test_waveform_history_is_shared(linear_waveform):
+    W = linear_waveform
+    for i in range(100):
+        W._append_history('# extra line {0}'.format(i))
+    W2 = W[10:20]
+    assert W2.history[:len(W.history)] == list(W.history)
+    W2._append_history('# W2 only')
+    assert W2.history[-1] == '# W2 only'
+    assert '# W2 only' not in W.history
+    W3 = W.copy()
+    assert W3.history[:len(W.history)] == list(W.history)
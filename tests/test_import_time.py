@@ -0,0 +1,48 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import os
+import sys
+import subprocess
+
+# Time allowed for `import scri` in a fresh process, once its dependencies have been imported.  Compiling the numba
+# kernels eagerly took several seconds; importing scri itself should take a small fraction of a second.
+maximum_import_time = 2.0
+
+import_script = """
+import time
+import numpy, scipy.sparse.linalg, scipy.interpolate, quaternion, spherical_functions
+try:
+    import numba
+except ImportError:
+    numba = None
+t0 = time.time()
+import scri
+import_time = time.time() - t0
+compiled = []
+if numba is not None:
+    for module in [scri.waveform_base, scri.mode_calculations, scri.rotations]:
+        for name, value in vars(module).items():
+            if (isinstance(value, numba.core.registry.CPUDispatcher) and value.py_func.__module__ == module.__name__
+                    and value.signatures):
+                compiled.append('{0}.{1}'.format(module.__name__, name))
+print(import_time)
+print(' '.join(['compiled:'] + compiled))
+"""
+
+
+def run_import_script():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    output = subprocess.check_output([sys.executable, '-c', import_script], env=env,
+                                     stderr=subprocess.DEVNULL).decode()
+    import_time, compiled = output.strip().split('\n')[-2:]
+    return float(import_time), compiled.split()[1:]
+
+
+def test_import_time():
+    import_times, compiled = zip(*[run_import_script() for i in range(2)])
+    assert compiled[-1] == [], "Kernels compiled during import: {0}".format(compiled[-1])
+    assert min(import_times) < maximum_import_time, "`import scri` took {0:.3f} seconds".format(min(import_times))
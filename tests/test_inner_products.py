@@ -0,0 +1,92 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import quaternion
+import spherical_functions as sf
+import pytest
+import scri
+from scri import inner_products
+
+
+def chirp_waveform(t, t_c=0.0, phase=0.0, omega=0.4, sigma=30.0, ell_max=3, seed=1234):
+    """Modes with Gaussian envelopes, which vanish smoothly at both ends of the data"""
+    np.random.seed(seed)
+    LM = sf.LM_range(2, ell_max)
+    amplitudes = np.random.normal(size=(LM.shape[0], 2)).view(complex)[:, 0]
+    envelope = np.exp(-(t - t_c) ** 2 / (2 * sigma ** 2))
+    data = np.array([a * envelope * np.exp(-1j * m * (omega + 0.002 * (t - t_c)) * (t - t_c) + 1j * phase)
+                     for a, (ell, m) in zip(amplitudes, LM)]).T
+    return scri.WaveformModes(t=t, frame=np.array([], dtype=np.quaternion), data=data, ell_min=2, ell_max=ell_max,
+                              history=['# Called from chirp_waveform'], frameType=scri.Inertial,
+                              dataType=scri.h, r_is_scaled_out=True, m_is_scaled_out=True)
+
+
+def test_modes_inner_product_and_match():
+    t = np.linspace(-300.0, 300.0, num=3001)
+    dt = t[1] - t[0]
+    a = chirp_waveform(t)
+    b = chirp_waveform(t, seed=5678)
+    # With white noise, the inner product is the time-domain inner product (Parseval's theorem)
+    expected = np.sum(a.data * np.conjugate(b.data)).real * dt
+    assert np.isclose(inner_products.inner_product(a, b), expected, rtol=1e-10, atol=1e-12)
+    assert np.isclose(inner_products.match(a, a), 1.0, rtol=1e-12)
+    # Time and phase shifts are maximized over
+    shifted = chirp_waveform(t, t_c=10 * dt, phase=0.7)
+    assert np.isclose(inner_products.match(a, shifted), 1.0, rtol=1e-10)
+    assert inner_products.mismatch(a, shifted) < 1e-10
+    assert np.isclose(inner_products.match(a, chirp_waveform(t, phase=0.7), maximize=False), np.cos(0.7), rtol=1e-10)
+    assert inner_products.match(a, shifted, maximize=False) < 0.9
+    assert inner_products.match(a, b) < 0.9
+    with pytest.raises(ValueError):
+        inner_products.match(a, chirp_waveform(t + 1.0))
+    with pytest.raises(ValueError):
+        inner_products.match(a, chirp_waveform(t, ell_max=4))
+
+
+def test_match_matrix_and_caching():
+    t = np.linspace(-300.0, 300.0, num=2000)
+    waveforms = [chirp_waveform(t, t_c=3.0 * i, phase=0.3 * i, seed=i % 2, omega=0.4 + 0.01 * i) for i in range(5)]
+    psd = (np.linspace(0.0, 1.0, num=50), 1.0 + np.linspace(0.0, 1.0, num=50) ** 2)
+    matches = inner_products.match_matrix(waveforms, psd=psd, f_max=0.5)
+    assert matches.shape == (5, 5)
+    assert np.allclose(np.diag(matches), 1.0, rtol=1e-12)
+    assert np.allclose(matches, matches.T, rtol=1e-10)
+    for i, j in [(0, 1), (2, 4), (3, 0)]:
+        assert np.isclose(matches[i, j], inner_products.match(waveforms[i], waveforms[j], psd=psd, f_max=0.5),
+                          rtol=1e-12)
+    assert np.allclose(inner_products.match_matrix(waveforms[:2], waveforms, psd=psd, f_max=0.5, chunk_size=2),
+                       matches[:2], rtol=1e-12)
+    assert np.allclose(inner_products.mismatch_matrix(waveforms, psd=psd, f_max=0.5), 1.0 - matches, rtol=1e-12)
+    # Noise weights and spectra are cached, and spectra are recomputed when the data change
+    n_fft = inner_products._n_fft(t.size)
+    weights = inner_products.noise_weights(n_fft, t[1] - t[0], False, psd, f_max=0.5)
+    assert inner_products.noise_weights(n_fft, t[1] - t[0], False, psd, f_max=0.5) is weights
+    spectrum = inner_products._spectrum(waveforms[0], n_fft, False)
+    assert inner_products._spectrum(waveforms[0], n_fft, False) is spectrum
+    waveforms[0].data *= 2.0
+    assert np.allclose(inner_products._spectrum(waveforms[0], n_fft, False), 2 * spectrum)
+    spectrum = inner_products._spectrum(waveforms[0], n_fft, False)
+    waveforms[0].rotate_decomposition_basis(quaternion.z)
+    assert inner_products._spectrum(waveforms[0], n_fft, False) is not spectrum
+
+
+def test_detector_matches():
+    t = np.linspace(-300.0, 300.0, num=2500)
+    dt = t[1] - t[0]
+    angles = [[0.2, 0.0], [1.3, 0.5], [2.0, 2.0]]
+    a = chirp_waveform(t).to_detector(angles)
+    b = chirp_waveform(t, t_c=7 * dt).to_detector(angles)
+    c = chirp_waveform(t, phase=0.4).to_detector(angles)
+    # With white noise, 4 int_0^infinity |a(f)|^2 df = 2 int a(t)^2 dt
+    assert np.allclose(inner_products.inner_product(a, a), 2 * np.sum(a.data ** 2, axis=(0, 2)) * dt, rtol=1e-10)
+    matches = inner_products.match_matrix([a, b], [a, b])
+    assert matches.shape == (2, 2, 3)
+    assert np.allclose(matches[0, 0], 1.0, rtol=1e-12)
+    assert np.allclose(matches[0, 1], 1.0, rtol=1e-10)
+    assert np.all(inner_products.match(a, b, maximize=False) < 0.9)
+    assert np.all(inner_products.match(a, c, maximize=False) < inner_products.match(a, c))
+    with pytest.raises(ValueError):
+        inner_products.match(a, chirp_waveform(t))
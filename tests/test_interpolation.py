@@ -0,0 +1,111 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import pytest
+import quaternion
+from scri import interpolation
+
+from conftest import linear_waveform, random_waveform
+
+
+def test_plan_cache(random_waveform):
+    W = random_waveform
+    t_out = np.linspace(W.t[0], W.t[-1], num=3 * W.n_times)
+    interpolation.clear_plan_cache()
+    plan = interpolation.interpolation_plan(W.t, t_out)
+    assert interpolation.interpolation_plan(np.copy(W.t), np.copy(t_out)) is plan
+    assert interpolation.interpolation_plan(W.t, t_out[1:]) is not plan
+    # Plans with the same input grid share a factorization
+    assert interpolation.interpolation_plan(W.t, t_out[1:]).factorization is plan.factorization
+    assert np.array_equal(plan(W.data), interpolation.InterpolationPlan(W.t, t_out)(W.data))
+    assert np.array_equal(W.interpolate(t_out).data, plan(W.data))
+    # Real and multi-dimensional data go through the same plan
+    assert np.array_equal(plan(W.data.real), plan(W.data).real)
+    data_3d = W.data.reshape((W.n_times, -1, 1))
+    assert np.array_equal(plan(data_3d), plan(W.data).reshape((t_out.size, -1, 1)))
+    with pytest.raises(ValueError):
+        plan(W.data[1:])
+
+
+def test_plan_cache_size(random_waveform):
+    W = random_waveform
+    previous_size = interpolation.set_plan_cache_size(2)
+    try:
+        interpolation.clear_plan_cache()
+        plans = [interpolation.interpolation_plan(W.t, W.t[i:]) for i in range(3)]
+        assert interpolation.interpolation_plan(W.t, W.t[2:]) is plans[2]
+        assert interpolation.interpolation_plan(W.t, W.t[0:]) is not plans[0]
+        interpolation.set_plan_cache_size(0)
+        assert interpolation.interpolation_plan(W.t, W.t) is not interpolation.interpolation_plan(W.t, W.t)
+    finally:
+        interpolation.set_plan_cache_size(previous_size)
+        interpolation.clear_plan_cache()
+
+
+def test_plan_cache_threads(random_waveform):
+    from concurrent.futures import ThreadPoolExecutor
+    W = random_waveform
+    cache = interpolation._LRUCache(4)
+
+    def hammer(seed):
+        for i in range(20000):
+            key = (seed * i) % 7
+            if cache.get(key) is None:
+                cache.put(key, i + 1)
+        return len(cache)
+
+    with ThreadPoolExecutor(8) as pool:
+        assert all(size <= 4 for size in pool.map(hammer, range(1, 9)))
+
+    # Concurrent interpolations through a small shared plan cache give the same results as serial ones
+    previous_size = interpolation.set_plan_cache_size(2)
+    try:
+        grids = [W.t[i:] for i in range(6)] * 4
+        expected = [interpolation.InterpolationPlan(W.t, t)(W.data) for t in grids]
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda t: interpolation.interpolate(W.t, W.data, t), grids))
+        assert all(np.array_equal(r, e) for r, e in zip(results, expected))
+    finally:
+        interpolation.set_plan_cache_size(previous_size)
+        interpolation.clear_plan_cache()
+
+
+def test_interpolation_schemes():
+    t_nonuniform = np.sort(np.random.uniform(-1.0, 1.0, size=200))
+    t_uniform = np.linspace(-1.0, 1.0, num=200)
+    t_out = np.linspace(-0.9, 0.9, num=501)
+    for degree, scheme, grids in [(1, 'linear', [t_uniform, t_nonuniform]),
+                                  (2, 'hermite', [t_uniform, t_nonuniform]),
+                                  (3, 'cubic', [t_uniform, t_nonuniform]),
+                                  (3, 'lagrange', [t_uniform])]:
+        # Each scheme reproduces polynomials of the corresponding degree
+        coefficients = np.random.normal(size=(degree + 1, 2)).view(complex)[:, 0]
+        for t in grids:
+            data = np.polyval(coefficients[:, np.newaxis], t[np.newaxis, :]).T
+            expected = np.polyval(coefficients[:, np.newaxis], t_out[np.newaxis, :]).T
+            assert np.allclose(interpolation.interpolate(t, data, t_out, scheme), expected, rtol=0, atol=1e-12)
+    # All schemes reproduce the data on the input grid
+    data = np.random.normal(size=(t_uniform.size, 3, 2)).view(complex)
+    for scheme in interpolation.InterpolationSchemes:
+        assert np.allclose(interpolation.interpolate(t_uniform, data, t_uniform, scheme), data, rtol=0, atol=1e-13)
+    with pytest.raises(ValueError):
+        interpolation.interpolate(t_nonuniform, data, t_out, 'lagrange')
+    with pytest.raises(ValueError):
+        interpolation.interpolate(t_uniform, data, t_out + 1.0, 'sinc')
+    with pytest.raises(ValueError):
+        interpolation.interpolate(t_uniform, data, t_out, 'quintic')
+
+
+def test_linear_scheme_waveform(linear_waveform):
+    W_in = linear_waveform
+    t_out = (W_in.t[:-1] + W_in.t[1:]) / 2.0
+    W_out = W_in.interpolate(t_out, scheme='linear')
+    assert W_out.ensure_validity(alter=False)
+    assert any("scheme='linear'" in line for line in W_out.history)
+    assert np.allclose(W_out.data, (W_in.data[:-1] + W_in.data[1:]) / 2.0, rtol=0, atol=1e-12)
+    assert np.allclose(quaternion.as_float_array(W_out.frame),
+                       quaternion.as_float_array(np.slerp_vectorized(W_in.frame[:-1], W_in.frame[1:], 0.5)),
+                       rtol=0, atol=1e-14)
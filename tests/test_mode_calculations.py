@@ -73,6 +73,32 @@ def test_dpa_rotated_generally(w, Rs):
     ) < 1.e-12
 
 
+def test_dpa_closed_form(random_waveform):
+    from scri.mode_calculations import LLMatrix, LLDominantEigenvector, _dominant_eigenvector
+
+    # Compare with `eigh` for general matrices, and matrices with nearly degenerate dominant eigenvalues
+    np.random.seed(1234)
+    for i in range(1000):
+        Q = np.linalg.qr(np.random.normal(size=(3, 3)))[0]
+        eigenvalues = np.sort(np.random.normal(size=3))
+        if i % 2:
+            eigenvalues[1] = eigenvalues[2] - 10.0 ** np.random.uniform(-10, 0)
+        A = Q.dot(np.diag(eigenvalues)).dot(Q.T)
+        v = np.array(_dominant_eigenvector(A[0, 0], A[0, 1], A[0, 2], A[1, 1], A[1, 2], A[2, 2]))
+        gap = (eigenvalues[2] - eigenvalues[1]) / np.max(np.abs(eigenvalues))
+        assert min(np.linalg.norm(v - Q[:, 2]), np.linalg.norm(v + Q[:, 2])) * gap < 1e-14
+    assert _dominant_eigenvector(2.0, 0.0, 0.0, 2.0, 0.0, 2.0) == (0.0, 0.0, 1.0)
+
+    W = random_waveform
+    dpa = LLDominantEigenvector(W)
+    expected = np.linalg.eigh(LLMatrix(W))[1][:, :, 2]
+    assert np.allclose(np.linalg.norm(dpa, axis=1), 1.0, rtol=1e-14)
+    assert np.max(np.minimum(np.linalg.norm(dpa - expected, axis=1), np.linalg.norm(dpa + expected, axis=1))) < 1e-10
+    assert np.all(np.sum(dpa[1:] * dpa[:-1], axis=1) >= -0.5)
+    # The sign at RoughDirectionIndex is chosen to be closer to RoughDirection
+    assert np.allclose(LLDominantEigenvector(W, RoughDirection=-dpa[500], RoughDirectionIndex=500)[500], -dpa[500])
+
+
 def test_zero_angular_velocity():
     from scri.mode_calculations import angular_velocity
 
@@ -111,6 +137,23 @@ def test_rotated_angular_velocity():
     assert np.allclose(Omega_in, Omega_out, atol=1e-12, rtol=2e-8)
 
 
+def test_fused_angular_velocity(random_waveform):
+    from scri.mode_calculations import angular_velocity
+
+    w = random_waveform
+    Omega_out = angular_velocity(w)
+    Omega_in = -np.linalg.solve(w.LLMatrix(), w.LdtVector())
+    assert np.allclose(Omega_out, Omega_in, atol=1e-12, rtol=1e-10)
+    assert np.allclose(angular_velocity(w.astype(np.complex64)), Omega_in, atol=1e-4, rtol=1e-4)
+    # The cached spline is discarded when the data change
+    w.data *= np.exp(0.1j * w.t)[:, np.newaxis]
+    assert np.allclose(angular_velocity(w), -np.linalg.solve(w.LLMatrix(), w.LdtVector()), atol=1e-12, rtol=1e-10)
+    data = w.data.copy()
+    data[:10] = 0.0
+    w.data = data
+    assert np.all(np.isnan(angular_velocity(w)[:10]))
+
+
 def test_corotating_frame():
     from scri.mode_calculations import corotating_frame
     from scri import Corotating
@@ -126,3 +169,57 @@ def test_corotating_frame():
     w_rot.to_corotating_frame(R0=R0, tolerance=1e-12)
     assert w._allclose(w_rot, atol=1e-8)
     assert w_rot.frameType == Corotating
+
+
+def test_magnus_corotating_frame():
+    from quaternion.quaternion_time_series import integrate_angular_velocity
+    from scri.mode_calculations import corotating_frame, frame_from_angular_velocity
+
+    t = np.linspace(0.0, 100.0, num=4000)
+    omega = np.array([0.1 * np.sin(0.05 * t), 0.2 * np.cos(0.03 * t), 0.3 + 0.001 * t]).T
+    R0 = quaternion.quaternion(1, 2, 3, 4).normalized()
+    R_adaptive = integrate_angular_velocity((t, omega), t0=t[0], t1=t[-1], R0=R0, tolerance=1e-13)[1]
+    R_magnus, error = frame_from_angular_velocity(t, omega, R0=R0, error_estimate=True)
+    actual_error = np.max(np.abs(quaternion.as_float_array(R_magnus) - quaternion.as_float_array(R_adaptive)))
+    assert actual_error < 1e-11
+    assert error < 1e-11
+    # With coarse steps, the error is dominated by the Magnus integration, and is estimated well
+    R_magnus, error = frame_from_angular_velocity(t[::8], omega[::8], R0=R0, error_estimate=True)
+    actual_error = np.max(np.abs(quaternion.as_float_array(R_magnus) - quaternion.as_float_array(R_adaptive[::8])))
+    assert 0.5 * actual_error < error < 2 * actual_error
+    assert np.array_equal(frame_from_angular_velocity(t[::8], omega[::8], R0=R0), R_magnus)
+
+    w = constant_waveform(end=10.0, n_times=100000)
+    omega = 2*math.pi/5.0
+    R_in = R0 * np.exp(quaternion.quaternion(0, 0, 0, omega/2)*w.t)
+    w_rot = w.deepcopy()
+    w_rot.rotate_physical_system(R_in)
+    R_out = corotating_frame(w_rot, R0=R0, method='magnus')
+    assert np.allclose(quaternion.as_float_array(R_in), quaternion.as_float_array(R_out), atol=1e-10, rtol=0.0)
+    w_coarse = constant_waveform(end=10.0, n_times=100)
+    w_coarse.rotate_physical_system(np.exp(quaternion.quaternion(0, 0.3, 0, 1.5) * w_coarse.t
+                                           + quaternion.quaternion(0, 1, 0, 0) * np.sin(w_coarse.t)))
+    with pytest.warns(UserWarning):
+        corotating_frame(w_coarse, method='magnus')
+    with pytest.raises(ValueError):
+        corotating_frame(w_rot, method='rk4')
+    w_rot.to_corotating_frame(R0=R0, method='magnus')
+    assert w._allclose(w_rot, atol=1e-8)
+
+
+def test_corotating_frame_z_alignment():
+    from scri.mode_calculations import corotating_frame, LLDominantEigenvector
+
+    w = constant_waveform(end=100.0, n_times=20000)
+    w.data *= (1 + 0.01 * w.t)[:, np.newaxis]
+    R = np.exp(quaternion.quaternion(0, 0.01, 0, 0.5) * w.t + quaternion.quaternion(0, 0.1, 0, 0) * np.sin(0.1 * w.t))
+    w.rotate_physical_system(R)
+    history_length = len(w.history)
+    frame = corotating_frame(w, z_alignment_region=(0.1, 0.8))
+    assert len(w.history) == history_length
+    # In the aligned corotating frame, the dominant eigenvector averages to the z axis
+    w.rotate_decomposition_basis(frame)
+    dpa = LLDominantEigenvector(w)
+    i1, i2 = np.argmin(np.abs(w.t - 10.0)), np.argmin(np.abs(w.t - 80.0))
+    dpa_mean = np.mean(dpa[i1:i2], axis=0)
+    assert np.allclose(dpa_mean / np.linalg.norm(dpa_mean), [0.0, 0.0, 1.0], atol=1e-6)
@@ -0,0 +1,88 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import quaternion
+import pytest
+import scri
+import scri.parallel
+
+from conftest import random_waveform
+
+
+@pytest.fixture
+def parallel_kernels():
+    previous_parallel = scri.set_parallel(True)
+    previous_size = scri.parallel.set_minimum_parallel_size(0)
+    yield
+    scri.set_parallel(previous_parallel)
+    scri.parallel.set_minimum_parallel_size(previous_size)
+
+
+def serial_and_parallel(f, *args):
+    previous = scri.set_parallel(False)
+    try:
+        serial = f(*args)
+    finally:
+        scri.set_parallel(previous)
+    return serial, f(*args)
+
+
+def test_parallel_settings():
+    previous = scri.set_parallel(True)
+    try:
+        assert scri.get_parallel() == scri.parallel.GOT_NUMBA
+        n = scri.get_num_threads()
+        assert scri.set_num_threads(n) == n
+    finally:
+        scri.set_parallel(previous)
+    assert scri.get_parallel() == previous
+
+
+def test_num_threads_in_thread_pool():
+    # numba's own setting is thread-local, but scri's applies to kernels called from any thread
+    from concurrent.futures import ThreadPoolExecutor
+    if not scri.parallel.GOT_NUMBA:
+        pytest.skip("numba is not available")
+    import numba
+    previous_parallel = scri.set_parallel(True)
+    previous_threads = scri.set_num_threads(1)
+    try:
+        with ThreadPoolExecutor(2) as pool:
+            counts = pool.map(lambda i: (scri.parallel.select(None, None, 10 ** 6), numba.get_num_threads())[1],
+                              range(4))
+            assert all(count == 1 for count in counts)
+    finally:
+        scri.set_num_threads(previous_threads)
+        scri.set_parallel(previous_parallel)
+
+
+def test_parallel_mode_calculations(parallel_kernels):
+    w1 = random_waveform()
+    w2 = random_waveform()
+    for f in [scri.LdtVector, scri.LLMatrix, scri.LLDominantEigenvector,
+              lambda w: w.norm(), lambda w: w.norm(take_sqrt=True)]:
+        serial, parallel = serial_and_parallel(f, w1)
+        assert np.allclose(serial, parallel, rtol=1e-14, atol=1e-14)
+    for f in [scri.LVector, scri.LLComparisonMatrix]:
+        serial, parallel = serial_and_parallel(f, w1, w2)
+        assert np.allclose(serial, parallel, rtol=1e-14, atol=1e-14)
+
+
+def test_parallel_rotations(parallel_kernels):
+    w = random_waveform()
+    R = quaternion.from_rotation_vector([0.1, -0.2, 0.3])
+    R_series = np.exp(quaternion.quaternion(0, 0.01, 0.02, 0.03) * w.t)
+    for R_basis in [R, R_series]:
+        serial, parallel = serial_and_parallel(lambda W: W.copy().rotate_decomposition_basis(R_basis).data, w)
+        assert np.allclose(serial, parallel, rtol=1e-14, atol=1e-14)
+
+
+def test_parallel_batch(parallel_kernels):
+    B = scri.WaveformModesBatch.from_waveforms([random_waveform() for k in range(2)])
+    for f in [lambda B: B.norm(), lambda B: B.LdtVector(), lambda B: B.LLMatrix(),
+              lambda B: B.LVector(all_pairs=True), lambda B: B.LLComparisonMatrix(all_pairs=True)]:
+        serial, parallel = serial_and_parallel(f, B)
+        assert np.allclose(serial, parallel, rtol=1e-14, atol=1e-14)
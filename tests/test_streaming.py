@@ -0,0 +1,60 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import quaternion
+import pytest
+import scri
+from scri.mode_calculations import angular_velocity, frame_from_angular_velocity
+
+from conftest import constant_waveform
+
+
+def precessing_waveform(n_times=3000):
+    w = constant_waveform(end=100.0, n_times=n_times)
+    w.data *= (1 + 0.01 * w.t)[:, np.newaxis]
+    R = np.exp(quaternion.quaternion(0, 0.01, 0, 0.5) * w.t + quaternion.quaternion(0, 0.1, 0, 0) * np.sin(0.1 * w.t))
+    w.rotate_physical_system(R)
+    return w
+
+
+def test_stream_matches_batch():
+    w = precessing_waveform()
+    R0 = quaternion.quaternion(1, 2, 3, 4).normalized()
+    omega = angular_velocity(w)
+    frame = frame_from_angular_velocity(w.t, omega, R0=R0)
+
+    stream = scri.CorotatingFrameStream(w.ell_min, w.ell_max, R0=R0)
+    np.random.seed(1234)
+    boundaries = np.sort(np.random.choice(np.arange(1, w.n_times), size=40, replace=False))
+    n_final = 0
+    for i1, i2 in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [w.n_times]))):
+        t_new, omega_new, frame_new = stream.append(w.t[i1:i2], w.data[i1:i2])
+        assert np.array_equal(t_new, w.t[n_final:n_final + t_new.size])
+        n_final += t_new.size
+        assert stream.n_times == n_final == max(0, i2 - 2 * stream.margin)
+        # Only O(margin + new samples) of the history is retained
+        assert stream._data.shape[0] <= 2 * stream.margin + (i2 - i1)
+    stream.finalize()
+    assert stream.n_times == w.n_times
+    assert np.array_equal(stream.t, w.t)
+    assert np.allclose(stream.omega, omega, rtol=0, atol=1e-13)
+    assert np.allclose(quaternion.as_float_array(stream.frame), quaternion.as_float_array(frame), rtol=0, atol=1e-13)
+    with pytest.raises(ValueError):
+        stream.append(w.t[-1:] + 1.0, w.data[-1:])
+
+
+def test_stream_errors():
+    w = precessing_waveform(n_times=100)
+    stream = scri.CorotatingFrameStream(w.ell_min, w.ell_max)
+    with pytest.raises(ValueError):
+        stream.append(w.t[:10], w.data[:10, :3])
+    stream.append(w.t[:10], w.data[:10])
+    with pytest.raises(ValueError):
+        stream.append(w.t[5:20], w.data[5:20])
+    assert stream.t.size == 0 and stream.frame.size == 0
+    assert stream.finalize()[0].size == 10
+    with pytest.raises(ValueError):
+        scri.CorotatingFrameStream(2, 8, margin=2)
@@ -0,0 +1,56 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import spherical_functions as sf
+import pytest
+import scri
+
+
+def periodic_waveform(dataType=scri.h, n_times=4096, ell_max=4):
+    """Waveform whose (ell, m) mode oscillates at `max(abs(m), 1)` times an orbital frequency, periodic in `t`"""
+    n_orbits = 16
+    t = np.linspace(0.0, 1000.0, num=n_times, endpoint=False)
+    omega_orbital = 2 * np.pi * n_orbits / (t[-1] + t[1])
+    LM = sf.LM_range(2, ell_max)
+    data = np.array([np.exp(-1j * (m if m != 0 else 1) * omega_orbital * t + 0.1j * ell) / ell
+                     for ell, m in LM]).T
+    W = scri.WaveformModes(t=t, frame=np.array([]), data=data, ell_min=2, ell_max=ell_max,
+                           history=['# Called from periodic_waveform'], frameType=scri.Inertial, dataType=dataType,
+                           r_is_scaled_out=True, m_is_scaled_out=True)
+    return W, omega_orbital
+
+
+def test_fourier_differentiation():
+    W, omega_orbital = periodic_waveform()
+    W_dot = W.differentiate()
+    assert W_dot.dataType == scri.hdot
+    assert np.allclose(W_dot.data, W.derivative('spectral'), rtol=1e-10, atol=1e-10)
+    W_ddot = W.differentiate(2)
+    assert W_ddot.dataType == scri.psi4
+    assert np.allclose(W_ddot.data, W_dot.differentiate().data, rtol=1e-10, atol=1e-10)
+    assert W_ddot.differentiate().dataType == scri.UnknownDataType
+    with pytest.raises(ValueError):
+        W[::2].interpolate(np.sort(np.random.uniform(W.t[0], W.t[-1], size=1000))).differentiate()
+
+
+def test_fixed_frequency_integration():
+    W, omega_orbital = periodic_waveform(scri.psi4)
+    assert np.isclose(scri.time_integration.initial_orbital_frequency(W), omega_orbital, rtol=1e-6)
+    W_h = W.integrate(2)
+    assert W_h.dataType == scri.h
+    assert W.integrate().dataType == scri.hdot
+    # Every mode oscillates above its cutoff, so integration inverts differentiation exactly
+    assert np.allclose(W_h.differentiate(2).data, W.data, rtol=1e-10, atol=1e-10)
+    expected = W.data / (-1j * np.maximum(np.abs(W.LM[:, 1]), 1) * omega_orbital) ** 2
+    assert np.allclose(W_h.data, expected, rtol=1e-10, atol=1e-10)
+    # Processing the modes in chunks gives the same result
+    assert np.allclose(W.integrate(2, chunk_size=3).data, W_h.data, rtol=1e-14, atol=1e-14)
+    # A constant offset is not amplified beyond the cutoff
+    W.data += 1e-3
+    W_h_offset = W.integrate(2, omega_orbital=omega_orbital)
+    assert np.max(np.abs(W_h_offset.data - W_h.data)) < 1e-3 / (0.5 * omega_orbital) ** 2 * (1 + 1e-10)
+    with pytest.raises(ValueError):
+        W[:, 3:].integrate()
@@ -143,6 +143,72 @@ def test_time_and_mode_slice(linear_waveform):
     assert np.all(W.data == linear_waveform.data[10:50, :21])
 
 
+def test_validation_levels(linear_waveform):
+    W = linear_waveform
+    W.data[3, 4] = np.nan
+    assert not W.ensure_validity(alter=False)
+    assert W.ensure_validity(alter=False, validation_level=scri.StructuralValidation)
+    assert W.ensure_validity(alter=False, validation_level=scri.NoValidation)
+    previous = scri.set_validation_level(scri.StructuralValidation)
+    try:
+        assert previous == scri.FullValidation
+        assert W.ensure_validity(alter=False)
+        W2 = scri.WaveformModes(t=W.t, data=W.data, ell_min=W.ell_min, ell_max=W.ell_max)
+        assert W2.ensure_validity(alter=False)
+    finally:
+        scri.set_validation_level(previous)
+    assert not W.ensure_validity(alter=False)
+    with pytest.raises(AssertionError):
+        W.ensure_validity(alter=False, assertions=True)
+    with pytest.raises(ValueError):
+        scri.set_validation_level(17)
+    # Skipping the checks does not skip the inexpensive alterations
+    t = np.copy(W.t)
+    W.t = t[:, np.newaxis]
+    with pytest.warns(UserWarning):
+        assert W.ensure_validity(alter=True, validation_level=scri.NoValidation)
+    assert np.array_equal(W.t, t)
+    assert W.ensure_validity(alter=False, validation_level=scri.NoValidation)
+    # Messages may be given lazily, and errors raised while building them are not mistaken for plain strings
+    from scri.waveform_base import test_without_assertions
+    errors = []
+    test_without_assertions(errors, False, 'plain')
+    test_without_assertions(errors, False, lambda: 'lazy')
+    test_without_assertions(errors, True, lambda: 1 + '')
+    assert errors == ['plain', 'lazy']
+    with pytest.raises(TypeError):
+        test_without_assertions(errors, False, lambda: 1 + '')
+
+
+def test_slices_are_views(linear_waveform):
+    W = linear_waveform
+    W.metadata = object()
+    W_slice = W[10:50]
+    assert W_slice.ensure_validity(alter=False)
+    assert np.shares_memory(W_slice.t, W.t)
+    assert np.shares_memory(W_slice.frame, W.frame)
+    assert np.shares_memory(W_slice.data, W.data)
+    assert W_slice.metadata is W.metadata
+    assert W_slice.num != W.num
+
+    # Rotating the slice in place must not alter the original, and vice versa
+    data = np.copy(W.data)
+    W_slice.rotate_decomposition_basis(quaternion.quaternion(1, 2, 3, 4).normalized())
+    assert not np.shares_memory(W_slice.data, W.data)
+    assert np.array_equal(W.data, data)
+    W_slice = W[10:50]
+    data_slice = np.copy(W_slice.data)
+    W.rotate_decomposition_basis(quaternion.quaternion(1, 2, 3, 4).normalized())
+    assert np.array_equal(W_slice.data, data_slice)
+
+    # Once no slices remain, the data are no longer copied before being altered in place
+    W_slice = W[10:50]
+    del W_slice
+    data = W.data
+    W.rotate_decomposition_basis(quaternion.quaternion(1, 2, 3, 4).normalized())
+    assert W.data is data
+
+
 def test_norms(linear_waveform):
     W = linear_waveform
     W.data[0, :] = 6.0 * W.data[-1, :]
@@ -254,6 +320,130 @@ def test_linear_interpolation(linear_waveform):
     assert np.allclose(W_out.data, data, rtol=interpolation_precision)
 
 
+def test_spline_interpolation_matches_splrep(random_waveform):
+    from scipy.interpolate import splev, splrep
+    W_in = random_waveform
+    t_out = np.sort(np.random.uniform(W_in.t[0] - 1.0, W_in.t[-1] + 1.0, size=2 * W_in.n_times))
+    W_out = W_in.interpolate(t_out)
+    data = np.empty((t_out.size, W_in.n_data_sets), dtype=complex)
+    for i in range(W_in.n_data_sets):
+        data[:, i] = (splev(t_out, splrep(W_in.t, W_in.data[:, i].real, s=0))
+                      + 1j * splev(t_out, splrep(W_in.t, W_in.data[:, i].imag, s=0)))
+    assert W_out.data.dtype == W_in.data.dtype
+    assert np.allclose(W_out.data, data, rtol=1e-12, atol=1e-12 * np.max(np.abs(data)))
+
+
+def test_compression():
+    t = np.linspace(-1000.0, 100.0, num=20001)
+    omega = 0.2 / (1.0 + np.exp(-t / 50.0))
+    phase = np.cumsum(omega) * (t[1] - t[0])
+    modes = np.array([[m * (1 + ell) for ell in range(2, 4) for m in range(-ell, ell + 1)]], dtype=float)
+    data = 0.1 * np.exp(1j * modes * phase[:, np.newaxis] / 10.0) / np.sqrt(1.0 + (t[:, np.newaxis] / 500.0) ** 2)
+    W = WaveformModes(t=t, data=data, ell_min=2, ell_max=3, frameType=scri.Inertial, dataType=scri.h)
+    for tolerance, scheme in [(1e-8, 'cubic'), (1e-6, 'hermite'), (1e-4, 'linear')]:
+        W_c = W.compress(tolerance, scheme)
+        assert W_c.ensure_validity(alter=False)
+        assert W_c.n_times < W.n_times / 4
+        assert W_c.t[0] == W.t[0] and W_c.t[-1] == W.t[-1]
+        assert np.all(np.in1d(W_c.t, W.t))
+        assert np.max(np.abs(W_c.interpolate(W.t, scheme=scheme).data - W.data)) <= tolerance
+    with pytest.raises(ValueError):
+        W.compress(scheme='lagrange')
+    # A tolerance below round-off cannot be met, and all samples needed to try are retained
+    with pytest.warns(UserWarning):
+        W_c = W[:2000].compress(1e-18)
+    assert W_c.n_times > 1000
+
+
+def test_compression_with_frame(random_waveform):
+    W = random_waveform
+    W_c = W.compress(1e-10)
+    assert W_c.ensure_validity(alter=False)
+    assert W_c.frame.size == W_c.n_times
+    assert np.allclose(quaternion.as_float_array(W_c.interpolate(W.t).frame), quaternion.as_float_array(W.frame),
+                       rtol=0, atol=1e-10)
+    assert np.max(np.abs(W_c.interpolate(W.t).data - W.data)) <= 1e-10
+
+
+def test_mode_power_truncation(random_waveform):
+    W = random_waveform
+    ell_min, ell_max = W.ell_min, W.ell_max
+    scales = np.array([10.0 ** (-2 * (ell - ell_min)) for ell, m in W.LM])
+    W.data *= scales
+    power = W.mode_power()
+    assert power.shape == (W.n_modes,)
+    assert np.isclose(np.sum(power), 1.0)
+    spectrum = W.ell_power_spectrum()
+    assert spectrum.shape == (ell_max - ell_min + 1,)
+    assert np.all(np.diff(spectrum) < 0)
+    assert W.ell_max_for_power(0.0) == ell_max
+    assert W.ell_max_for_power(1.0) == ell_min
+    threshold = 0.5 * spectrum[-3]
+    assert W.ell_max_for_power(threshold) == ell_max - 2
+    W_t = W.truncate_ell_max(threshold)
+    assert W_t.ensure_validity(alter=False)
+    assert W_t.ell_min == ell_min and W_t.ell_max == ell_max - 2
+    assert np.array_equal(W_t.data, W.data[:, :W_t.n_modes])
+    assert np.allclose(W_t.ell_power_spectrum(), spectrum[:-2] / np.sum(spectrum[:-2]))
+    W.data[:] = 0.0
+    assert np.all(W.mode_power() == 0.0)
+
+
+def test_evaluate(random_waveform):
+    import spherical_functions as sf
+    from scri.waveform_modes import _swsh_cache
+    W = random_waveform
+    directions = np.array([[[0.1, 0.2], [1.3, -2.0], [2.0, 0.5]], [[3.1, 4.0], [0.0, 0.0], [np.pi / 2, 1.0]]])
+    R = quaternion.from_spherical_coords(directions[..., 0].ravel(), directions[..., 1].ravel())
+    expected = sum(W.data[:, i, np.newaxis] * sf.SWSH(R, W.spin_weight, [ell, m])[np.newaxis, :]
+                   for i, (ell, m) in enumerate(W.LM)).reshape((W.n_times,) + directions.shape[:-1])
+    _swsh_cache.clear()
+    values = W.evaluate(directions)
+    assert values.shape == (W.n_times, 2, 3)
+    assert np.allclose(values, expected, rtol=1e-12, atol=1e-12)
+    assert len(_swsh_cache) == 1
+    assert np.array_equal(W.evaluate(directions, chunk_size=7), values)
+    assert len(_swsh_cache) == 1
+    t_min, t_max = W.t[100] - 1e-10, W.t[200]
+    assert np.array_equal(W.evaluate(directions, t_min=t_min, t_max=t_max), values[100:201])
+    assert W.evaluate(directions[0, 0], t_min=W.t[-1] + 1).shape == (0,)
+    assert np.allclose(W.evaluate([0.1, 0.2]), values[:, 0, 0], rtol=1e-14, atol=1e-14)
+    assert np.allclose(W[:, 3:].evaluate(directions),
+                       W.evaluate(directions) - W[:, :3].evaluate(directions), rtol=1e-10, atol=1e-10)
+    with pytest.raises(ValueError):
+        W.evaluate([0.1, 0.2, 0.3])
+
+
+def test_single_precision(random_waveform):
+    W = random_waveform
+    W32 = W.astype(np.complex64)
+    assert W32.data.dtype == np.complex64
+    assert W32.ensure_validity(alter=False)
+    assert W.data.dtype == np.complex128
+    assert np.allclose(W32.data, W.data, rtol=1e-7, atol=0)
+    assert W32[10:20, 2:4].data.dtype == np.complex64
+    assert np.allclose(W32.norm(), W.norm(), rtol=1e-6, atol=0)
+    assert np.allclose(W32.norm(take_sqrt=True), W.norm(take_sqrt=True), rtol=1e-6, atol=0)
+    for single, double in [(W32.LLMatrix(), W.LLMatrix()), (W32.LVector(W), W.LVector(W)),
+                           (W32.LdtVector(), W.LdtVector())]:
+        assert np.allclose(single, double, rtol=0, atol=1e-5 * np.max(np.abs(double)))
+    W32_out = W32.interpolate((W.t[:-1] + W.t[1:]) / 2.0)
+    assert W32_out.data.dtype == np.complex64
+    assert np.allclose(W32_out.data, W.interpolate(W32_out.t).data, rtol=1e-5, atol=1e-5)
+    R = quaternion.from_rotation_vector([0.1, 0.2, 0.3])
+    W.rotate_decomposition_basis(R)
+    W32.rotate_decomposition_basis(R)
+    assert W32.data.dtype == np.complex64
+    assert np.allclose(W32.data, W.data, rtol=1e-5, atol=1e-5)
+    W.rotate_decomposition_basis(W.frame.conjugate())
+    W32.rotate_decomposition_basis(W32.frame.conjugate())
+    assert W32.data.dtype == np.complex64
+    assert np.allclose(W32.data, W.data, rtol=1e-5, atol=1e-5)
+    W_back = W32.astype(complex)
+    assert W_back.data.dtype == np.complex128
+    assert np.array_equal(W_back.data, W32.data)
+
+
 def test_involution_properties(random_waveform):
     """Ensure that involutions truly are involute
 
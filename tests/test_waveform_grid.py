@@ -40,6 +40,19 @@ def test_BMS_rotation(Rs):
         assert np.allclose(w2.data, w3.data, rtol=1e-15, atol=4e-13)
 
 
+def test_single_precision_transform():
+    w1 = samples.constant_waveform()
+    w2 = w1.astype(np.complex64)
+    g1 = w1.to_grid()
+    g2 = w2.to_grid()
+    assert g2.data.dtype == np.complex64
+    assert g2.ensure_validity(alter=False)
+    assert np.allclose(g2.data, g1.data, rtol=1e-6, atol=1e-6)
+    m2 = g2.to_modes(w1.ell_max)
+    assert m2.data.dtype == np.complex64
+    assert np.allclose(m2.data, g1.to_modes(w1.ell_max).data, rtol=1e-6, atol=1e-6)
+
+
 @slow
 def test_space_translation():
     """Compare code-transformed waveform to analytically transformed waveform"""
@@ -0,0 +1,96 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import quaternion
+import spherical_functions as sf
+import pytest
+import scri
+from scri.waveform_in_detector import DetectorProjection, antenna_patterns
+
+
+def modes_waveform(frame=np.array([], dtype=np.quaternion), ell_max=4, n_times=300):
+    np.random.seed(1234)
+    t = np.linspace(0.0, 100.0, num=n_times)
+    LM = sf.LM_range(2, ell_max)
+    data = np.array([(np.random.normal() + 1j * np.random.normal()) * np.exp(-1j * m * 0.1 * t) * (1 + 0.01 * ell * t)
+                     for ell, m in LM]).T
+    return scri.WaveformModes(t=t, frame=frame, data=data, ell_min=2, ell_max=ell_max,
+                              history=['# Called from modes_waveform'], frameType=scri.Inertial,
+                              dataType=scri.h, r_is_scaled_out=True, m_is_scaled_out=True)
+
+
+def direct_strain(W, theta, phi):
+    R = quaternion.from_spherical_coords(np.array([theta]), np.array([phi]))
+    return sum(W.data[:, i] * sf.SWSH(R, W.spin_weight, [ell, m])[0] for i, (ell, m) in enumerate(W.LM))
+
+
+def test_plus_and_cross():
+    W = modes_waveform()
+    angles = [[0.0, 0.0], [0.3, 1.2], [np.pi / 2, -0.7], [2.9, 5.0]]
+    D = scri.WaveformInDetector.from_modes(W, angles)
+    assert D.ensure_validity(alter=False)
+    assert D.data.shape == (W.n_times, 4, 2)
+    # The history records the angles by shape and hash, rather than listing them all
+    assert any('angles=<<f8 array of shape (4, 2), sha1 ' in line for line in D.history)
+    assert not any('[0.3, 1.2]' in line for line in D.history)
+    assert D.ensure_validity(alter=False, validation_level=scri.StructuralValidation)
+    assert D.history[-1].endswith('alter=False, assertions=False, validation_level={0})'.format(
+        scri.StructuralValidation))
+    D_bad = D.copy()
+    D_bad.data = D_bad.data[:, 0]
+    with pytest.warns(UserWarning):
+        assert not D_bad.ensure_validity(alter=False)
+    for i, (theta, phi) in enumerate(angles):
+        strain = direct_strain(W, theta, phi)
+        assert np.allclose(D.data[:, i, 0], strain.real, rtol=1e-13, atol=1e-13)
+        assert np.allclose(D.data[:, i, 1], -strain.imag, rtol=1e-13, atol=1e-13)
+    assert np.array_equal(W.to_detector(angles).data, D.data)
+
+
+def test_detector_responses():
+    W = modes_waveform()
+    angles = np.array([[0.4, 0.1], [1.7, 2.2], [2.5, -1.0]])
+    sky = np.array([[0.3, 0.5, 0.2], [1.1, -2.0, 1.3]])
+    F = antenna_patterns(sky[:, 0], sky[:, 1], sky[:, 2])
+    assert F.shape == (2, 2)
+    assert np.allclose(antenna_patterns(0.0, 0.0, 0.0), [1.0, 0.0])
+    assert np.allclose(antenna_patterns(0.0, 0.0, np.pi / 4), [0.0, 1.0])
+    D = W.to_detector(angles, F)
+    assert D.data.shape == (W.n_times, 3, 2)
+    for i, (theta, phi) in enumerate(angles):
+        strain = direct_strain(W, theta, phi)
+        for j in range(2):
+            expected = F[j, 0] * strain.real - F[j, 1] * strain.imag
+            assert np.allclose(D.data[:, i, j], expected, rtol=1e-13, atol=1e-13)
+    # Different antenna patterns for each angle
+    F_per_angle = antenna_patterns(angles[:, 0, np.newaxis], angles[:, 1, np.newaxis], [0.0, 0.5, 1.0, 1.5])
+    D = W.to_detector(angles, F_per_angle)
+    assert D.data.shape == (W.n_times, 3, 4)
+    # A precomputed projection can be reused, and works for single precision
+    P = DetectorProjection(W.spin_weight, W.ell_min, W.ell_max, angles, F_per_angle)
+    assert np.array_equal(scri.WaveformInDetector.from_modes(W, None, projection=P).data, D.data)
+    single = P(W.data.astype(np.complex64))
+    assert single.dtype == np.float32
+    assert np.allclose(single, D.data, rtol=1e-4, atol=1e-4)
+    with pytest.raises(ValueError):
+        scri.WaveformInDetector.from_modes(W[:, :3], None, projection=P)
+    with pytest.raises(ValueError):
+        W.to_detector(angles, np.ones((2, 2, 2)))
+
+
+def test_constant_frame():
+    R = quaternion.from_rotation_vector([0.2, -0.4, 0.9])
+    W = modes_waveform()
+    W_rotated = modes_waveform(frame=np.array([R]))
+    angles = [[0.3, 1.2], [2.0, -0.7]]
+    # Data given in a frame rotated by R are equivalent to the same data rotated back to the inertial frame
+    W_inertial = W_rotated.copy()
+    scri.rotate_decomposition_basis(W_inertial, R.conjugate())
+    assert np.allclose(W_rotated.to_detector(angles).data, W_inertial.to_detector(angles).data,
+                       rtol=1e-12, atol=1e-12)
+    W_rotating = modes_waveform(frame=np.array([R] * W.n_times))
+    with pytest.raises(ValueError):
+        W_rotating.to_detector(angles)
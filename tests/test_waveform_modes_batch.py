@@ -0,0 +1,156 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import quaternion
+import pytest
+import scri
+
+from conftest import random_waveform
+
+
+def random_batch(K=3):
+    waveforms = []
+    for k in range(K):
+        w = random_waveform()
+        w.data *= (k + 1.0)
+        w.data[:, :] = w.data[np.roll(np.arange(w.n_times), 17 * k)]
+        waveforms.append(w)
+    return waveforms, scri.WaveformModesBatch.from_waveforms(waveforms)
+
+
+def test_batch_construction():
+    waveforms, B = random_batch()
+    assert len(B) == 3
+    assert B.data.shape == (3, waveforms[0].n_times, waveforms[0].n_modes)
+    assert B.frame.shape == (3, waveforms[0].n_times)
+    for k, w in enumerate(waveforms):
+        assert np.array_equal(B[k].data, w.data)
+        assert np.array_equal(B[k].frame, w.frame)
+        assert B[k].ensure_validity(alter=False)
+    assert len(B[1:]) == 2
+    assert np.array_equal(B[[0, 2]].data[1], waveforms[2].data)
+    with pytest.raises(ValueError):
+        scri.WaveformModesBatch.from_waveforms([waveforms[0], waveforms[1][:10]])
+    with pytest.raises(ValueError):
+        scri.WaveformModesBatch.from_waveforms([waveforms[0], waveforms[1][:, 2:4]])
+
+
+def test_batch_norms():
+    waveforms, B = random_batch()
+    assert np.allclose(B.norm(), [w.norm() for w in waveforms], rtol=1e-15, atol=0)
+    assert np.allclose(B.norm(take_sqrt=True), [w.norm(take_sqrt=True) for w in waveforms], rtol=1e-15, atol=0)
+    assert np.array_equal(B.max_norm_index(), [w.max_norm_index() for w in waveforms])
+    assert np.array_equal(B.max_norm_time(0), [w.max_norm_time(0) for w in waveforms])
+
+
+def test_batch_rotations():
+    waveforms, B = random_batch()
+    R = quaternion.from_rotation_vector([0.1, -0.2, 0.3])
+    B.rotate_decomposition_basis(R)
+    for k, w in enumerate(waveforms):
+        w = w.copy()
+        w.rotate_decomposition_basis(R)
+        assert np.allclose(B.data[k], w.data, rtol=1e-14, atol=1e-14)
+        assert np.array_equal(B.frame[k], w.frame)
+    waveforms, B = random_batch()
+    Rs = quaternion.from_rotation_vector(np.random.normal(size=(B.n_waveforms, B.n_times, 3)))
+    B.rotate_decomposition_basis(Rs)
+    for k, w in enumerate(waveforms):
+        w = w.copy()
+        w.rotate_decomposition_basis(Rs[k])
+        assert np.allclose(B.data[k], w.data, rtol=1e-14, atol=1e-14)
+
+
+def test_batch_sharing():
+    waveforms, B = random_batch()
+    data, frame = np.copy(B.data), np.copy(B.frame)
+    R = quaternion.from_rotation_vector([0.1, -0.2, 0.3])
+    # Rotating a sub-batch or an extracted waveform does not alter the parent batch
+    B_sub = B[1:3]
+    B_sub.rotate_decomposition_basis(R)
+    B[1].rotate_decomposition_basis(R)
+    assert np.array_equal(B.data, data) and np.array_equal(B.frame, frame)
+    assert np.allclose(B_sub.data[0], B[1].rotate_decomposition_basis(R).data, rtol=1e-14, atol=1e-14)
+    # Nor does rotating the parent alter an earlier sub-batch
+    B_sub = B[:2]
+    B.rotate_decomposition_basis(R)
+    assert np.array_equal(B_sub.data, data[:2])
+    # Once no sub-batches remain, the data are no longer copied before being altered in place
+    B_sub = B[:2]
+    del B_sub
+    data = B.data
+    B.rotate_decomposition_basis(R)
+    assert B.data is data
+
+
+def test_batch_angular_velocity():
+    waveforms, B = random_batch()
+    omega = B.angular_velocity()
+    assert omega.shape == (B.n_waveforms, B.n_times, 3)
+    for k, w in enumerate(waveforms):
+        assert np.allclose(B.LLMatrix()[k], w.LLMatrix(), rtol=1e-14, atol=1e-12)
+        assert np.allclose(omega[k], w.angular_velocity(), rtol=1e-10, atol=1e-10)
+
+    # Instants at which the data vanish give NaN, as for a single waveform
+    w = random_waveform()
+    w.data[100:110] = 0.0
+    B = scri.WaveformModesBatch.from_waveforms([w, w])
+    omega = B.angular_velocity()
+    assert np.all(np.isnan(omega[:, 100:110]))
+    for k in range(2):
+        assert np.allclose(omega[k], scri.angular_velocity(w), rtol=1e-10, atol=1e-10, equal_nan=True)
+
+
+def test_batch_comparison_quantities():
+    waveforms, B = random_batch()
+    B2 = scri.WaveformModesBatch.from_waveforms([w.copy() for w in waveforms[::-1]])
+    B2.data *= 1.0 + 0.5j
+    L = B.LVector(B2)
+    LL = B.LLComparisonMatrix(B2)
+    assert L.shape == (3, B.n_times, 3) and LL.shape == (3, B.n_times, 3, 3)
+    L_all = B.LVector(B2[:2], all_pairs=True)
+    LL_all = B.LLComparisonMatrix(all_pairs=True)
+    assert L_all.shape == (3, 2, B.n_times, 3) and LL_all.shape == (3, 3, B.n_times, 3, 3)
+    for i, w1 in enumerate(waveforms):
+        w2 = B2[i]
+        assert np.allclose(L[i], scri.LVector(w1, w2), rtol=1e-14, atol=1e-10)
+        assert np.allclose(LL[i], scri.LLComparisonMatrix(w1, w2), rtol=1e-14, atol=1e-10)
+        for j in range(2):
+            assert np.allclose(L_all[i, j], scri.LVector(w1, B2[j]), rtol=1e-14, atol=1e-10)
+        for j, w3 in enumerate(waveforms):
+            assert np.allclose(LL_all[i, j], scri.LLComparisonMatrix(w1, w3), rtol=1e-14, atol=1e-10)
+        # The <LL> matrix is Hermitian in the pair of waveforms, and its symmetric real part is LLMatrix
+        assert np.allclose(LL_all[i, i].real + LL_all[i, i].real.swapaxes(1, 2), 2 * w1.LLMatrix(),
+                           rtol=1e-14, atol=1e-10)
+        assert np.allclose(LL[i], np.conjugate(B2.LLComparisonMatrix(B)[i]).swapaxes(1, 2), rtol=1e-12, atol=1e-10)
+    with pytest.raises(ValueError):
+        B.LVector(B2[:2])
+    with pytest.raises(ValueError):
+        B.LLComparisonMatrix(scri.WaveformModesBatch.from_waveforms([w[:10] for w in waveforms]))
+
+
+def test_batch_parity():
+    waveforms, B = random_batch()
+    for name in ['x_parity_conjugate', 'y_parity_conjugate', 'z_parity_conjugate', 'parity_conjugate',
+                 'x_parity_symmetric_part', 'z_parity_antisymmetric_part', 'parity_symmetric_part']:
+        B_p = getattr(B, name)
+        for k, w in enumerate(waveforms):
+            w_p = getattr(w, name)
+            assert np.array_equal(B_p.data[k], w_p.data)
+            assert np.array_equal(B_p.frame[k], w_p.frame)
+
+
+def test_batch_interpolation():
+    waveforms, B = random_batch()
+    t = np.linspace(B.t[0], B.t[-1], num=2 * B.n_times)
+    for scheme in ['cubic', 'linear']:
+        B_i = B.interpolate(t, scheme=scheme)
+        assert B_i.data.shape == (B.n_waveforms, t.size, B.n_modes)
+        for k, w in enumerate(waveforms):
+            w_i = w.interpolate(t, scheme=scheme)
+            assert np.allclose(B_i.data[k], w_i.data, rtol=1e-13, atol=1e-13)
+            assert np.allclose(quaternion.as_float_array(B_i.frame[k]), quaternion.as_float_array(w_i.frame),
+                               rtol=1e-14, atol=1e-14)
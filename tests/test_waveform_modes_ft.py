@@ -0,0 +1,77 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import spherical_functions as sf
+import pytest
+import scri
+
+from conftest import random_waveform
+
+
+def gaussian_waveform(t, t_c=0.0, sigma=20.0, omega=0.3, ell_max=3):
+    """Modes with Gaussian envelopes, for which the Fourier transform is known analytically"""
+    LM = sf.LM_range(2, ell_max)
+    data = np.array([np.exp(-(t - t_c) ** 2 / (2 * sigma ** 2) - 1j * m * omega * (t - t_c)) / ell
+                     for ell, m in LM]).T
+    return scri.WaveformModes(t=t, frame=np.array([], dtype=np.quaternion), data=data, ell_min=2, ell_max=ell_max,
+                              history=['# Called from gaussian_waveform'], frameType=scri.Inertial,
+                              dataType=scri.h, r_is_scaled_out=True, m_is_scaled_out=True)
+
+
+def test_fourier_transform_conventions():
+    t = np.linspace(-200.0, 300.0, num=2001)
+    sigma, omega, t_c = 20.0, 0.3, 17.0
+    W = gaussian_waveform(t, t_c, sigma, omega)
+    F = scri.WaveformModesFT.from_waveform(W, taper_start=0.0, taper_end=0.0, padding_factor=2)
+    assert F.n_frequencies >= 2 * W.n_times
+    assert np.all(np.diff(F.f) > 0)
+    # Continuous Fourier transform of exp(-(t-t_c)^2/(2 sigma^2) - i m omega (t-t_c)) / ell
+    for ell, m in [(2, 2), (3, -1), (3, 0)]:
+        f_m = -m * omega / (2 * np.pi)
+        expected = (sigma * np.sqrt(2 * np.pi) * np.exp(-2 * np.pi ** 2 * sigma ** 2 * (F.f - f_m) ** 2)
+                    * np.exp(-2j * np.pi * F.f * t_c) / ell)
+        assert np.allclose(F.data[:, F.index(ell, m)], expected, rtol=1e-10, atol=1e-10)
+    # The batched transform agrees with transforming each mode separately
+    for i in range(W.n_modes):
+        transform = np.fft.fftshift(np.fft.fft(W.data[:, i], n=F.plan.n_fft)) * (t[1] - t[0])
+        assert np.allclose(F.data[:, i], transform * np.exp(-2j * np.pi * F.f * t[0]), rtol=1e-12, atol=1e-12)
+
+
+def test_fourier_round_trip_and_slicing():
+    t = np.linspace(-200.0, 300.0, num=2001)
+    W = gaussian_waveform(t)
+    F = scri.WaveformModesFT.from_waveform(W, taper_start=0.0, taper_end=0.0, padding_factor=1.5)
+    W2 = F.to_waveform()
+    assert np.allclose(W2.t, W.t, rtol=1e-14, atol=1e-12)
+    assert np.allclose(W2.data, W.data, rtol=1e-12, atol=1e-12)
+    assert W2.dataType == W.dataType and W2.ell_max == W.ell_max
+    # Band-limiting removes the (ell, +/-2) modes, which oscillate at 2*omega, but not the (ell, 0) modes
+    low = F.band(f_max=0.3 / (2 * np.pi))
+    assert low.n_frequencies < F.n_frequencies
+    W_low = low.to_waveform()
+    assert np.allclose(W_low.data[:, W.index(2, 0)], W.data[:, W.index(2, 0)], rtol=1e-8, atol=1e-8)
+    assert np.max(np.abs(W_low.data[:, W.index(2, 2)])) < 1e-8
+    positive = F[F.f > 0]
+    assert np.all(positive.f > 0)
+    assert np.array_equal(F[10:20].data, F.data[10:20])
+    assert np.array_equal(F[F.n_frequencies // 2].f, F.f[F.n_frequencies // 2:F.n_frequencies // 2 + 1])
+
+
+def test_fourier_resampling_and_taper():
+    W = random_waveform()
+    W.frame = np.array([], dtype=np.quaternion)
+    F = scri.WaveformModesFT.from_waveform(W, dt=0.5)
+    assert F.dt == 0.5
+    assert F.n_times == int((W.t[-1] - W.t[0]) / 0.5) + 1
+    W2 = F.to_waveform()
+    assert np.allclose(W2.data[0], 0.0) and np.allclose(W2.data[-1], 0.0)
+    W_interpolated = W.interpolate(W2.t)
+    middle = slice(W2.n_times // 10, -W2.n_times // 10)
+    assert np.allclose(W2.data[middle], W_interpolated.data[middle], rtol=1e-12, atol=1e-12)
+    F64 = scri.WaveformModesFT.from_waveform(W.astype(np.complex64), dt=0.5)
+    assert F64.data.dtype == np.complex64 and F64.to_waveform().data.dtype == np.complex64
+    with pytest.raises(ValueError):
+        scri.WaveformModesFT.from_waveform(random_waveform())
@@ -0,0 +1,192 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+"""Conversion between psi4, news/hdot, and h by integration or differentiation in the Fourier domain
+
+With the conventions used in scri (as in SpEC), `hdot` (or `news`) is the first time derivative of `h`, and `psi4`
+is the second.  Integrating noisy or truncated data naively amplifies the low-frequency content, producing large
+secular drifts.  The standard remedy is fixed-frequency integration [Reisswig and Pollney, CQG 28, 195015 (2011)]:
+integration is done in the Fourier domain by dividing by `i*omega`, but frequencies below a cutoff `omega_0` are
+replaced by `omega_0`, which suppresses the unphysical low-frequency part of the spectrum.  Since the physical
+content of the (ell, m) mode of a quasicircular binary oscillates at roughly `m` times the orbital frequency, the
+cutoff is chosen separately for each `m`, as a fraction of `abs(m)` times the initial orbital frequency.
+
+All modes are processed together: the real and imaginary parts of every mode are transformed with a single batched
+real FFT.  For very long data sets, the modes may be processed in chunks of a given size to limit the memory used
+for the transforms.  Because the Fourier transform treats the data as periodic, the time steps must be uniformly
+spaced (see `WaveformBase.interpolate` otherwise), and the data should ideally go smoothly to zero at both ends.
+
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+from .waveform_base import waveform_alterations
+from .interpolation import _as_real_columns, _from_real_columns, _uniform_spacing
+from . import h, hdot, news, psi4, UnknownDataType
+
+# Data types ordered by number of time derivatives of `h`; `news` is treated as equivalent to `hdot`
+_derivative_ladder = [h, hdot, psi4]
+
+
+def fourier_power_of_derivative(t, data, power, omega_cutoff=None, chunk_size=None):
+    """Apply `(d/dt)**power` to each column of `data` by multiplication in the Fourier domain
+
+    Parameters
+    ----------
+    t : float array
+        Uniformly spaced times at which `data` is given.
+    data : float or complex array
+        First dimension must have the same size as `t`.
+    power : int
+        Number of derivatives to take; negative numbers give integrals.
+    omega_cutoff : float or array, optional
+        For integration, frequencies below this (angular) frequency are replaced by it.  If an array is given, it
+        must have the same shape as `data.shape[1:]`, giving a separate cutoff for each column.  This is required
+        when `power` is negative, and ignored otherwise.
+    chunk_size : int, optional
+        If given, transform at most this many columns (of the complex data) at a time.  By default, all columns are
+        transformed together.
+
+    Returns
+    -------
+    array of same shape and dtype as `data`
+
+    """
+    t = np.asarray(t, dtype=float)
+    data = np.asarray(data)
+    dt = _uniform_spacing(t)
+    if dt is None:
+        raise ValueError("Fourier-domain integration and differentiation require uniformly spaced times; "
+                         "interpolate onto uniform time steps first")
+    if data.shape[0] != t.size:
+        raise ValueError("First dimension of `data` must have the same length as `t`; "
+                         "got t.shape={0} and data.shape={1}".format(t.shape, data.shape))
+    columns = _as_real_columns(data).astype(float)
+    n_columns = columns.shape[1]
+    parts_per_column = 2 if np.iscomplexobj(data) else 1
+    omega = 2 * np.pi * np.fft.rfftfreq(t.size, dt)
+    if power < 0:
+        if omega_cutoff is None:
+            raise ValueError("A cutoff frequency is required for integration")
+        omega_cutoff = np.broadcast_to(np.asarray(omega_cutoff, dtype=float), data.shape[1:]).ravel()
+        if np.any(omega_cutoff <= 0):
+            raise ValueError("Cutoff frequencies must be positive")
+        omega_cutoff = np.repeat(omega_cutoff, parts_per_column)
+    if chunk_size is None:
+        chunk_size = n_columns
+    else:
+        chunk_size = max(1, int(chunk_size)) * parts_per_column
+    result = np.empty_like(columns)
+    for i1 in range(0, n_columns, chunk_size):
+        i2 = min(i1 + chunk_size, n_columns)
+        if power < 0:
+            factor = (1j * np.maximum(omega[:, np.newaxis], omega_cutoff[np.newaxis, i1:i2])) ** power
+        else:
+            factor = (1j * omega[:, np.newaxis]) ** power
+            if power % 2 == 1 and t.size % 2 == 0:
+                factor[-1] = 0.0  # The Nyquist mode has no well-defined odd derivative
+        result[:, i1:i2] = np.fft.irfft(factor * np.fft.rfft(columns[:, i1:i2], axis=0), t.size, axis=0)
+    return _from_real_columns(result, data.dtype, data.shape)
+
+
+def initial_orbital_frequency(W, fraction_of_data=0.1, relative_amplitude_threshold=0.01):
+    """Estimate the orbital angular frequency near the start of a waveform from its (2,2) mode
+
+    The orbital frequency is taken to be half the median of the absolute phase velocity of the (2,2) mode over the
+    first `fraction_of_data` of the time steps at which the amplitude of that mode is at least
+    `relative_amplitude_threshold` times its maximum.  Ignoring the time steps with small amplitude avoids the noisy
+    phase of data that have been tapered to zero.
+
+    """
+    if not W.ell_min <= 2 <= W.ell_max:
+        raise ValueError("The orbital frequency can only be estimated from waveforms containing the (2,2) mode")
+    data = W.data[:, W.index(2, 2)]
+    amplitude = np.abs(data)
+    significant = np.flatnonzero(amplitude >= relative_amplitude_threshold * np.max(amplitude))
+    significant = significant[:max(2, int(fraction_of_data * significant.size))]
+    phase_velocity = np.gradient(np.unwrap(np.angle(data)), W.t)
+    return np.median(np.abs(phase_velocity[significant])) / 2.0
+
+
+def _shifted_data_type(dataType, n_derivatives):
+    if dataType == news:
+        dataType = hdot
+    if dataType not in _derivative_ladder:
+        return UnknownDataType
+    i = _derivative_ladder.index(dataType) + n_derivatives
+    if not 0 <= i < len(_derivative_ladder):
+        return UnknownDataType
+    return _derivative_ladder[i]
+
+
+@waveform_alterations
+def integrate(W, n_integrals=1, omega_orbital=None, cutoff_fraction=0.5, chunk_size=None):
+    """Return a copy of the waveform integrated in time by fixed-frequency integration
+
+    The cutoff frequency for each mode is `cutoff_fraction * max(abs(m), 1) * omega_orbital`, which should lie
+    below the lowest physical frequency present in that mode.  The data type is updated, so that integrating `psi4`
+    once gives `hdot`, and twice gives `h`; integrating other data types gives `UnknownDataType`.  See the
+    documentation of the `scri.time_integration` module for details.
+
+    Parameters
+    ----------
+    W : WaveformModes
+        Waveform with uniformly spaced time steps.
+    n_integrals : int, optional
+        Number of times to integrate.  Default is 1.
+    omega_orbital : float, optional
+        Initial orbital angular frequency, in units of the inverse of the waveform's time.  If not given, this is
+        estimated from the (2,2) mode with `initial_orbital_frequency`.
+    cutoff_fraction : float, optional
+        Ratio of each mode's cutoff frequency to the expected initial frequency of that mode.  Default is 0.5.
+    chunk_size : int, optional
+        Maximum number of modes to transform at once; by default, all modes are transformed together.
+
+    """
+    if n_integrals < 1:
+        raise ValueError("Number of integrals must be at least 1; got {0}".format(n_integrals))
+    if omega_orbital is None:
+        omega_orbital = initial_orbital_frequency(W)
+    omega_cutoff = cutoff_fraction * np.maximum(np.abs(W.LM[:, 1]), 1) * omega_orbital
+    W_out = W.copy_without_data()
+    W_out.t = np.copy(W.t)
+    W_out.frame = np.copy(W.frame)
+    W_out.data = fourier_power_of_derivative(W.t, W.data, -n_integrals, omega_cutoff, chunk_size)
+    W_out.ells = W.ells
+    W_out.dataType = _shifted_data_type(W.dataType, -n_integrals)
+    W_out.__history_depth__ -= 1
+    W_out._append_history('{0} = {1}.integrate(n_integrals={2}, omega_orbital={3}, cutoff_fraction={4})'.format(
+        W_out, W, n_integrals, omega_orbital, cutoff_fraction))
+    return W_out
+
+
+@waveform_alterations
+def differentiate(W, n_derivatives=1, chunk_size=None):
+    """Return a copy of the waveform differentiated in time in the Fourier domain
+
+    This is the inverse of `integrate` for the frequencies above the cutoff.  The data type is updated, so that
+    differentiating `h` once gives `hdot`, and twice gives `psi4`.  For an array of derivatives of data that need
+    not be uniformly sampled or periodic, see `WaveformBase.derivative` instead.
+
+    Parameters
+    ----------
+    W : WaveformModes
+        Waveform with uniformly spaced time steps.
+    n_derivatives : int, optional
+        Number of times to differentiate.  Default is 1.
+    chunk_size : int, optional
+        Maximum number of modes to transform at once; by default, all modes are transformed together.
+
+    """
+    if n_derivatives < 1:
+        raise ValueError("Number of derivatives must be at least 1; got {0}".format(n_derivatives))
+    W_out = W.copy_without_data()
+    W_out.t = np.copy(W.t)
+    W_out.frame = np.copy(W.frame)
+    W_out.data = fourier_power_of_derivative(W.t, W.data, n_derivatives, chunk_size=chunk_size)
+    W_out.ells = W.ells
+    W_out.dataType = _shifted_data_type(W.dataType, n_derivatives)
+    W_out.__history_depth__ -= 1
+    W_out._append_history('{0} = {1}.differentiate(n_derivatives={2})'.format(W_out, W, n_derivatives))
+    return W_out
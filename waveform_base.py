@@ -11,32 +11,76 @@ import socket
 import datetime
 import pprint
 import copy
+import weakref
 import numpy as np
 import quaternion
 import scipy.constants as spc
-from scipy.interpolate import splev, splrep
-from quaternion.numba_wrapper import njit, xrange, GOT_NUMBA
+from quaternion.numba_wrapper import xrange, GOT_NUMBA
 from . import *
+from .history import WaveformHistory
+from .interpolation import interpolate as interpolate_data, interpolate_frame
+from .differentiation import derivative as differentiate, derivative_plan
+from .parallel import prange, kernel, parallel_variant, select
+
+# Derivatives computed by `WaveformBase.derivative`, for each object that is still alive.  These are kept outside
+# the objects themselves, so that they are not copied or pickled along with the objects.
+_derivative_caches = weakref.WeakKeyDictionary()
+
+# Number of times `t` or `data` of each object has been assigned or prepared for alteration in place; together with
+# the identities of the arrays, this tells the caches above when they are stale.  See `WaveformBase._data_version`.
+_modification_counts = weakref.WeakKeyDictionary()
+
+# Set of live objects whose `data` may be shared through slicing, for each object in such a set; see
+# `WaveformBase._copy_on_write`.  Since the sets hold only weak references, an object no longer counts as sharing its
+# data once all the other objects are gone.
+_data_sharers = weakref.WeakKeyDictionary()
+
+
+def _record_shared_data(original, view):
+    """Record that `view` was created from `original` and may share its `data`; see `_release_shared_data`"""
+    sharers = _data_sharers.get(original)
+    if sharers is None:
+        sharers = _data_sharers[original] = weakref.WeakSet([original])
+    sharers.add(view)
+    _data_sharers[view] = sharers
+
+
+def _release_shared_data(obj):
+    """Stop counting `obj` as sharing its data, and return True if its data must be copied before being altered
+
+    This is the case if any other object recorded by `_record_shared_data` as sharing data with `obj` is still alive
+    and still shares memory with it.
+
+    """
+    sharers = _data_sharers.pop(obj, None)
+    if sharers is None:
+        return False
+    sharers.discard(obj)
+    return any(np.may_share_memory(obj.data, other.data) for other in sharers)
+
+# Complex data types accepted for waveform data.  Single-precision (complex64) data halve memory use and bandwidth,
+# at the cost of a relative precision of roughly 1e-7; see `WaveformBase.astype` for details.
+complex_dtypes = (np.dtype(np.complex128), np.dtype(np.complex64))
 
 if GOT_NUMBA:
-    @njit('void(c16[:,:], f8[:])')
+    @kernel
     def complex_array_norm(c, s):
-        for i in xrange(len(s)):
+        for i in prange(len(s)):
             s[i] = 0.0
             for j in xrange(c.shape[1]):
                 s[i] += c[i, j].real ** 2 + c[i, j].imag ** 2
         return
 
-    @njit('void(c16[:,:], f8[:])')
+    @kernel
     def complex_array_abs(c, s):
-        for i in xrange(len(s)):
+        for i in prange(len(s)):
             s[i] = 0.0
             for j in xrange(c.shape[1]):
                 s[i] += c[i, j].real ** 2 + c[i, j].imag ** 2
             s[i] = np.sqrt(s[i])
         return
 else:
-    # If njit above is just the dumb placeholder defined in .numba, that
+    # If kernel above just returns the pure-python function, that
     # function would be ~1000 times slower (because it would use standard
     # python).  We can do much better with numpy, though this is still ~6
     # times slower than numba for typical arrays.
@@ -48,6 +92,10 @@ else:
         s[:] = np.sqrt(np.sum(c.real ** 2 + c.imag ** 2, axis=1))
         return
 
+# Multi-threaded variants, used when enabled by `scri.parallel.set_parallel`
+complex_array_norm_parallel = parallel_variant(complex_array_norm)
+complex_array_abs_parallel = parallel_variant(complex_array_abs)
+
 
 def waveform_alterations(func):
     """Temporarily increment history depth safely
@@ -78,19 +126,52 @@ def test_without_assertions(errs, val, msg=''):
     """Replacement for np.testing.assert_
 
     This function should be able to replace `assert_`, but rather than raising an exception, this just adds a
-    description of the problem to the `errors` variable.
+    description of the problem to the `errors` variable.  The message may be a string or a function returning a
+    string; in the latter case, it is only evaluated if the test fails.
 
     """
     if not val:
-        try:
-            smsg = msg()
-        except TypeError:
-            smsg = msg
+        smsg = msg() if callable(msg) else msg
         errs += [smsg]
 
 
 def test_with_assertions(errs, val, msg=''):
-    np.testing.assert_(val, 'Failed assertion:\n\t' + msg)
+    if not val:
+        smsg = msg() if callable(msg) else msg
+        np.testing.assert_(val, 'Failed assertion:\n\t' + smsg)
+
+
+_validation_level = FullValidation
+
+
+def set_validation_level(validation_level):
+    """Set the default thoroughness of `ensure_validity` checks
+
+    This applies to every call of `ensure_validity` that does not explicitly pass a `validation_level` argument --
+    including the checks run when any waveform object is constructed.  The input should be one of the values in
+    `scri.ValidationLevel`:
+
+      * `scri.NoValidation` skips all checks, though `ensure_validity(alter=True)` still makes its inexpensive
+        alterations, such as converting a column vector `t` to a 1-d array
+      * `scri.StructuralValidation` checks types, shapes, and other properties that take constant time to test
+      * `scri.FullValidation` (the default) additionally checks that `t` is increasing, and that `t`, `frame`, and
+        `data` are all finite, which requires passes over each of those arrays
+
+    Returns the previous value, so that it may be restored.
+
+    """
+    global _validation_level
+    if validation_level not in ValidationLevel:
+        raise ValueError("Unknown validation level {0}; must be one of {1}".format(validation_level,
+                                                                                  list(ValidationLevel)))
+    previous = _validation_level
+    _validation_level = validation_level
+    return previous
+
+
+def get_validation_level():
+    """Return the default thoroughness of `ensure_validity` checks; see `set_validation_level`"""
+    return _validation_level
 
 
 class _object(object):
@@ -118,10 +199,12 @@ class WaveformBase(_object):
         Rotors taking static basis onto decomposition basis
     data : 2-d array of complex or real numbers
         The nature of this data depends on the derived type.  First index is time, second index depends on type.
-    history : list of strings
+    history : WaveformHistory
         As far as possible, all functions applied to the object are recorded in the `history` variable.  In fact,
         the object should almost be able to be recreated using the commands in the history list. Commands taking
-        large arrays, however, are shortened -- so the data will not be entirely reconstructable.
+        large arrays, however, are shortened -- so the data will not be entirely reconstructable.  This behaves like
+        a list of strings, but is shared between copies of the object, so that copying and slicing cost nothing
+        extra for long histories; see `scri.history.WaveformHistory` for details.
     frameType : int
         Index corresponding to `scri.FrameType` appropriate for `data`.
     dataType : int
@@ -148,6 +231,12 @@ class WaveformBase(_object):
     slice can change the data in the original.  If you want to make a copy, you should probably use the copy
     constructor: `W2 = WaveformBase(W1)`. It is also possible to use the standard copy.deepcopy method.
 
+    Slicing is cheap: the result shares `t`, `frame`, `data`, the history, and any other attributes (like metadata)
+    with the original by reference, without running the initializer or validity checks.  Operations in this module
+    that alter `data` in place (such as `rotate_decomposition_basis`) use copy-on-write semantics: if the data are
+    shared between a slice and its original, the object being altered first receives its own copy, so that the
+    other object is unaffected.  Direct assignments to elements of `data` are not intercepted, however.
+
     Also note that the first slice dimension corresponds to the indices of the time, but the second dimension may NOT
     correspond to indices for derived types.  In particular, for `WaveformModes`, the second index corresponds to
     modes, because this type enforces completeness of each ell mode.  For the `WaveformBase` type, however,
@@ -201,9 +290,9 @@ class WaveformBase(_object):
         t: float array, empty default
         frame : quaternion array, empty default
         data : 2-d complex array, empty default
-        history : list of strings, empty default
+        history : list of strings or WaveformHistory, empty default
             This is the list of strings prepended to the history, an additional line is appended, showing the call to
-            this initializer.
+            this initializer.  If a `WaveformHistory` is passed, its content is shared rather than copied.
         frameType : int, defaults to 0 (UnknownFrameType)
             See scri.FrameNames for possible values
         dataType : int, defaults to 0 (UnknownDataType)
@@ -214,6 +303,8 @@ class WaveformBase(_object):
             Set to True if the data represented are dimensionless and in units where the total mass is 1
         override_exception_from_invalidity: bool, defaults to False
             If True, report any errors, but do not raise them.
+        validation_level: int, optional
+            Thoroughness of the validity checks; see `ensure_validity`.  Defaults to the global setting.
         constructor_statement : str, optional
             If this is present, it will replace the default constructor statement added to the history.  It is
             prepended with a string of the form `'{0} = '.format(self)`, which prints the ID of the resulting object
@@ -223,6 +314,7 @@ class WaveformBase(_object):
         original_kwargs = kwargs.copy()
         super(WaveformBase, self).__init__(*args, **kwargs)  # to ensure proper calling in multiple inheritance
         override_exception_from_invalidity = kwargs.pop('override_exception_from_invalidity', False)
+        validation_level = kwargs.pop('validation_level', None)
         self.__num = type(self).__num
         self.__history_depth__ = 0
         type(self).__num += 1  # Increment class's instance tracker
@@ -231,7 +323,7 @@ class WaveformBase(_object):
             self.frame = kwargs.pop('frame', np.empty((0,), dtype=np.quaternion))
             self.data = kwargs.pop('data', np.empty((0, 0), dtype=complex))
             # Information about this object
-            self.history = kwargs.pop('history', [])
+            self.history = WaveformHistory(kwargs.pop('history', []))
             self.frameType = kwargs.pop('frameType', UnknownFrameType)
             self.dataType = kwargs.pop('dataType', UnknownDataType)
             self.r_is_scaled_out = kwargs.pop('r_is_scaled_out', False)
@@ -250,7 +342,7 @@ class WaveformBase(_object):
             self.frame = np.copy(other.frame)
             self.data = np.copy(other.data)
             # Information about this object
-            self.history = other.history[:]
+            self.history = WaveformHistory(other.history)
             self.frameType = other.frameType
             self.dataType = other.dataType
             self.r_is_scaled_out = other.r_is_scaled_out
@@ -264,7 +356,8 @@ class WaveformBase(_object):
         cwd = os.getcwd()
         time = datetime.datetime.now().isoformat()
         self.__history_depth__ = 1
-        self.ensure_validity(alter=True, assertions=(not override_exception_from_invalidity))
+        self.ensure_validity(alter=True, assertions=(not override_exception_from_invalidity),
+                             validation_level=validation_level)
         self.__history_depth__ = 0
         self._append_history(['hostname = {0}'.format(hostname),
                               'cwd = {0}'.format(cwd),
@@ -276,7 +369,7 @@ class WaveformBase(_object):
             warnings.warn(warning)
 
     @waveform_alterations
-    def ensure_validity(self, alter=True, assertions=False):
+    def ensure_validity(self, alter=True, assertions=False, validation_level=None):
         """Try to ensure that the `WaveformBase` object is valid
 
         This tests various qualities of the WaveformBase's members that are frequently assumed throughout the code.
@@ -291,9 +384,18 @@ class WaveformBase(_object):
         If the optional `assertions` argument is `True` (default is `False`), the first test that fails will raise an
         assertion error.
 
+        The optional `validation_level` argument selects how thorough the tests are; see `scri.ValidationLevel`.
+        `NoValidation` skips all tests (though not the alterations), `StructuralValidation` checks only types,
+        shapes, and other properties that take constant time to test, and `FullValidation` also checks that `t` is
+        increasing and that `t`, `frame`, and `data` are finite -- each of which requires a pass over the entire
+        array.  The default value of `None` uses the global setting; see `scri.set_validation_level`.
+
         """
         import numbers
 
+        if validation_level is None:
+            validation_level = get_validation_level()
+
         errors = []
         alterations = []
 
@@ -302,101 +404,104 @@ class WaveformBase(_object):
         else:
             test = test_without_assertions
 
+        if alter:
+            alterations = self._standard_alterations()
+
+        if validation_level == NoValidation:
+            if alterations:
+                self._append_history(alterations)
+                warnings.warn("The following alterations were made:\n\t" + '\n\t'.join(alterations))
+            self.__history_depth__ -= 1
+            self._append_history('WaveformBase.ensure_validity' +
+                                 '({0}, alter={1}, assertions={2}, validation_level={3})'.format(
+                                     self, alter, assertions, validation_level))
+            return True
+        full = (validation_level == FullValidation)
+
         # Ensure that the various data are correct and compatible
         test(errors,
              isinstance(self.t, np.ndarray),
-             'isinstance(self.t, np.ndarray) # type(self.t)={0}'.format(type(self.t)))
+             lambda: 'isinstance(self.t, np.ndarray) # type(self.t)={0}'.format(type(self.t)))
         test(errors,
              self.t.dtype == np.dtype(np.float),
-             'self.t.dtype == np.dtype(np.float) # self.t.dtype={0}'.format(self.t.dtype))
-        if alter and self.t.ndim == 2 and self.t.shape[1] == 1:
-            self.t = self.t[:, 0]
-            alterations += ['{0}.t = {0}.t[:,0]'.format(self)]
+             lambda: 'self.t.dtype == np.dtype(np.float) # self.t.dtype={0}'.format(self.t.dtype))
         test(errors,
              not self.t.size or self.t.ndim == 1,
-             'not self.t.size or self.t.ndim==1 # self.t.size={0}; self.t.ndim={1}'.format(self.t.size, self.t.ndim))
-        test(errors,
-             self.t.size <= 1 or np.all(np.diff(self.t) > 0.0),
-             'self.t.size<=1 or np.all(np.diff(self.t)>0.0) '
-             '# self.t.size={0}; max(np.diff(self.t))={1}'.format(self.t.size, (
-                 max(np.diff(self.t)) if self.t.size > 1 else np.nan)))
-        test(errors,
-             np.all(np.isfinite(self.t)),
-             'np.all(np.isfinite(self.t))')
+             lambda: 'not self.t.size or self.t.ndim==1 # self.t.size={0}; self.t.ndim={1}'.format(self.t.size,
+                                                                                                 self.t.ndim))
+        if full:
+            test(errors,
+                 self.t.size <= 1 or np.all(np.diff(self.t) > 0.0),
+                 lambda: 'self.t.size<=1 or np.all(np.diff(self.t)>0.0) '
+                         '# self.t.size={0}; min(np.diff(self.t))={1}'.format(self.t.size, (
+                             min(np.diff(self.t)) if self.t.size > 1 else np.nan)))
+            test(errors,
+                 np.all(np.isfinite(self.t)),
+                 'np.all(np.isfinite(self.t))')
 
-        if alter and self.frame is None:
-            self.frame = np.empty((0,), dtype=np.quaternion)
-            alterations += ['{0}.frame = np.empty((0,), dtype=np.quaternion)'.format(self)]
         test(errors,
              isinstance(self.frame, np.ndarray),
-             'isinstance(self.frame, np.ndarray) # type(self.frame)={0}'.format(type(self.frame)))
-        if alter and self.frame.dtype == np.dtype(np.float):
-            try:  # Might fail because of shape
-                self.frame = quaternion.as_quat_array(self.frame)
-                alterations += ['{0}.frame = quaternion.as_quat_array({0}.frame)'.format(self)]
-            except (AssertionError, ValueError):
-                pass
+             lambda: 'isinstance(self.frame, np.ndarray) # type(self.frame)={0}'.format(type(self.frame)))
         test(errors,
              self.frame.dtype == np.dtype(np.quaternion),
-             'self.frame.dtype == np.dtype(np.quaternion) # self.frame.dtype={0}'.format(self.frame.dtype))
+             lambda: 'self.frame.dtype == np.dtype(np.quaternion) # self.frame.dtype={0}'.format(self.frame.dtype))
         test(errors,
              self.frame.size <= 1 or self.frame.size == self.t.size,
-             'self.frame.size<=1 or self.frame.size==self.t.size '
-             '# self.frame.size={0}; self.t.size={1}'.format(self.frame.size, self.t.size))
-        test(errors,
-             np.all(np.isfinite(self.frame)),
-             'np.all(np.isfinite(self.frame))')
+             lambda: 'self.frame.size<=1 or self.frame.size==self.t.size '
+                     '# self.frame.size={0}; self.t.size={1}'.format(self.frame.size, self.t.size))
+        if full:
+            test(errors,
+                 np.all(np.isfinite(self.frame)),
+                 'np.all(np.isfinite(self.frame))')
 
         test(errors,
              isinstance(self.data, np.ndarray),
-             'isinstance(self.data, np.ndarray) # type(self.data)={0}'.format(type(self.data)))
+             lambda: 'isinstance(self.data, np.ndarray) # type(self.data)={0}'.format(type(self.data)))
         test(errors,
              self.data.ndim >= 1,
-             'self.data.ndim >= 1 # self.data.ndim={0}'.format(self.data.ndim))
+             lambda: 'self.data.ndim >= 1 # self.data.ndim={0}'.format(self.data.ndim))
         test(errors,
              self.data.shape[0] == self.t.shape[0],
-             'self.data.shape[0]==self.t.shape[0] '
-             '# self.data.shape[0]={0}; self.t.shape[0]={1}'.format(self.data.shape[0], self.t.shape[0]))
-        test(errors,
-             np.all(np.isfinite(self.data)),
-             'np.all(np.isfinite(self.data))')
+             lambda: 'self.data.shape[0]==self.t.shape[0] '
+                     '# self.data.shape[0]={0}; self.t.shape[0]={1}'.format(self.data.shape[0], self.t.shape[0]))
+        if full:
+            test(errors,
+                 np.all(np.isfinite(self.data)),
+                 'np.all(np.isfinite(self.data))')
 
         # Information about this object
-        if alter and not self.history:
-            self.history = ['']
-            alterations += ["{0}.history = ['']".format(self)]
-        if alter and isinstance(self.history, str):
-            self.history = self.history.split('\n')
-            alterations += ["{0}.history = {0}.history.split('\n')".format(self)]
         test(errors,
-             isinstance(self.history, list),
-             'isinstance(self.history, list) # type(self.history)={0}'.format(type(self.history)))
+             isinstance(self.history, (list, WaveformHistory)),
+             lambda: 'isinstance(self.history, (list, WaveformHistory)) # type(self.history)={0}'.format(
+                 type(self.history)))
         test(errors,
              isinstance(self.history[0], str),
-             'isinstance(self.history[0], str) # type(self.history[0])={0}'.format(type(self.history[0])))
+             lambda: 'isinstance(self.history[0], str) # type(self.history[0])={0}'.format(type(self.history[0])))
         test(errors,
              isinstance(self.frameType, numbers.Integral),
-             'isinstance(self.frameType, numbers.Integral) # type(self.frameType)={0}'.format(type(self.frameType)))
+             lambda: 'isinstance(self.frameType, numbers.Integral) # type(self.frameType)={0}'.format(
+                 type(self.frameType)))
         test(errors,
              self.frameType in FrameType,
-             'self.frameType in FrameType # self.frameType={0}'.format(self.frameType))
+             lambda: 'self.frameType in FrameType # self.frameType={0}'.format(self.frameType))
         test(errors,
              isinstance(self.dataType, numbers.Integral),
-             'isinstance(self.dataType, numbers.Integral) # type(self.dataType)={0}'.format(type(self.dataType)))
+             lambda: 'isinstance(self.dataType, numbers.Integral) # type(self.dataType)={0}'.format(
+                 type(self.dataType)))
         test(errors,
              self.dataType in DataType,
-             'self.dataType in DataType # self.dataType={0}'.format(self.dataType))
+             lambda: 'self.dataType in DataType # self.dataType={0}'.format(self.dataType))
         test(errors,
              isinstance(self.r_is_scaled_out, bool),
-             'isinstance(self.r_is_scaled_out, bool) # type(self.r_is_scaled_out)={0}'.format(
+             lambda: 'isinstance(self.r_is_scaled_out, bool) # type(self.r_is_scaled_out)={0}'.format(
                  type(self.r_is_scaled_out)))
         test(errors,
              isinstance(self.m_is_scaled_out, bool),
-             'isinstance(self.m_is_scaled_out, bool) # type(self.m_is_scaled_out)={0}'.format(
+             lambda: 'isinstance(self.m_is_scaled_out, bool) # type(self.m_is_scaled_out)={0}'.format(
                  type(self.m_is_scaled_out)))
         test(errors,
              isinstance(self.num, numbers.Integral),
-             'isinstance(self.num, numbers.Integral) # type(self.num)={0}'.format(type(self.num)))
+             lambda: 'isinstance(self.num, numbers.Integral) # type(self.num)={0}'.format(type(self.num)))
 
         if alterations:
             self._append_history(alterations)
@@ -407,10 +512,41 @@ class WaveformBase(_object):
 
         self.__history_depth__ -= 1
         self._append_history('WaveformBase.ensure_validity' +
-                             '({0}, alter={1}, assertions={2})'.format(self, alter, assertions))
+                             '({0}, alter={1}, assertions={2}, validation_level={3})'.format(
+                                 self, alter, assertions, validation_level))
 
         return True
 
+    def _standard_alterations(self):
+        """Make the alterations of `ensure_validity` that convert members to their standard forms
+
+        These are inexpensive, and are made at every validation level (including `NoValidation`) when `alter` is
+        True.  Returns a list describing the alterations that were made.
+
+        """
+        alterations = []
+        if isinstance(self.t, np.ndarray) and self.t.ndim == 2 and self.t.shape[1] == 1:
+            self.t = self.t[:, 0]
+            alterations += ['{0}.t = {0}.t[:,0]'.format(self)]
+        if self.frame is None:
+            self.frame = np.empty((0,), dtype=np.quaternion)
+            alterations += ['{0}.frame = np.empty((0,), dtype=np.quaternion)'.format(self)]
+        if isinstance(self.frame, np.ndarray) and self.frame.dtype == np.dtype(np.float):
+            try:  # Might fail because of shape
+                self.frame = quaternion.as_quat_array(self.frame)
+                alterations += ['{0}.frame = quaternion.as_quat_array({0}.frame)'.format(self)]
+            except (AssertionError, ValueError):
+                pass
+        if not self.history:
+            self.history = WaveformHistory([''])
+            alterations += ["{0}.history = WaveformHistory([''])".format(self)]
+        if isinstance(self.history, str):
+            self.history = WaveformHistory(self.history.split('\n'))
+            alterations += ["{0}.history = WaveformHistory({0}.history.split('\n'))".format(self)]
+        if isinstance(self.history, list):
+            self.history = WaveformHistory(self.history)
+        return alterations
+
     @property
     def is_valid(self):
         return self.ensure_validity(alter=False, assertions=False)
@@ -531,9 +667,9 @@ class WaveformBase(_object):
         else:
             n = np.empty((self.t[indices].shape[0],), dtype=float)
         if take_sqrt:
-            complex_array_abs(self.data_2d[indices], n)
+            select(complex_array_abs, complex_array_abs_parallel, n.size)(self.data_2d[indices], n)
         else:
-            complex_array_norm(self.data_2d[indices], n)
+            select(complex_array_norm, complex_array_norm_parallel, n.size)(self.data_2d[indices], n)
         return n
 
     def max_norm_index(self, skip_fraction_of_data=4):
@@ -560,9 +696,76 @@ class WaveformBase(_object):
         """
         return self.t[self.max_norm_index(skip_fraction_of_data=skip_fraction_of_data)]
 
+    def derivative(self, engine='spline', order=None):
+        """Time derivative of the data
+
+        The result is cached, and reused until `t` or `data` changes -- whether by assignment (including augmented
+        assignment like `W.data *= 2`) or by scri functions altering the arrays in place.  Checking this costs
+        O(1), so the contents of the arrays are not examined: code that alters individual elements directly (as in
+        `W.data[0] = 0`) must reassign the array afterwards (as in `W.data = W.data`) for the change to be noticed.
+        The returned array is read-only; copy it before altering it.
+
+        Parameters
+        ----------
+        engine : str, optional
+            One of 'spline' (the default), 'finite_difference', or 'spectral'.  See `scri.differentiation` for
+            details.
+        order : int, optional
+            Order of accuracy of the 'finite_difference' engine (default 4).  Ignored otherwise.
+
+        """
+        return self._cached_derivative(self.data, engine, order)
+
+    def _cached_derivative(self, data, engine, order, key=None):
+        """Return the derivative of `data` (some part of `self.data`), using the cache if possible"""
+        cache = _derivative_caches.setdefault(self, {})
+        version = self._data_version()
+        cached = cache.get((engine, order, key))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        data_dot = differentiate(self.t, data, engine, order)
+        data_dot.flags.writeable = False
+        cache[(engine, order, key)] = (version, data_dot)
+        return data_dot
+
+    def _cached_spline_coefficients(self):
+        """Return spline coefficients of the data and the sparse operator giving their derivative, using the cache
+
+        The derivative of the data, as given by `derivative()`, is `matrix.dot(coefficients)`; see
+        `DerivativePlan.spline_coefficients`.  This allows kernels to compute the derivative at each time step as it
+        is needed, without storing the derivative for all times.
+
+        """
+        cache = _derivative_caches.setdefault(self, {})
+        version = self._data_version()
+        cached = cache.get('spline_coefficients')
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        plan = derivative_plan(self.t, 'spline')
+        coefficients = plan.spline_coefficients(self.data)
+        coefficients.flags.writeable = False
+        cache['spline_coefficients'] = (version, (coefficients, plan.matrix))
+        return coefficients, plan.matrix
+
+    def _data_version(self):
+        """Return a token that changes whenever `t` or `data` is assigned or prepared for alteration in place
+
+        Caches of quantities derived from the data store this token, and are valid as long as it compares equal.  It
+        consists of the identities of the two arrays and the number of modifications counted by `__setattr__` and
+        `_copy_on_write`, so it is found in O(1) time, independent of the size of the data.
+
+        """
+        return id(self.t), id(self.data), _modification_counts.get(self, 0)
+
+    def __setattr__(self, name, value):
+        if name == 't' or name == 'data':
+            _modification_counts[self] = _modification_counts.get(self, 0) + 1
+        super(WaveformBase, self).__setattr__(name, value)
+
     @property
     def data_dot(self):
-        return quaternion.calculus.derivative(self.data, self.t)
+        """Time derivative of the data, using the default spline engine; see `derivative`"""
+        return self.derivative()
 
     # Data representations
     def _append_history(self, hist, additional_depth=0):
@@ -695,6 +898,66 @@ class WaveformBase(_object):
         W._append_history('{0} = {1}.copy_without_data()'.format(W, self))
         return W
 
+    @waveform_alterations
+    def astype(self, dtype):
+        """Return a copy of the object with `data` converted to the given type
+
+        The main use of this function is to opt in to single-precision storage by passing `np.complex64`, which
+        halves the memory and bandwidth needed by the data; `np.complex128` converts back to double precision.  The
+        time and frame data are always kept in double precision.
+
+        Single precision has a relative resolution of about 6e-8, so each data point is stored with a relative error
+        of that order.  Norms and the quantities in `scri.mode_calculations` are accumulated in double precision, so
+        they inherit only that representation error.  Rotations and interpolation operate on single-precision values
+        but use double-precision Wigner matrices and spline coefficients, which typically limits their relative
+        accuracy to around 1e-6 after many operations.  Double precision should be used whenever results are needed
+        more accurately than that, such as for extrapolation or for differences between nearly identical waveforms.
+
+        Parameters
+        ----------
+        dtype : numpy dtype
+            One of `np.complex128` (or `complex`) or `np.complex64` for complex data.
+
+        """
+        W = WaveformBase.copy_without_data(self)
+        W.t = np.copy(self.t)
+        W.frame = np.copy(self.frame)
+        W.data = self.data.astype(dtype)
+        W.__history_depth__ -= 1
+        W._append_history('{0} = {1}.astype({2})'.format(W, self, np.dtype(dtype).name))
+        return W
+
+    def _view(self):
+        """Return a new object sharing all attributes with this one by reference
+
+        This is the lightweight constructor used for slicing.  Nothing is deep-copied, and neither the initializer
+        nor `ensure_validity` is run; the result simply gets a new `num` and its own history (which initially shares
+        all of its content with this object's history).  Both objects are recorded as sharing their data, so that
+        operations altering data in place can copy it first; see `_copy_on_write`.
+
+        """
+        W = object.__new__(type(self))
+        W.__dict__.update(self.__dict__)
+        W.__num = type(self).__num
+        type(self).__num += 1
+        W.history = WaveformHistory(self.history)
+        _record_shared_data(self, W)
+        return W
+
+    def _copy_on_write(self):
+        """Ensure that `data` is not shared with any other object before it is altered in place
+
+        Functions that modify `self.data` in place should call this first.  If this object was created by slicing,
+        or has been sliced, and any of the other objects involved are still alive and still share memory with this
+        one, `data` is replaced by a copy.  In any case, this object no longer counts as sharing its data, and cached
+        quantities derived from the data are marked as stale; see `_data_version`.
+
+        """
+        if _release_shared_data(self):
+            self.data = np.copy(self.data)
+        else:
+            _modification_counts[self] = _modification_counts.get(self, 0) + 1
+
     def _allclose(self, other, report_all=True, rtol=1e-10, atol=1e-10,
                   compare_history_beginnings=False, exceptions=[]):
         """Check that member data in two waveforms are the same
@@ -762,7 +1025,7 @@ class WaveformBase(_object):
         See the docstring of the WaveformBase class for examples.
 
         """
-        W = WaveformBase.copy_without_data(self)
+        W = self._view()
 
         # Remove trivial tuple structure first
         if isinstance(key, tuple) and len(key) == 1:
@@ -790,31 +1053,44 @@ class WaveformBase(_object):
 
 
     @waveform_alterations
-    def interpolate(self, tprime):
+    def interpolate(self, tprime, scheme='cubic', width=None):
         """Interpolate the frame and data onto the new set of time steps
 
         Note that only `t`, `frame`, and `data` are changed in this function.  If there is a corresponding data set
         in a subclass, for example, the subclass must override this function to set that data set -- though this
         function should probably be called to handle the ugly stuff.
 
+        By default, the data are interpolated with cubic splines identical to those of `scipy.interpolate.splrep`
+        with `s=0`, but all data sets are handled together: the spline system is factored once for the input time
+        grid, and the coefficients for every mode (and both real and imaginary parts) are found in a single solve.
+        Cheaper schemes may be selected when lower accuracy suffices, and are particularly fast when the input times
+        are uniformly spaced.  See the `scri.interpolation` module for details.
+
+        Parameters
+        ----------
+        tprime : float array
+            New time steps.
+        scheme : str, optional
+            One of 'linear', 'hermite', 'cubic' (the default), 'lagrange', or 'sinc'.  The last two require uniformly
+            spaced `t`.  With 'linear', the frame is interpolated by slerp; otherwise it uses squad.
+        width : int, optional
+            Number of points in each stencil for the 'lagrange' (default 4) and 'sinc' (default 8) schemes.
+
         """
         # Copy the information fields, but not the data
         W = WaveformBase.copy_without_data(self)
 
         W.t = np.copy(tprime)
-        W.frame = quaternion.squad(self.frame, self.t, W.t)
-        W.data = np.empty((W.n_times,)+self.data.shape[1:], dtype=self.data.dtype)
-        if self.data.dtype == np.dtype(complex):
-            for i in range(W.n_data_sets):
-                W.data_2d[:, i] = (splev(W.t, splrep(self.t, self.data_2d.view(dtype=float)[:, 2*i], s=0), der=0)
-                                   + 1j*splev(W.t, splrep(self.t, self.data_2d.view(dtype=float)[:, 2*i+1], s=0), der=0))
-        elif self.data.dtype == np.dtype(float):
-            for i in range(W.n_data_sets):
-                W.data_2d[:, i] = splev(W.t, splrep(self.t, self.data_2d[:, i], s=0), der=0)
-        else:
+        W.frame = interpolate_frame(self.frame, self.t, W.t, scheme)
+        if self.data.dtype not in complex_dtypes + (np.dtype(np.float64), np.dtype(np.float32)):
             raise TypeError("Unknown self.data.dtype={0}".format(self.data.dtype))
+        W.data = interpolate_data(self.t, self.data, W.t, scheme, width)
         W.__history_depth__ -= 1
-        W._append_history('{0} = {1}.interpolate({2})'.format(W, self, tprime))
+        if scheme == 'cubic':
+            W._append_history('{0} = {1}.interpolate({2})'.format(W, self, tprime))
+        else:
+            W._append_history('{0} = {1}.interpolate({2}, scheme={3!r}, width={4})'.format(W, self, tprime,
+                                                                                         scheme, width))
         return W
 
 
@@ -3,8 +3,8 @@
 
 from __future__ import print_function, division, absolute_import
 
-from . import (Inertial, WaveformModes, SpinWeights, h, sigma, psi0, psi1, psi2, psi3)
-from .waveform_base import WaveformBase, waveform_alterations
+from . import (Inertial, WaveformModes, SpinWeights, h, sigma, psi0, psi1, psi2, psi3, NoValidation)
+from .waveform_base import WaveformBase, waveform_alterations, complex_dtypes
 
 import sys
 import warnings
@@ -27,15 +27,19 @@ class WaveformGrid(WaveformBase):
         super(WaveformGrid, self).__init__(*args, **kwargs)
 
     @waveform_alterations
-    def ensure_validity(self, alter=True, assertions=False):
+    def ensure_validity(self, alter=True, assertions=False, validation_level=None):
         """Try to ensure that the `WaveformGrid` object is valid
 
-        See `WaveformBase.ensure_validity` for the basic tests.  This function also includes tests that `data` is
-        complex, and consistent with the n_theta and n_phi values.
+        See `WaveformBase.ensure_validity` for the basic tests, and the meaning of `validation_level`.  This function
+        also includes tests that `data` is complex, and consistent with the n_theta and n_phi values.
 
         """
         import numbers
 
+        if validation_level is None:
+            from .waveform_base import get_validation_level
+            validation_level = get_validation_level()
+
         errors = []
         alterations = []
 
@@ -46,30 +50,34 @@ class WaveformGrid(WaveformBase):
             from .waveform_base import test_without_assertions
             test = test_without_assertions
 
+        if validation_level == NoValidation:
+            return super(WaveformGrid, self).ensure_validity(alter, assertions, validation_level)
+
         test(errors,
              isinstance(self.__n_theta, numbers.Integral),
-             'isinstance(self.__n_theta, numbers.Integral)  # type(self.__n_theta)={0}'.format(type(self.__n_theta)))
+             lambda: 'isinstance(self.__n_theta, numbers.Integral)  # type(self.__n_theta)={0}'.format(
+                 type(self.__n_theta)))
         test(errors,
              isinstance(self.__n_phi, numbers.Integral),
-             'isinstance(self.__n_phi, numbers.Integral)  # type(self.__n_phi)={0}'.format(type(self.__n_phi)))
+             lambda: 'isinstance(self.__n_phi, numbers.Integral)  # type(self.__n_phi)={0}'.format(type(self.__n_phi)))
         test(errors,
              self.__n_theta >= 0,
-             'self.__n_theta>=0 # {0}'.format(self.__n_theta))
+             lambda: 'self.__n_theta>=0 # {0}'.format(self.__n_theta))
         test(errors,
              self.__n_phi >= 0,
-             'self.__n_phi>=0 # {0}'.format(self.__n_phi))
+             lambda: 'self.__n_phi>=0 # {0}'.format(self.__n_phi))
 
         test(errors,
-             self.data.dtype == np.dtype(np.complex),
-             'self.data.dtype == np.dtype(np.complex)  # self.data.dtype={0}'.format(self.data.dtype))
+             self.data.dtype in complex_dtypes,
+             lambda: 'self.data.dtype in complex_dtypes  # self.data.dtype={0}'.format(self.data.dtype))
         test(errors,
              self.data.ndim >= 2,
-             'self.data.ndim >= 2 # self.data.ndim={0}'.format(self.data.ndim))
+             lambda: 'self.data.ndim >= 2 # self.data.ndim={0}'.format(self.data.ndim))
         test(errors,
              self.data.shape[1] == self.__n_theta * self.__n_phi,
-             'self.data.shape[1] == self.__n_theta * self.__n_phi  '
-             '# self.data.shape={0}; self.__n_theta * self.__n_phi={1}'.format(self.data.shape[1],
-                                                                               self.__n_theta * self.__n_phi))
+             lambda: 'self.data.shape[1] == self.__n_theta * self.__n_phi  '
+                     '# self.data.shape={0}; self.__n_theta * self.__n_phi={1}'.format(self.data.shape[1],
+                                                                                       self.__n_theta * self.__n_phi))
 
         if alterations:
             self._append_history(alterations)
@@ -79,11 +87,13 @@ class WaveformGrid(WaveformBase):
             return False
 
         # Call the base class's version
-        super(WaveformGrid, self).ensure_validity(alter, assertions)
+        if not super(WaveformGrid, self).ensure_validity(alter, assertions, validation_level):
+            return False
 
         self.__history_depth__ -= 1
-        self._append_history('WaveformModes.ensure_validity' +
-                             '({0}, alter={1}, assertions={2})'.format(self, alter, assertions))
+        self._append_history('WaveformGrid.ensure_validity' +
+                             '({0}, alter={1}, assertions={2}, validation_level={3})'.format(
+                                 self, alter, assertions, validation_level))
 
         return True
 
@@ -115,12 +125,14 @@ class WaveformGrid(WaveformBase):
 
         final_dim = int(np.prod(self.data.shape[2:]))
         old_data = self.data.reshape((self.n_times, self.n_theta, self.n_phi, final_dim))
-        new_data = np.empty((self.n_times, sf.LM_total_size(ell_min, ell_max), final_dim), dtype=complex)
-        # Note that spinsfast returns all modes, including ell<abs(s).  So we just chop those off
+        new_data = np.empty((self.n_times, sf.LM_total_size(ell_min, ell_max), final_dim), dtype=self.data.dtype)
+        # Note that spinsfast returns all modes, including ell<abs(s).  So we just chop those off.  Also, spinsfast only
+        # works in double precision, so single-precision data are converted for the transform.
         for i_time in range(self.n_times):
             for i_final in range(final_dim):
-                new_data[i_time, :, i_final] = spinsfast.map2salm(old_data[i_time, :, :, i_final], s, ell_max)\
-                    [sf.LM_index(ell_min, -ell_min, 0):]
+                new_data[i_time, :, i_final] = spinsfast.map2salm(
+                    np.asarray(old_data[i_time, :, :, i_final], dtype=complex), s, ell_max
+                )[sf.LM_index(ell_min, -ell_min, 0):]
         new_data = new_data.reshape((self.n_times, sf.LM_total_size(ell_min, ell_max))+self.data.shape[2:])
 
         # old_data = self.data.reshape((self.n_times, self.n_theta, self.n_phi)+self.data.shape[2:])
@@ -453,8 +465,9 @@ class WaveformGrid(WaveformBase):
         # Delete the extra rows from fprm_i_j_k, corresponding to values of u' outside of [u'min, u'max]
         fprm_iprm_j_k = np.delete(fprm_i_j_k, np.s_[len(uprm_iprm):], 0)
 
-        # Reshape, to have correct final dimensions
+        # Reshape, to have correct final dimensions, and return to the precision of the input data
         fprm_iprm_j_k = fprm_iprm_j_k.reshape((fprm_iprm_j_k.shape[0], n_theta*n_phi)+w_modes.data.shape[2:])
+        fprm_iprm_j_k = fprm_iprm_j_k.astype(w_modes.data.dtype, copy=False)
 
         # Encapsulate into a new grid waveform
         g = cls(t=uprm_iprm, data=fprm_iprm_j_k, history=w_modes.history,
@@ -0,0 +1,261 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+from . import WaveformModes, NoValidation
+from .waveform_base import WaveformBase, waveform_alterations
+from .waveform_modes import _swsh_table
+from .interpolation import _as_real_columns, _array_fingerprint
+
+import sys
+import warnings
+import numpy as np
+import quaternion
+
+# Antenna patterns (F+, Fx) of two idealized "detectors" measuring h+ and hx directly
+plus_and_cross = np.array([[1.0, 0.0], [0.0, 1.0]])
+
+
+def antenna_patterns(theta, phi, psi):
+    """Antenna patterns (F+, Fx) of an interferometer with perpendicular arms along its x and y axes
+
+    Parameters
+    ----------
+    theta, phi : float arrays
+        Spherical coordinates of the source's sky position, in the detector's frame.
+    psi : float array
+        Polarization angle.
+
+    Returns
+    -------
+    float array of shape `np.broadcast(theta, phi, psi).shape + (2,)`
+
+    """
+    theta, phi, psi = np.broadcast_arrays(theta, phi, psi)
+    a = 0.5 * (1 + np.cos(theta) ** 2) * np.cos(2 * phi)
+    b = np.cos(theta) * np.sin(2 * phi)
+    return np.stack((a * np.cos(2 * psi) - b * np.sin(2 * psi), a * np.sin(2 * psi) + b * np.cos(2 * psi)), axis=-1)
+
+
+def _array_summary(a):
+    """Short description of an array for the history, giving its shape and a hash of its content"""
+    shape, dtype, digest = _array_fingerprint(a)
+    return '<{0} array of shape {1}, sha1 {2}>'.format(dtype, shape, digest)
+
+
+class DetectorProjection(object):
+    """Precomputed projection of modes onto the responses of detectors at many sky positions
+
+    The strain at a point on the sphere is `h+ - i hx = sum_{ell,m} h_{ell,m} sY_{ell,m}`, and the response of a
+    detector with antenna patterns (F+, Fx) is `F+ h+ + Fx hx = Re[(F+ + i Fx) (h+ - i hx)]`.  For given angles and
+    antenna patterns, this is a fixed real-linear map from the real and imaginary parts of the modes to the
+    responses, so the spin-weighted spherical harmonics are evaluated once, combined with the antenna patterns, and
+    stored as a single real matrix.  Projecting a waveform onto every (angle, detector) pair is then a single matrix
+    product over all times.  The same projection may be applied to any number of waveforms with the same spin weight
+    and range of ell values.
+
+    Parameters
+    ----------
+    spin_weight : int
+    ell_min, ell_max : int
+        Spin weight and range of ell values of the modes to be projected.
+    angles : float array of shape (n_angles, 2)
+        Spherical coordinates (theta, phi) of the direction from the source to each observer, in the inertial frame.
+        For a binary whose orbital angular momentum is along the z axis, theta is the inclination, and phi is the
+        azimuthal angle, which is equivalent to (minus) a shift in orbital phase.
+    antenna_patterns : float array of shape (n_detectors, 2) or (n_angles, n_detectors, 2), optional
+        Antenna patterns (F+, Fx) of each detector, either the same for every angle or given separately for each.
+        The default, `plus_and_cross`, gives h+ and hx themselves as the two "detectors".
+    frame : quaternion, optional
+        Constant rotor giving the frame of the modes; see `WaveformBase`.  Default is the identity.
+
+    """
+
+    def __init__(self, spin_weight, ell_min, ell_max, angles, antenna_patterns=plus_and_cross, frame=None):
+        angles = np.array(angles, dtype=float).reshape((-1, 2))
+        antenna_patterns = np.asarray(antenna_patterns, dtype=float)
+        if antenna_patterns.ndim == 2:
+            antenna_patterns = np.broadcast_to(antenna_patterns, (angles.shape[0],) + antenna_patterns.shape)
+        if antenna_patterns.shape[0] != angles.shape[0] or antenna_patterns.ndim != 3 or antenna_patterns.shape[2] != 2:
+            raise ValueError("Antenna patterns must have shape (n_detectors, 2) or (n_angles, n_detectors, 2)={0}; "
+                             "got {1}".format((angles.shape[0], -1, 2), antenna_patterns.shape))
+        self.spin_weight = spin_weight
+        self.ell_min = ell_min
+        self.ell_max = ell_max
+        self.angles = angles
+        self.antenna_patterns = antenna_patterns
+        rotors = quaternion.from_spherical_coords(angles[:, 0], angles[:, 1])
+        if frame is not None:
+            rotors = np.conjugate(frame) * rotors
+        # Spin-weighted spherical harmonics, of shape (n_modes, n_angles)
+        swsh = _swsh_table(spin_weight, ell_min, ell_max, rotors)
+        # Complex response coefficients, of shape (n_modes, n_angles, n_detectors)
+        F = antenna_patterns[..., 0] + 1j * antenna_patterns[..., 1]
+        coefficients = (swsh[:, :, np.newaxis] * F[np.newaxis, :, :]).reshape((swsh.shape[0], -1))
+        # Re[d (a + i b)] = Re(d) a - Im(d) b, with real and imaginary parts of the data interleaved by column
+        self.matrix = np.empty((2 * swsh.shape[0], coefficients.shape[1]))
+        self.matrix[0::2] = coefficients.real
+        self.matrix[1::2] = -coefficients.imag
+
+    @property
+    def n_angles(self):
+        return self.angles.shape[0]
+
+    @property
+    def n_detectors(self):
+        return self.antenna_patterns.shape[1]
+
+    def __call__(self, data):
+        """Project mode data of shape (n_times, n_modes) onto responses of shape (n_times, n_angles, n_detectors)"""
+        columns = _as_real_columns(data)
+        responses = columns.dot(self.matrix.astype(columns.dtype, copy=False))
+        return responses.reshape((data.shape[0], self.n_angles, self.n_detectors))
+
+
+class WaveformInDetector(WaveformBase):
+    """Real responses of detectors to a waveform, observed from many directions
+
+    The data have shape `(n_times, n_angles, n_detectors)`, giving the response of each detector to the waveform
+    as seen by an observer in each direction.  Objects of this type are usually created from a `WaveformModes`
+    object with `WaveformInDetector.from_modes` (or equivalently `WaveformModes.to_detector`).  Besides the attributes
+    of `WaveformBase`, this object has the `angles` and `antenna_patterns` used to construct it; see
+    `DetectorProjection` for their meanings.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initializer for WaveformInDetector object"""
+        # Do not directly access __angles or __antenna_patterns; use angles or antenna_patterns instead
+        self.__angles = np.array(kwargs.pop('angles', np.empty((0, 2))), dtype=float).reshape((-1, 2))
+        self.__antenna_patterns = np.array(kwargs.pop('antenna_patterns', np.empty((0, 0, 2))), dtype=float)
+        if len(args) == 0:
+            kwargs.setdefault('data', np.empty((0, 0, 0), dtype=float))
+        super(WaveformInDetector, self).__init__(*args, **kwargs)
+
+    @waveform_alterations
+    def ensure_validity(self, alter=True, assertions=False, validation_level=None):
+        """Try to ensure that the `WaveformInDetector` object is valid
+
+        See `WaveformBase.ensure_validity` for the basic tests, and the meaning of `validation_level`.  This function
+        also includes tests that `data` is real, and consistent with the angles and antenna patterns.
+
+        """
+        if validation_level is None:
+            from .waveform_base import get_validation_level
+            validation_level = get_validation_level()
+
+        errors = []
+
+        if assertions:
+            from .waveform_base import test_with_assertions
+            test = test_with_assertions
+        else:
+            from .waveform_base import test_without_assertions
+            test = test_without_assertions
+
+        if validation_level == NoValidation:
+            return super(WaveformInDetector, self).ensure_validity(alter, assertions, validation_level)
+
+        test(errors,
+             self.data.dtype in (np.dtype(np.float64), np.dtype(np.float32)),
+             lambda: 'self.data.dtype in (np.dtype(np.float64), np.dtype(np.float32))  '
+                     '# self.data.dtype={0}'.format(self.data.dtype))
+        test(errors,
+             self.data.ndim == 3,
+             lambda: 'self.data.ndim == 3 # self.data.ndim={0}'.format(self.data.ndim))
+        test(errors,
+             self.__antenna_patterns.ndim == 3,
+             lambda: 'self.__antenna_patterns.ndim == 3 # self.__antenna_patterns.ndim={0}'.format(
+                 self.__antenna_patterns.ndim))
+        test(errors,
+             self.data.ndim != 3 or self.data.shape[1:] == (self.n_angles, self.n_detectors),
+             lambda: 'self.data.shape[1:] == (self.n_angles, self.n_detectors)  '
+                     '# self.data.shape={0}; self.n_angles={1}; self.n_detectors={2}'.format(
+                         self.data.shape, self.n_angles, self.n_detectors))
+
+        if errors:
+            warnings.warn("The following conditions were found to be incorrectly False:\n\t" + '\n\t'.join(errors))
+            return False
+
+        # Call the base class's version
+        if not super(WaveformInDetector, self).ensure_validity(alter, assertions, validation_level):
+            return False
+
+        self.__history_depth__ -= 1
+        self._append_history('WaveformInDetector.ensure_validity' +
+                             '({0}, alter={1}, assertions={2}, validation_level={3})'.format(
+                                 self, alter, assertions, validation_level))
+
+        return True
+
+    @property
+    def angles(self):
+        return self.__angles
+
+    @property
+    def antenna_patterns(self):
+        return self.__antenna_patterns
+
+    @property
+    def n_angles(self):
+        return self.__angles.shape[0]
+
+    @property
+    def n_detectors(self):
+        return self.__antenna_patterns.shape[1] if self.__antenna_patterns.ndim == 3 else 0
+
+    @classmethod
+    def from_modes(cls, w_modes, angles, antenna_patterns=plus_and_cross, projection=None):
+        """Project modes onto the responses of detectors observing from the given directions
+
+        Parameters
+        ----------
+        w_modes : WaveformModes
+            Modes to be projected.  The frame must be empty or constant; waveforms in rotating frames must be
+            transformed to an inertial frame first.
+        angles : float array of shape (n_angles, 2)
+        antenna_patterns : float array of shape (n_detectors, 2) or (n_angles, n_detectors, 2), optional
+            See `DetectorProjection`.  The default gives h+ and hx.
+        projection : DetectorProjection, optional
+            A precomputed projection to use instead of `angles` and `antenna_patterns` -- for example, when
+            projecting many waveforms onto the same directions and detectors.
+
+        """
+        if not isinstance(w_modes, WaveformModes):
+            raise TypeError("Expected WaveformModes object in argument 1; "
+                            "got `{0}` instead.".format(type(w_modes).__name__))
+        if w_modes.frame.size > 1:
+            raise ValueError("Waveforms with time-dependent frames cannot be projected; "
+                             "transform to an inertial frame first")
+        frame = w_modes.frame[0] if w_modes.frame.size == 1 else None
+        if projection is None:
+            projection = DetectorProjection(w_modes.spin_weight, w_modes.ell_min, w_modes.ell_max, angles,
+                                            antenna_patterns, frame)
+        elif (projection.spin_weight, projection.ell_min, projection.ell_max) != (w_modes.spin_weight,
+                                                                                 w_modes.ell_min, w_modes.ell_max):
+            raise ValueError("Projection is for spin weight {0} and ell range [{1}, {2}], but waveform has spin weight "
+                             "{3} and ell range [{4}, {5}]".format(projection.spin_weight, projection.ell_min,
+                                                                   projection.ell_max, w_modes.spin_weight,
+                                                                   w_modes.ell_min, w_modes.ell_max))
+        return cls(t=np.copy(w_modes.t), frame=np.empty((0,), dtype=np.quaternion), data=projection(w_modes.data),
+                   angles=projection.angles, antenna_patterns=projection.antenna_patterns,
+                   history=w_modes.history, frameType=w_modes.frameType, dataType=w_modes.dataType,
+                   r_is_scaled_out=w_modes.r_is_scaled_out, m_is_scaled_out=w_modes.m_is_scaled_out,
+                   constructor_statement="{0}.from_modes({1}, angles={2}, antenna_patterns={3})".format(
+                       cls.__name__, w_modes, _array_summary(projection.angles),
+                       _array_summary(projection.antenna_patterns)))
+
+    def __repr__(self):
+        # "The goal of __str__ is to be readable; the goal of __repr__ is to be unambiguous." --- stackoverflow
+        rep = super(WaveformInDetector, self).__repr__()
+        rep += "\n# n_angles={0}, n_detectors={1}".format(self.n_angles, self.n_detectors)
+        return rep
+
+
+# Now, we can assign WaveformModes objects new capabilities based on WaveformInDetector functions
+WaveformModes.to_detector = lambda w_modes, *args, **kwargs: WaveformInDetector.from_modes(w_modes, *args, **kwargs)
+if sys.version_info[0] == 2:
+    WaveformModes.to_detector.__func__.__doc__ = WaveformInDetector.from_modes.__doc__
+else:
+    WaveformModes.to_detector.__doc__ = WaveformInDetector.from_modes.__doc__
@@ -3,13 +3,39 @@
 
 from __future__ import print_function, division, absolute_import
 
-from .waveform_base import WaveformBase, waveform_alterations
+from .waveform_base import WaveformBase, waveform_alterations, complex_dtypes
+from .interpolation import _LRUCache, _array_fingerprint
 
 import warnings
 import numpy as np
+import quaternion
 import spherical_functions as sf
 from . import *
 
+# Tables of spin-weighted spherical harmonics, keyed by spin weight, ell range, and rotors
+_swsh_cache = _LRUCache(8)
+
+# Default maximum number of output elements computed by each matrix product in `WaveformModes.evaluate`
+_evaluation_chunk_elements = 2 ** 22
+
+
+def _swsh_table(spin_weight, ell_min, ell_max, rotors):
+    """Read-only array of sYlm(R) with shape `(n_modes, n_rotors)`, reusing a cached table if possible
+
+    The rows are in the standard order of modes for the given range of ell values, so that `data.dot(table)`
+    evaluates modes `data` of shape `(n_times, n_modes)` at each rotor.
+
+    """
+    rotors = np.asarray(rotors, dtype=np.quaternion).ravel()
+    key = ('swsh', spin_weight, ell_min, ell_max, _array_fingerprint(quaternion.as_float_array(rotors)))
+    table = _swsh_cache.get(key)
+    if table is None:
+        table = sf.SWSH_grid(rotors, spin_weight, ell_max)[:, sf.LM_index(ell_min, -ell_min, 0):]
+        table = np.ascontiguousarray(table.T)
+        table.flags.writeable = False
+        _swsh_cache.put(key, table)
+    return table
+
 
 class WaveformModes(WaveformBase):
     """Object containing time, frame, and data, along with related information
@@ -45,10 +71,11 @@ class WaveformModes(WaveformBase):
     LM : int array (read only)
         Array of (ell,m) values corresponding to the `data` member.  This is automatically constructed based on the
         values of ell_min and ell_max, and cannot be reassigned.
-    history : list of strings
+    history : WaveformHistory
         As far as possible, all functions applied to the object are recorded in the `history` variable.  In fact,
         the object should almost be able to be recreated using the commands in the history list. Commands taking
-        large arrays, however, are shortened -- so the data will not be entirely reconstructable.
+        large arrays, however, are shortened -- so the data will not be entirely reconstructable.  This behaves like
+        a list of strings; see `scri.history.WaveformHistory` for details.
     frameType : int
         Index corresponding to `scri.FrameType` appropriate for `data`.
     dataType : int
@@ -73,7 +100,8 @@ class WaveformModes(WaveformBase):
     It is important to note, however, that as with numpy array slices, slicing a WaveformMode object will not
     typically copy the original data; the result will simply be a view into the data.  This means that changing the
     data in the slice can change the data in the original.  If you want to make a copy, you should probably use the
-    copy constructor: `W2 = WaveformMode(W1)`. It is also possible to use the standard copy.deepcopy method.
+    copy constructor: `W2 = WaveformMode(W1)`. It is also possible to use the standard copy.deepcopy method.  As
+    with `WaveformBase`, functions that rotate the modes in place copy the data first if it is shared with a slice.
 
     Also note that the first slice dimension corresponds to the indices of the time data, but the second dimension
     does NOT correspond to indices.  Instead, because this object tries to enforce completeness of the mode data,
@@ -140,15 +168,19 @@ class WaveformModes(WaveformBase):
         super(WaveformModes, self).__init__(*args, **kwargs)
 
     @waveform_alterations
-    def ensure_validity(self, alter=True, assertions=False):
+    def ensure_validity(self, alter=True, assertions=False, validation_level=None):
         """Try to ensure that the `WaveformModes` object is valid
 
-        See `WaveformBase.ensure_validity` for the basic tests.  This function also includes tests that `data` is
-        complex, and consistent with the ell_min and ell_max values.
+        See `WaveformBase.ensure_validity` for the basic tests, and the meaning of `validation_level`.  This function
+        also includes tests that `data` is complex, and consistent with the ell_min and ell_max values.
 
         """
         import numbers
 
+        if validation_level is None:
+            from .waveform_base import get_validation_level
+            validation_level = get_validation_level()
+
         errors = []
         alterations = []
 
@@ -159,21 +191,26 @@ class WaveformModes(WaveformBase):
             from .waveform_base import test_without_assertions
             test = test_without_assertions
 
+        if validation_level == NoValidation:
+            return super(WaveformModes, self).ensure_validity(alter, assertions, validation_level)
+
         # We first need to check that the ell values make sense,
         # because we'll use these below
         test(errors,
              isinstance(self.__ell_min, numbers.Integral),
-             'isinstance(self.__ell_min, numbers.Integral) # type(self.__ell_min)={0}'.format(type(self.__ell_min)))
+             lambda: 'isinstance(self.__ell_min, numbers.Integral) # type(self.__ell_min)={0}'.format(
+                 type(self.__ell_min)))
         test(errors,
              isinstance(self.__ell_max, numbers.Integral),
-             'isinstance(self.__ell_max, numbers.Integral) # type(self.__ell_max)={0}'.format(type(self.__ell_max)))
+             lambda: 'isinstance(self.__ell_max, numbers.Integral) # type(self.__ell_max)={0}'.format(
+                 type(self.__ell_max)))
         test(errors,
              self.__ell_min >= 0,
-             'self.__ell_min>=0 # {0}'.format(self.__ell_min))
+             lambda: 'self.__ell_min>=0 # {0}'.format(self.__ell_min))
         test(errors,
              self.__ell_max >= self.__ell_min - 1,
-             'self.__ell_max>=self.__ell_min-1 # self.__ell_max={0}; self.__ell_min-1={1}'.format(self.__ell_max,
-                                                                                                  self.__ell_min - 1))
+             lambda: 'self.__ell_max>=self.__ell_min-1 # self.__ell_max={0}; self.__ell_min-1={1}'.format(
+                 self.__ell_max, self.__ell_min - 1))
         if alter and not np.array_equal(self.__LM, sf.LM_range(self.ell_min, self.ell_max)):
             self.__LM = sf.LM_range(self.ell_min, self.ell_max)
             alterations += [
@@ -183,15 +220,15 @@ class WaveformModes(WaveformBase):
              'np.array_equal(self.__LM, sf.LM_range(self.ell_min, self.ell_max))')
 
         test(errors,
-             self.data.dtype == np.dtype(np.complex),
-             'self.data.dtype == np.dtype(np.complex) # self.data.dtype={0}'.format(self.data.dtype))
+             self.data.dtype in complex_dtypes,
+             lambda: 'self.data.dtype in complex_dtypes # self.data.dtype={0}'.format(self.data.dtype))
         test(errors,
              self.data.ndim >= 2,
-             'self.data.ndim >= 2 # self.data.ndim={0}'.format(self.data.ndim))
+             lambda: 'self.data.ndim >= 2 # self.data.ndim={0}'.format(self.data.ndim))
         test(errors,
              self.data.shape[1] == self.__LM.shape[0],
-             'self.data.shape[1]==self.__LM.shape[0] '
-             '# self.data.shape={0}; self.__LM.shape[0]={1}'.format(self.data.shape[1], self.__LM.shape[0]))
+             lambda: 'self.data.shape[1]==self.__LM.shape[0] '
+                     '# self.data.shape={0}; self.__LM.shape[0]={1}'.format(self.data.shape[1], self.__LM.shape[0]))
 
         if alterations:
             self._append_history(alterations)
@@ -201,11 +238,13 @@ class WaveformModes(WaveformBase):
             return False
 
         # Call the base class's version
-        super(WaveformModes, self).ensure_validity(alter, assertions)
+        if not super(WaveformModes, self).ensure_validity(alter, assertions, validation_level):
+            return False
 
         self.__history_depth__ -= 1
         self._append_history('WaveformModes.ensure_validity' +
-                             '({0}, alter={1}, assertions={2})'.format(self, alter, assertions))
+                             '({0}, alter={1}, assertions={2}, validation_level={3})'.format(
+                                 self, alter, assertions, validation_level))
 
         return True
 
@@ -315,6 +354,68 @@ class WaveformModes(WaveformBase):
             raise ValueError("Input `ell_m` should be an Nx2 sequence of integers")
         return ell_m[:, 0] * (ell_m[:, 0] + 1) - self.ell_min ** 2 + ell_m[:, 1]
 
+    def derivative(self, engine='spline', order=None, ell_min=None, ell_max=None):
+        """Time derivative of the modes, optionally restricted to a range of ell values
+
+        When only some modes are needed, passing `ell_min` and/or `ell_max` avoids differentiating the others; the
+        result then has one column for each mode with `ell_min <= ell <= ell_max`, in the usual order.  Results are
+        cached separately for each range.  See `WaveformBase.derivative` for the other parameters and for details of
+        the caching.
+
+        """
+        if ell_min is None and ell_max is None:
+            return super(WaveformModes, self).derivative(engine, order)
+        ell_min = self.ell_min if ell_min is None else ell_min
+        ell_max = self.ell_max if ell_max is None else ell_max
+        if not self.ell_min <= ell_min <= ell_max <= self.ell_max:
+            raise ValueError("Requested ell range [{0}, {1}] is not contained in this waveform's range [{2}, {3}]"
+                             .format(ell_min, ell_max, self.ell_min, self.ell_max))
+        i1, i2 = self.index(ell_min, -ell_min), self.index(ell_max, ell_max) + 1
+        return self._cached_derivative(self.data[:, i1:i2], engine, order, (i1, i2))
+
+    def evaluate(self, directions, t_min=None, t_max=None, chunk_size=None):
+        """Values of the waveform in the given directions
+
+        The waveform is evaluated as `sum_{ell,m} data_{ell,m} sY_{ell,m}(theta, phi)`, for all directions at once.
+        The spin-weighted spherical harmonics are computed once for each set of directions (and spin weight and range
+        of ell values), and cached, so that evaluating several waveforms in the same directions reuses the table.
+        The sum is then a matrix product of the data with that table, computed in chunks of time steps to limit the
+        memory used.  Unlike `WaveformGrid.from_modes`, the directions may be arbitrary, rather than an equiangular
+        grid.
+
+        Parameters
+        ----------
+        directions : float array of shape (..., 2)
+            Spherical coordinates (theta, phi) of each direction, measured in the frame of the modes.  Any leading
+            shape is allowed, and preserved in the output.
+        t_min, t_max : float, optional
+            If given, only the time steps with `t_min <= t <= t_max` are evaluated.  These are the time steps
+            `self.t[self.t.searchsorted(t_min):self.t.searchsorted(t_max, side='right')]`.
+        chunk_size : int, optional
+            Number of time steps in each matrix product.  By default, this is chosen so that each product gives about
+            4 million values.
+
+        Returns
+        -------
+        complex array of shape `(n_times,) + directions.shape[:-1]`
+
+        """
+        directions = np.asarray(directions, dtype=float)
+        if directions.shape[-1:] != (2,):
+            raise ValueError("Input `directions` must have shape (..., 2); got {0}".format(directions.shape))
+        i1 = 0 if t_min is None else self.t.searchsorted(t_min)
+        i2 = self.n_times if t_max is None else self.t.searchsorted(t_max, side='right')
+        rotors = quaternion.from_spherical_coords(directions[..., 0].ravel(), directions[..., 1].ravel())
+        table = _swsh_table(self.spin_weight, self.ell_min, self.ell_max, rotors)
+        if chunk_size is None:
+            chunk_size = max(1, _evaluation_chunk_elements // max(1, table.shape[1]))
+        chunk_size = max(1, int(chunk_size))
+        values = np.empty((max(0, i2 - i1), table.shape[1]), dtype=np.result_type(self.data.dtype, table.dtype))
+        for j1 in range(i1, i2, chunk_size):
+            j2 = min(j1 + chunk_size, i2)
+            np.dot(self.data[j1:j2], table, out=values[j1 - i1:j2 - i1])
+        return values.reshape((values.shape[0],) + directions.shape[:-1])
+
     # Involutions
     @property
     @waveform_alterations
@@ -539,6 +640,141 @@ class WaveformModes(WaveformBase):
         """Norm of parity-antisymmetric component divided by norm of waveform"""
         return np.sqrt(self.parity_antisymmetric_part.norm() / self.norm())
 
+    @waveform_alterations
+    def compress(self, tolerance=1e-8, scheme='cubic'):
+        """Return a copy of this waveform on a reduced set of time steps
+
+        The returned waveform contains only a subset of the original time steps, chosen so that interpolating it back
+        onto the original times -- as in `W.compress(tol).interpolate(W.t)` -- reproduces every mode (and the frame,
+        if it is time dependent) to within `tolerance` at every original time step.  This typically reduces the size
+        of slowly varying data like the inspiral portion of a waveform by orders of magnitude, which correspondingly
+        reduces storage and loading time when the result is written with (for example) `scri.SpEC.write_to_h5`.
+
+        The subset is chosen greedily.  Starting from a few evenly spaced samples, the retained samples are
+        interpolated onto the original times, and the sample with the largest error in each interval between retained
+        samples is added wherever that error exceeds `tolerance`.  This is repeated until no error exceeds
+        `tolerance`.  Because each step can add one sample to every interval, the number of iterations grows only
+        logarithmically with the number of retained samples.  If the tolerance is too small to be met because of
+        round-off error, a warning is issued and all the samples added so far are returned.
+
+        Parameters
+        ----------
+        tolerance : float, optional
+            Maximum absolute error allowed in any mode (or frame component) at any original time.  Default is 1e-8.
+        scheme : {'cubic', 'hermite', 'linear'}, optional
+            Interpolation scheme that will be used to reconstruct the data; see `WaveformBase.interpolate`.  Schemes
+            requiring uniform time steps cannot be used.  Default is 'cubic'.
+
+        """
+        from .interpolation import InterpolationPlan, interpolate_frame
+        import quaternion
+        minimum_sizes = {'linear': 2, 'hermite': 3, 'cubic': 4}
+        if scheme not in minimum_sizes:
+            raise ValueError("Compression scheme must be one of {0}; got '{1}'".format(sorted(minimum_sizes), scheme))
+        n_times = self.n_times
+        compress_frame = (self.frame.size == n_times)
+        if n_times <= minimum_sizes[scheme] + 1:
+            indices = np.arange(n_times)
+        else:
+            indices = np.unique(np.round(np.linspace(0, n_times - 1, num=minimum_sizes[scheme] + 1)).astype(int))
+            if compress_frame:
+                frame = quaternion.as_float_array(self.frame)
+            while True:
+                t = self.t[indices]
+                error = InterpolationPlan(t, self.t, scheme)(self.data[indices]) - self.data
+                error = np.max(np.abs(error.reshape((n_times, -1))), axis=1)
+                if compress_frame:
+                    frame_error = quaternion.as_float_array(interpolate_frame(self.frame[indices], t, self.t, scheme))
+                    error = np.maximum(error, np.max(np.abs(frame_error - frame), axis=1))
+                bad = np.flatnonzero(error > tolerance)
+                if bad.size == 0:
+                    break
+                # Errors at retained samples are only round-off, which adding samples cannot reduce
+                bad = np.setdiff1d(bad, indices, assume_unique=True)
+                if bad.size == 0:
+                    warnings.warn("Compression cannot meet tolerance={0}, which is below the round-off error of "
+                                  "interpolation; returning {1} of {2} time steps".format(tolerance, indices.size,
+                                                                                          n_times))
+                    break
+                # Find the worst offending sample within each interval between retained samples
+                intervals = np.searchsorted(indices, bad, side='right')
+                order = np.lexsort((-error[bad], intervals))
+                worst = np.ones(order.size, dtype=bool)
+                worst[1:] = (intervals[order][1:] != intervals[order][:-1])
+                indices = np.union1d(indices, bad[order][worst])
+        W = self.copy_without_data()
+        W.t = self.t[indices]
+        W.frame = self.frame[indices] if compress_frame else np.copy(self.frame)
+        W.data = self.data[indices]
+        W.ells = self.ells
+        W.__history_depth__ -= 1
+        W._append_history('{0} = {1}.compress(tolerance={2}, scheme={3!r})  # {4} of {5} time steps retained'.format(
+            W, self, tolerance, scheme, W.n_times, n_times))
+        return W
+
+    def mode_power(self):
+        """Integrated power in each mode, relative to the integrated `norm()` of the waveform
+
+        The power in each mode is the integral over time of the squared magnitude of that mode's data, computed with
+        the trapezoidal rule on the waveform's time steps (or simply the squared magnitude, if there is only one time
+        step).  The returned array has one element per mode, in the same order as `LM`, and sums to 1 (unless the
+        waveform is identically zero, in which case all elements are 0).  Sorting this array -- as in
+        `W.LM[np.argsort(W.mode_power())[::-1]]` -- ranks the modes by importance.
+
+        """
+        power = np.abs(self.data) ** 2
+        if self.n_times > 1:
+            power = np.trapz(power, self.t, axis=0)
+            total = np.trapz(self.norm(), self.t)
+        else:
+            power = np.sum(power, axis=0)
+            total = np.sum(self.norm())
+        if total == 0.0:
+            return np.zeros(self.n_modes, dtype=float)
+        return power / total
+
+    def ell_power_spectrum(self):
+        """Integrated power in each ell, relative to the integrated `norm()` of the waveform
+
+        Returns an array whose element `i` is the sum of `mode_power()` over all modes with `ell = ell_min + i`.
+
+        """
+        power = self.mode_power()
+        return np.array([np.sum(power[ell ** 2 - self.ell_min ** 2:(ell + 1) ** 2 - self.ell_min ** 2])
+                         for ell in range(self.ell_min, self.ell_max + 1)])
+
+    def ell_max_for_power(self, threshold):
+        """Smallest `ell_max` such that the relative power in all higher ells is at most `threshold`
+
+        See `ell_power_spectrum` for the definition of the relative power.
+
+        """
+        spectrum = self.ell_power_spectrum()
+        # Element `i` of `tail` is the total relative power in ells above `ell_min + i`
+        tail = np.append(np.cumsum(spectrum[::-1])[::-1][1:], 0.0)
+        return self.ell_min + int(np.argmax(tail <= threshold))
+
+    @waveform_alterations
+    def truncate_ell_max(self, threshold):
+        """Return waveform with the modes above some ell removed, discarding relative power at most `threshold`
+
+        The new `ell_max` is given by `ell_max_for_power(threshold)`; the data are obtained by slicing, as in
+        `W[:, :ell_max+1]`, so the result shares memory with this waveform until either is modified.  Since the cost
+        of rotations, transformations to grids, and so on increases rapidly with `ell_max`, this can speed up
+        subsequent processing substantially when the higher modes are below the level of numerical noise.
+
+        Parameters
+        ----------
+        threshold : float
+            Maximum allowed relative power (see `ell_power_spectrum`) in the discarded modes.
+
+        """
+        ell_max = self.ell_max_for_power(threshold)
+        W = self[:, :ell_max + 1]
+        W.__history_depth__ -= 1
+        W._append_history('{0} = {1}.truncate_ell_max({2})  # ell_max={3}'.format(W, self, threshold, ell_max))
+        return W
+
     @waveform_alterations
     def copy_without_data(self):
         W = super(WaveformModes, self).copy_without_data()
@@ -0,0 +1,459 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import quaternion
+import spherical_functions as sf
+from . import (WaveformModes, FrameNames, DataNames, UnknownDataType, SpinWeights, Inertial)
+from .history import WaveformHistory
+from .waveform_base import (complex_dtypes, complex_array_norm, complex_array_abs, complex_array_norm_parallel,
+                            complex_array_abs_parallel, _record_shared_data, _release_shared_data)
+from .parallel import select
+from .interpolation import interpolation_plan, interpolate_frame
+from .differentiation import derivative as differentiate, derivative_plan
+
+
+class WaveformModesBatch(object):
+    """Collection of many waveforms sharing a common set of times and modes
+
+    This object stores `K` waveforms with identical time steps `t` and mode range `ell_min <= ell <= ell_max` in a
+    single array of shape `(K, n_times, n_modes)`.  Operations that act independently at each instant of time --
+    norms, rotations, parity operations, and the quantities used to compute the angular velocity -- are applied to
+    the whole batch by viewing the data as a single `(K*n_times, n_modes)` array, so that each operation is a single
+    call to the same compiled kernel used for one `WaveformModes` object.  Interpolation transforms all waveforms with
+    a single spline plan.  This removes the per-waveform Python and dispatch overhead that dominates catalog-scale
+    analyses of many short or moderately sized waveforms.
+
+    All the waveforms in a batch share the descriptive attributes `frameType`, `dataType`, `r_is_scaled_out`, and
+    `m_is_scaled_out`.  The frame data are either empty or have shape `(K, n_times)`.
+
+    Individual waveforms can be extracted as `WaveformModes` objects by indexing with an integer, and sub-batches by
+    indexing with a slice or array of indices.  A batch is most easily constructed from a sequence of `WaveformModes`
+    objects with `WaveformModesBatch.from_waveforms`.
+
+    Attributes
+    ----------
+    t : float array
+        Time steps shared by all waveforms
+    frame : quaternion array
+        Either empty, or of shape `(K, n_times)` giving the frame of each waveform at each time
+    data : 3-d complex array
+        Mode data of shape `(K, n_times, n_modes)`, with modes in the standard order
+    ell_min, ell_max : int
+        Range of ell values present in the data
+    history : WaveformHistory
+        Record of the operations applied to the batch
+    frameType, dataType : int
+    r_is_scaled_out, m_is_scaled_out : bool
+        As in `WaveformModes`
+
+    """
+
+    _num_counter = 0
+
+    def __init__(self, t=None, frame=None, data=None, ell_min=0, ell_max=-1, history=None,
+                 frameType=Inertial, dataType=UnknownDataType, r_is_scaled_out=True, m_is_scaled_out=True):
+        self._num = WaveformModesBatch._num_counter
+        WaveformModesBatch._num_counter += 1
+        self.t = np.empty((0,), dtype=float) if t is None else np.asarray(t, dtype=float)
+        self.data = np.empty((0, self.t.size, 0), dtype=complex) if data is None else np.ascontiguousarray(data)
+        self.frame = np.empty((0,), dtype=np.quaternion) if frame is None else np.asarray(frame)
+        self.ell_min = ell_min
+        self.ell_max = ell_max
+        self.history = WaveformHistory([] if history is None else history)
+        self.frameType = frameType
+        self.dataType = dataType
+        self.r_is_scaled_out = r_is_scaled_out
+        self.m_is_scaled_out = m_is_scaled_out
+        if self.data.ndim != 3:
+            raise ValueError("Input `data` must be 3-d; got data.shape={0}".format(self.data.shape))
+        if self.data.dtype not in complex_dtypes:
+            raise TypeError("Input `data` must be complex; got data.dtype={0}".format(self.data.dtype))
+        if self.data.shape[1] != self.t.size:
+            raise ValueError("Second dimension of `data` must match `t`; "
+                             "got data.shape={0} and t.shape={1}".format(self.data.shape, self.t.shape))
+        if self.data.shape[2] != self.n_modes:
+            raise ValueError("Third dimension of `data` must equal the number of modes {0} for ell_min={1}, "
+                             "ell_max={2}; got data.shape={3}".format(self.n_modes, ell_min, ell_max, self.data.shape))
+        if self.frame.size and self.frame.shape != self.data.shape[:2]:
+            raise ValueError("Input `frame` must be empty or have shape {0}; "
+                             "got frame.shape={1}".format(self.data.shape[:2], self.frame.shape))
+
+    @classmethod
+    def from_waveforms(cls, waveforms, t=None):
+        """Collect a sequence of `WaveformModes` objects into a batch
+
+        Parameters
+        ----------
+        waveforms : sequence of WaveformModes
+            All must have the same `ell_min`, `ell_max`, `frameType`, `dataType`, `r_is_scaled_out`, and
+            `m_is_scaled_out`.  Their frames must either all be empty or all be time dependent.
+        t : float array, optional
+            If given, each waveform is interpolated onto these times first.  Otherwise, all waveforms must already
+            have identical time steps.
+
+        """
+        waveforms = list(waveforms)
+        if not waveforms:
+            raise ValueError("Cannot construct a batch from an empty sequence of waveforms")
+        w0 = waveforms[0]
+        for w in waveforms[1:]:
+            if (w.ell_min, w.ell_max) != (w0.ell_min, w0.ell_max):
+                raise ValueError("All waveforms must have the same ell range; got ({0}, {1}) and ({2}, {3})".format(
+                    w0.ell_min, w0.ell_max, w.ell_min, w.ell_max))
+            for attribute in ['frameType', 'dataType', 'r_is_scaled_out', 'm_is_scaled_out']:
+                if getattr(w, attribute) != getattr(w0, attribute):
+                    raise ValueError("All waveforms must have the same `{0}`".format(attribute))
+        if t is not None:
+            t = np.asarray(t, dtype=float)
+            waveforms = [w if np.array_equal(w.t, t) else w.interpolate(t) for w in waveforms]
+        else:
+            t = w0.t
+            for w in waveforms[1:]:
+                if not np.array_equal(w.t, t):
+                    raise ValueError("All waveforms must have identical time steps; "
+                                     "pass `t` to interpolate them onto common times")
+        data = np.array([w.data for w in waveforms])
+        frame_sizes = set(w.frame.size for w in waveforms)
+        if frame_sizes == {0}:
+            frame = None
+        elif frame_sizes == {t.size}:
+            frame = np.array([w.frame for w in waveforms])
+        else:
+            raise ValueError("Frames must either all be empty or all have one element per time step")
+        history = ['{0}.from_waveforms([{1}])'.format(cls.__name__, ', '.join(str(w) for w in waveforms))]
+        return cls(t=t, frame=frame, data=data, ell_min=w0.ell_min, ell_max=w0.ell_max, history=history,
+                   frameType=w0.frameType, dataType=w0.dataType,
+                   r_is_scaled_out=w0.r_is_scaled_out, m_is_scaled_out=w0.m_is_scaled_out)
+
+    def _with(self, history_line, **kwargs):
+        """Return new batch with the same attributes as this one, except as given in `kwargs`"""
+        attributes = dict(t=self.t, frame=self.frame, data=self.data, ell_min=self.ell_min, ell_max=self.ell_max,
+                          history=self.history + [history_line], frameType=self.frameType, dataType=self.dataType,
+                          r_is_scaled_out=self.r_is_scaled_out, m_is_scaled_out=self.m_is_scaled_out)
+        attributes.update(kwargs)
+        return type(self)(**attributes)
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    @property
+    def n_waveforms(self):
+        return self.data.shape[0]
+
+    @property
+    def n_times(self):
+        return self.t.size
+
+    @property
+    def n_modes(self):
+        return self.ell_max * (self.ell_max + 2) - self.ell_min ** 2 + 1
+
+    @property
+    def LM(self):
+        return sf.LM_range(self.ell_min, self.ell_max)
+
+    @property
+    def spin_weight(self):
+        return SpinWeights[self.dataType]
+
+    @property
+    def data_2d(self):
+        """View of the data with all waveforms' time steps stacked, of shape (K*n_times, n_modes)"""
+        return self.data.reshape((-1, self.data.shape[2]))
+
+    @property
+    def data_dot(self):
+        """Time derivative of the data for every waveform, with the default engine of `scri.differentiation`"""
+        return np.ascontiguousarray(differentiate(self.t, self.data.transpose((1, 0, 2))).transpose((1, 0, 2)))
+
+    def __getitem__(self, key):
+        """Return a single waveform (for integer `key`) or a sub-batch (for slices or index arrays)"""
+        if isinstance(key, (int, np.integer)):
+            # The waveform gets its own copy of the data, so that altering it in place does not alter this batch
+            return WaveformModes(t=self.t, frame=(np.copy(self.frame[key]) if self.frame.size else None),
+                                 data=np.copy(self.data[key]),
+                                 ell_min=self.ell_min, ell_max=self.ell_max,
+                                 history=self.history + ['# Extracted waveform {0} from {1}'.format(key, self)],
+                                 frameType=self.frameType, dataType=self.dataType,
+                                 r_is_scaled_out=self.r_is_scaled_out, m_is_scaled_out=self.m_is_scaled_out)
+        B = self._with('B = {0}[{1}]'.format(self, key), data=self.data[key],
+                       frame=(self.frame[key] if self.frame.size else self.frame))
+        if np.may_share_memory(B.data, self.data):
+            _record_shared_data(self, B)
+        return B
+
+    def _copy_on_write(self):
+        """Ensure that `data` is not shared with a sub-batch (or its parent) before it is altered in place
+
+        This follows the same rule as `WaveformBase._copy_on_write`: slicing a batch does not copy its data, but both
+        batches are recorded as sharing it, and methods that alter `data` in place call this first.  The data are
+        replaced by a copy only if another batch sharing them is still alive.
+
+        """
+        if _release_shared_data(self):
+            self.data = np.copy(self.data)
+
+    def __iter__(self):
+        for k in range(self.n_waveforms):
+            yield self[k]
+
+    def norm(self, take_sqrt=False):
+        """L2 norm of each waveform at each time, as an array of shape (K, n_times)"""
+        n = np.empty((self.n_waveforms * self.n_times,), dtype=float)
+        if take_sqrt:
+            select(complex_array_abs, complex_array_abs_parallel, n.size)(self.data_2d, n)
+        else:
+            select(complex_array_norm, complex_array_norm_parallel, n.size)(self.data_2d, n)
+        return n.reshape((self.n_waveforms, self.n_times))
+
+    def max_norm_index(self, skip_fraction_of_data=4):
+        """Index of the time step with largest norm for each waveform; see `WaveformModes.max_norm_index`"""
+        if skip_fraction_of_data == 0 or skip_fraction_of_data == 1:
+            i0 = 0
+        else:
+            i0 = self.n_times // skip_fraction_of_data
+        return np.argmax(self.norm()[:, i0:], axis=1) + i0
+
+    def max_norm_time(self, skip_fraction_of_data=4):
+        """Time at which the largest norm occurs for each waveform; see `WaveformModes.max_norm_index`"""
+        return self.t[self.max_norm_index(skip_fraction_of_data=skip_fraction_of_data)]
+
+    def interpolate(self, tprime, scheme='cubic', width=None):
+        """Interpolate all waveforms onto new time steps with a single interpolation plan
+
+        See `WaveformModes.interpolate` for the meaning of the parameters.
+
+        """
+        tprime = np.array(tprime, dtype=float)
+        plan = interpolation_plan(self.t, tprime, scheme, width)
+        data = np.ascontiguousarray(plan(self.data.transpose((1, 0, 2))).transpose((1, 0, 2)))
+        frame = self.frame
+        if frame.size:
+            frame = np.ascontiguousarray(interpolate_frame(frame.T, self.t, tprime, scheme).T)
+        return self._with('B = {0}.interpolate({1}, scheme={2!r})'.format(self, tprime, scheme),
+                          t=tprime, frame=frame, data=data)
+
+    def rotate_decomposition_basis(self, R_basis):
+        """Rotate the decomposition basis of every waveform in place
+
+        `R_basis` may be a single quaternion applied to every waveform at every time, an array of shape `(n_times,)`
+        applied to every waveform, or an array of shape `(K, n_times)` with a separate rotor for each waveform at each
+        time.  In each case, the whole batch is rotated with a single kernel call.  The frame data are updated as in
+        `WaveformModes.rotate_decomposition_basis`.
+
+        """
+        from .rotations import (_rotate_decomposition_basis_by_constant, _rotate_decomposition_basis_by_series,
+                                _rotate_decomposition_basis_by_constant_parallel,
+                                _rotate_decomposition_basis_by_series_parallel)
+        # The data are altered in place below, so make sure they are not shared with another batch
+        self._copy_on_write()
+        n = self.n_waveforms * self.n_times
+        D = np.empty((sf.WignerD._total_size_D_matrices(self.ell_min, self.ell_max),), dtype=complex)
+        data = self.data_2d
+        if isinstance(R_basis, np.quaternion):
+            sf._Wigner_D_matrices(R_basis.a, R_basis.b, self.ell_min, self.ell_max, D)
+            tmp = np.empty((2 * self.ell_max + 1,), dtype=complex)
+            select(_rotate_decomposition_basis_by_constant, _rotate_decomposition_basis_by_constant_parallel, n)(
+                data, self.ell_min, self.ell_max, D, tmp)
+            R_basis_2d = np.full(self.data.shape[:2], R_basis, dtype=np.quaternion)
+        else:
+            R_basis = np.asarray(R_basis)
+            if R_basis.shape == (self.n_times,):
+                R_basis_2d = np.tile(R_basis, (self.n_waveforms, 1))
+            elif R_basis.shape == self.data.shape[:2]:
+                R_basis_2d = R_basis
+            else:
+                raise ValueError("Input dimension mismatch.  R_basis.shape={0}; expected {1} or {2}".format(
+                    R_basis.shape, (self.n_times,), self.data.shape[:2]))
+            select(_rotate_decomposition_basis_by_series, _rotate_decomposition_basis_by_series_parallel, n)(
+                data, quaternion.as_spinor_array(R_basis_2d.ravel()), self.ell_min, self.ell_max, D)
+        if self.frame.size:
+            self.frame = self.frame * R_basis_2d
+        else:
+            self.frame = np.copy(R_basis_2d)
+        self.history.append('{0}.rotate_decomposition_basis({1})'.format(self, R_basis))
+        return self
+
+    def LdtVector(self):
+        """<Ldt> vector for every waveform, as an array of shape (K, n_times, 3); see `scri.LdtVector`"""
+        from .mode_calculations import _LdtVector, _LdtVector_parallel
+        Ldt = np.zeros((self.n_waveforms * self.n_times, 3), dtype=float)
+        data_dot = self.data_dot.reshape(self.data_2d.shape)
+        select(_LdtVector, _LdtVector_parallel, Ldt.shape[0])(self.data_2d, data_dot, self.LM, Ldt)
+        return Ldt.reshape((self.n_waveforms, self.n_times, 3))
+
+    def LLMatrix(self):
+        """<LL> matrix for every waveform, as an array of shape (K, n_times, 3, 3); see `scri.LLMatrix`"""
+        from .mode_calculations import _LLMatrix, _LLMatrix_parallel
+        LL = np.zeros((self.n_waveforms * self.n_times, 3, 3), dtype=float)
+        select(_LLMatrix, _LLMatrix_parallel, LL.shape[0])(self.data_2d, self.LM, LL)
+        return LL.reshape((self.n_waveforms, self.n_times, 3, 3))
+
+    def _pairs(self, other, all_pairs):
+        """Return the data of both batches, with matching precision, and the array of index pairs to compute"""
+        from .mode_calculations import _matching_precision
+        if other is None:
+            other = self
+        if not np.array_equal(self.t, other.t) or (self.ell_min, self.ell_max) != (other.ell_min, other.ell_max):
+            raise ValueError("Both batches must have the same times and ell range")
+        if all_pairs:
+            pairs = np.array([[i, j] for i in range(self.n_waveforms) for j in range(other.n_waveforms)], dtype=int)
+            shape = (self.n_waveforms, other.n_waveforms)
+        else:
+            if self.n_waveforms != other.n_waveforms:
+                raise ValueError("Batches have different numbers of waveforms ({0} and {1}); use `all_pairs=True` "
+                                 "to compare every pair".format(self.n_waveforms, other.n_waveforms))
+            pairs = np.array([[i, i] for i in range(self.n_waveforms)], dtype=int)
+            shape = (self.n_waveforms,)
+        data1, data2 = _matching_precision(self.data, other.data)
+        return data1, data2, pairs.reshape((-1, 2)), shape
+
+    def LVector(self, other=None, all_pairs=False):
+        """<L> vector for pairs of waveforms; see `scri.LVector`
+
+        If `all_pairs` is False, the result has shape (K, n_times, 3), and element `k` is `LVector(self[k],
+        other[k])`.  If `all_pairs` is True, the result has shape (K1, K2, n_times, 3), and element `[i, j]` is
+        `LVector(self[i], other[j])`.  By default, `other` is this batch.  Every pair is computed in a single pass
+        over the time steps, with the ladder-operator coefficients computed once.
+
+        """
+        from .mode_calculations import _LVector_pairs, _LVector_pairs_parallel, _ladder_coefficients
+        data1, data2, pairs, shape = self._pairs(other, all_pairs)
+        ladder_plus, ladder_minus = _ladder_coefficients(self.LM)
+        L = np.zeros((pairs.shape[0], self.n_times, 3), dtype=complex)
+        select(_LVector_pairs, _LVector_pairs_parallel, L.shape[0] * L.shape[1])(
+            data1, data2, pairs, self.LM, ladder_plus, ladder_minus, L)
+        return L.reshape(shape + (self.n_times, 3))
+
+    def LLComparisonMatrix(self, other=None, all_pairs=False):
+        """<LL> matrix for pairs of waveforms; see `scri.LLComparisonMatrix`
+
+        The pairs are chosen as in `LVector`, so the result has shape (K, n_times, 3, 3) or (K1, K2, n_times, 3, 3).
+
+        """
+        from .mode_calculations import (_LLComparisonMatrix_pairs, _LLComparisonMatrix_pairs_parallel,
+                                        _ladder_coefficients)
+        data1, data2, pairs, shape = self._pairs(other, all_pairs)
+        ladder_plus, ladder_minus = _ladder_coefficients(self.LM)
+        LL = np.zeros((pairs.shape[0], self.n_times, 3, 3), dtype=complex)
+        select(_LLComparisonMatrix_pairs, _LLComparisonMatrix_pairs_parallel, LL.shape[0] * LL.shape[1])(
+            data1, data2, pairs, self.LM, ladder_plus, ladder_minus, LL)
+        return LL.reshape(shape + (self.n_times, 3, 3))
+
+    def angular_velocity(self):
+        """Angular velocity of every waveform, as an array of shape (K, n_times, 3); see `scri.angular_velocity`
+
+        As for a single waveform, this makes a single pass over the data of the whole batch, evaluating the time
+        derivative from spline coefficients as needed, and instants at which `<LL>` is singular give NaN.
+
+        """
+        import scipy.sparse
+        from .mode_calculations import _angular_velocity, _angular_velocity_parallel, _ladder_coefficients
+        plan = derivative_plan(self.t, 'spline')
+        coefficients = plan.spline_coefficients(self.data.transpose((1, 0, 2))).transpose((1, 0, 2))
+        coefficients = np.ascontiguousarray(coefficients).reshape((-1, self.n_modes))
+        # Each waveform's time steps use the derivative operator on that waveform's block of coefficients
+        matrix = scipy.sparse.block_diag([plan.matrix] * self.n_waveforms, format='csr')
+        lm = self.LM
+        ladder_plus, ladder_minus = _ladder_coefficients(lm)
+        omega = np.empty((self.n_waveforms * self.n_times, 3), dtype=float)
+        select(_angular_velocity, _angular_velocity_parallel, omega.shape[0])(
+            self.data_2d, coefficients, matrix.indptr, matrix.indices, matrix.data, lm, ladder_plus, ladder_minus,
+            omega)
+        return omega.reshape((self.n_waveforms, self.n_times, 3))
+
+    def _parity_map(self, kind):
+        """Return (source, sign) such that conjugated data are `sign * conj(data[..., source])`"""
+        s = self.spin_weight
+        LM = self.LM
+        ell, m = LM[:, 0], LM[:, 1]
+        source = np.arange(self.n_modes)
+        if kind == 'x':
+            sign = np.where(m % 2 == 0, 1.0, -1.0)
+        elif kind == 'y':
+            sign = np.ones(self.n_modes)
+        elif kind == 'z':
+            source = ell ** 2 - self.ell_min ** 2 + ell - m
+            sign = np.where((ell + s) % 2 == 0, 1.0, -1.0)
+        else:
+            source = ell ** 2 - self.ell_min ** 2 + ell - m
+            sign = np.where((ell + s + m) % 2 == 0, 1.0, -1.0)
+        return source, sign
+
+    def _parity(self, kind, part):
+        if self.dataType == UnknownDataType:
+            raise ValueError("Cannot compute parity type for {0}.".format(DataNames[self.dataType]))
+        prefix = '' if kind == 'full' else kind + '_'
+        source, sign = self._parity_map(kind)
+        conjugate = (sign * np.conjugate(self.data[:, :, source])).astype(self.data.dtype, copy=False)
+        if part == 'conjugate':
+            data = conjugate
+        elif part == 'symmetric_part':
+            data = 0.5 * (self.data + conjugate)
+        else:
+            data = 0.5 * (self.data - conjugate)
+        frame = getattr(np, prefix + 'parity_' + part)(self.frame) if self.frame.size else self.frame
+        return self._with('B = {0}.{1}parity_{2}'.format(self, prefix, part), data=data, frame=frame)
+
+    @property
+    def x_parity_conjugate(self):
+        """Reflect modes of every waveform across y-z plane; see `WaveformModes.x_parity_conjugate`"""
+        return self._parity('x', 'conjugate')
+
+    @property
+    def x_parity_symmetric_part(self):
+        return self._parity('x', 'symmetric_part')
+
+    @property
+    def x_parity_antisymmetric_part(self):
+        return self._parity('x', 'antisymmetric_part')
+
+    @property
+    def y_parity_conjugate(self):
+        """Reflect modes of every waveform across x-z plane; see `WaveformModes.y_parity_conjugate`"""
+        return self._parity('y', 'conjugate')
+
+    @property
+    def y_parity_symmetric_part(self):
+        return self._parity('y', 'symmetric_part')
+
+    @property
+    def y_parity_antisymmetric_part(self):
+        return self._parity('y', 'antisymmetric_part')
+
+    @property
+    def z_parity_conjugate(self):
+        """Reflect modes of every waveform across x-y plane; see `WaveformModes.z_parity_conjugate`"""
+        return self._parity('z', 'conjugate')
+
+    @property
+    def z_parity_symmetric_part(self):
+        return self._parity('z', 'symmetric_part')
+
+    @property
+    def z_parity_antisymmetric_part(self):
+        return self._parity('z', 'antisymmetric_part')
+
+    @property
+    def parity_conjugate(self):
+        """Reflect modes of every waveform along all axes; see `WaveformModes.parity_conjugate`"""
+        return self._parity('full', 'conjugate')
+
+    @property
+    def parity_symmetric_part(self):
+        return self._parity('full', 'symmetric_part')
+
+    @property
+    def parity_antisymmetric_part(self):
+        return self._parity('full', 'antisymmetric_part')
+
+    def __str__(self):
+        return '{0}_{1}'.format(type(self).__name__, self._num)
+
+    def __repr__(self):
+        return ("# WaveformModesBatch of {0} waveforms; n_times={1}, ell_min={2}, ell_max={3}, frameType={4}, "
+                "dataType={5}".format(self.n_waveforms, self.n_times, self.ell_min, self.ell_max,
+                                      FrameNames[self.frameType], DataNames[self.dataType]))
@@ -0,0 +1,300 @@
+# Copyright (c) 2015, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/scri/blob/master/LICENSE>
+
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import scipy.fft
+import spherical_functions as sf
+from . import WaveformModes, FrameNames, DataNames, UnknownDataType, Inertial
+from .history import WaveformHistory
+from .waveform_base import complex_dtypes
+from .interpolation import _uniform_spacing, _plan_cache
+from .parallel import get_parallel, get_num_threads
+
+
+def _fft_workers():
+    """Number of threads used by the FFTs, following the settings of `scri.parallel`"""
+    return get_num_threads() if get_parallel() else 1
+
+
+def taper_window(n_times, n_start, n_end):
+    """Window rising from 0 to 1 over the first `n_start` samples and falling back to 0 over the last `n_end`
+
+    The ramps are half periods of a cosine (as in a Tukey window).  The first and last samples of each ramp are
+    exactly 0 and 1, respectively, so a ramp of length 0 or 1 does not alter the data.
+
+    """
+    window = np.ones(n_times)
+    if n_start > 1:
+        window[:n_start] = 0.5 - 0.5 * np.cos(np.pi * np.arange(n_start) / (n_start - 1))
+    if n_end > 1:
+        window[n_times - n_end:] *= 0.5 + 0.5 * np.cos(np.pi * np.arange(n_end) / (n_end - 1))
+    return window
+
+
+class FourierPlan(object):
+    """Precomputed transform between uniformly sampled data and its Fourier transform
+
+    The forward transform tapers the data, zero-pads it, and approximates the continuous Fourier transform
+    `h~(f) = integral of h(t) * exp(-2*pi*i*f*t) dt` by a discrete sum over the samples at times `t0 + dt*k`, so the
+    result does not depend on the sampling beyond the usual discretization error -- and shifting the times `t` by
+    `delta` multiplies the result by `exp(-2*pi*i*f*delta)`.  The frequencies are in cycles per unit time, arranged in
+    increasing order (negative frequencies first).  Every column of the data is transformed with a single batched
+    FFT, using as many threads as the kernels of `scri.parallel` do.  Plans are usually obtained through
+    `fourier_plan`, which caches them.
+
+    Parameters
+    ----------
+    n_times : int
+        Number of time samples.
+    dt : float
+        Time step.
+    t0 : float, optional
+        Time of the first sample.  Default is 0.
+    taper_start, taper_end : float, optional
+        Fractions of the total duration over which the data are smoothly tapered to zero at the start and end.
+        Default is 0.
+    padding_factor : float, optional
+        The data are padded with zeros to at least this many times their length (and then to the next length for
+        which the FFT is efficient).  Larger values interpolate the transform onto finer frequency steps.  Default
+        is 1.
+
+    """
+
+    def __init__(self, n_times, dt, t0=0.0, taper_start=0.0, taper_end=0.0, padding_factor=1.0):
+        if padding_factor < 1:
+            raise ValueError("Padding factor must be at least 1; got {0}".format(padding_factor))
+        if not (0 <= taper_start and 0 <= taper_end and taper_start + taper_end <= 1):
+            raise ValueError("Taper fractions must be nonnegative, with a sum of at most 1; got {0} and {1}".format(
+                taper_start, taper_end))
+        self.n_times = n_times
+        self.dt = dt
+        self.t0 = t0
+        self.n_fft = scipy.fft.next_fast_len(int(np.ceil(padding_factor * n_times)))
+        self.window = taper_window(n_times, int(round(taper_start * n_times)), int(round(taper_end * n_times)))
+        self.frequencies = scipy.fft.fftshift(scipy.fft.fftfreq(self.n_fft, dt))
+        self.phase = dt * np.exp(-2j * np.pi * self.frequencies * t0)
+
+    def forward(self, data):
+        """Fourier transform of `data`, whose first dimension must have length `n_times`"""
+        window = self.window.reshape((-1,) + (1,) * (data.ndim - 1))
+        transform = scipy.fft.fft(data * window, n=self.n_fft, axis=0, workers=_fft_workers())
+        return scipy.fft.fftshift(transform, axes=0) * self.phase.reshape((-1,) + window.shape[1:])
+
+    def inverse(self, data, frequency_indices=slice(None)):
+        """Inverse Fourier transform of `data`, given at `frequencies[frequency_indices]`
+
+        Frequencies not included in `data` are taken to be zero.  The result has first dimension `n_times`; any
+        padding is removed, but the taper is not undone.
+
+        """
+        full = np.zeros((self.n_fft,) + data.shape[1:], dtype=complex)
+        full[frequency_indices] = data / self.phase[frequency_indices].reshape((-1,) + (1,) * (data.ndim - 1))
+        return scipy.fft.ifft(scipy.fft.ifftshift(full, axes=0), axis=0, workers=_fft_workers())[:self.n_times]
+
+
+def fourier_plan(n_times, dt, t0=0.0, taper_start=0.0, taper_end=0.0, padding_factor=1.0):
+    """Return a `FourierPlan` with the given parameters, reusing a cached plan if possible"""
+    key = ('fourier', n_times, dt, t0, taper_start, taper_end, padding_factor)
+    plan = _plan_cache.get(key)
+    if plan is None:
+        plan = FourierPlan(n_times, dt, t0, taper_start, taper_end, padding_factor)
+        _plan_cache.put(key, plan)
+    return plan
+
+
+class WaveformModesFT(object):
+    """Fourier transform of the modes of a waveform
+
+    This object holds the Fourier transform in time of each (ell, m) mode of a `WaveformModes` object, as an array of
+    shape `(n_frequencies, n_modes)` with modes in the standard order.  Because the modes are complex, both positive
+    and negative frequencies are present.  It is usually created with `WaveformModesFT.from_waveform`, which
+    resamples the waveform onto uniform time steps, tapers it, zero-pads it, and transforms all modes with a single
+    batched FFT; see `FourierPlan` for the conventions.  The inverse transform is `to_waveform`.
+
+    Indexing with a slice, an integer array, or a boolean array selects a subset of the frequencies, as does `band`.
+    The inverse transform of such a subset treats the missing frequencies as zero, so this is also a simple way to
+    apply a band-pass filter.
+
+    Attributes
+    ----------
+    f : float array
+        Frequencies (in cycles per unit time) at which the transform is given
+    data : 2-d complex array
+        Transform of each mode at each frequency
+    frequency_indices : int array
+        Indices of `f` within the full set of frequencies of the plan
+    ell_min, ell_max : int
+        Range of ell values present in the data
+    frame : quaternion array
+        Empty, or a single rotor giving the (constant) frame of the original waveform
+    n_times, dt, t0 : int, float, float
+        Size, step, and start of the uniform time grid on which the waveform was sampled
+    taper_start, taper_end, padding_factor : float
+        Parameters of the transform; see `FourierPlan`
+    history : WaveformHistory
+        Record of the operations applied to the data
+    frameType, dataType : int
+    r_is_scaled_out, m_is_scaled_out : bool
+        As in `WaveformModes`
+
+    """
+
+    _num_counter = 0
+
+    def __init__(self, f=None, data=None, frequency_indices=None, ell_min=0, ell_max=-1, frame=None, n_times=0,
+                 dt=1.0, t0=0.0, taper_start=0.0, taper_end=0.0, padding_factor=1.0, history=None,
+                 frameType=Inertial, dataType=UnknownDataType, r_is_scaled_out=True, m_is_scaled_out=True):
+        self._num = WaveformModesFT._num_counter
+        WaveformModesFT._num_counter += 1
+        self.f = np.empty((0,), dtype=float) if f is None else np.asarray(f, dtype=float)
+        self.data = np.empty((self.f.size, 0), dtype=complex) if data is None else np.asarray(data)
+        if frequency_indices is None:
+            frequency_indices = np.arange(self.f.size)
+        self.frequency_indices = np.asarray(frequency_indices, dtype=int)
+        self.ell_min = ell_min
+        self.ell_max = ell_max
+        self.frame = np.empty((0,), dtype=np.quaternion) if frame is None else np.asarray(frame)
+        self.n_times = n_times
+        self.dt = dt
+        self.t0 = t0
+        self.taper_start = taper_start
+        self.taper_end = taper_end
+        self.padding_factor = padding_factor
+        self.history = WaveformHistory([] if history is None else history)
+        self.frameType = frameType
+        self.dataType = dataType
+        self.r_is_scaled_out = r_is_scaled_out
+        self.m_is_scaled_out = m_is_scaled_out
+        if self.data.ndim != 2 or self.data.shape != (self.f.size, self.n_modes):
+            raise ValueError("Input `data` must have shape (n_frequencies, n_modes)={0}; got data.shape={1}".format(
+                (self.f.size, self.n_modes), self.data.shape))
+        if self.data.dtype not in complex_dtypes:
+            raise TypeError("Input `data` must be complex; got data.dtype={0}".format(self.data.dtype))
+        if self.frequency_indices.shape != self.f.shape:
+            raise ValueError("Input `frequency_indices` must have the same shape as `f`")
+        if self.frame.size > 1:
+            raise ValueError("Input `frame` must be empty or contain a single rotor; got frame.shape={0}".format(
+                self.frame.shape))
+
+    @classmethod
+    def from_waveform(cls, W, dt=None, taper_start=0.05, taper_end=0.05, padding_factor=1.0, scheme='cubic'):
+        """Fourier transform all modes of a waveform
+
+        Parameters
+        ----------
+        W : WaveformModes
+            Its frame must be empty or constant; transform to an inertial frame first otherwise.
+        dt : float, optional
+            Time step of the uniform grid on which the transform is computed.  If `W` is already uniformly sampled,
+            this defaults to its time step, and no interpolation is needed; otherwise, it defaults to the smallest
+            time step of `W`.
+        taper_start, taper_end : float, optional
+            Fractions of the duration over which the data are tapered at the start and end.  Default is 0.05 each.
+        padding_factor : float, optional
+            Minimum ratio of the FFT length to the number of time samples.  Default is 1.
+        scheme : str, optional
+            Interpolation scheme used to resample the data; see `WaveformBase.interpolate`.
+
+        """
+        if W.frame.size > 1:
+            raise ValueError("Waveforms with time-dependent frames cannot be Fourier transformed; "
+                             "transform to an inertial frame first")
+        W_dt = _uniform_spacing(W.t)
+        if dt is None:
+            dt = W_dt if W_dt is not None else np.min(np.diff(W.t))
+        if W_dt is None or not np.isclose(W_dt, dt, rtol=1e-10, atol=0):
+            n_times = int(np.floor((W.t[-1] - W.t[0]) / dt * (1 + 1e-12))) + 1
+            W = W.interpolate(W.t[0] + dt * np.arange(n_times), scheme=scheme)
+        plan = fourier_plan(W.n_times, dt, W.t[0], taper_start, taper_end, padding_factor)
+        data = plan.forward(W.data)
+        if W.data.dtype != data.dtype:
+            data = data.astype(W.data.dtype)
+        history = W.history + ['{0}.from_waveform({1}, dt={2}, taper_start={3}, taper_end={4}, padding_factor={5}, '
+                               'scheme={6!r})'.format(cls.__name__, W, dt, taper_start, taper_end, padding_factor,
+                                                      scheme)]
+        return cls(f=plan.frequencies, data=data, ell_min=W.ell_min, ell_max=W.ell_max, frame=np.copy(W.frame),
+                   n_times=W.n_times, dt=dt, t0=W.t[0], taper_start=taper_start, taper_end=taper_end,
+                   padding_factor=padding_factor, history=history, frameType=W.frameType, dataType=W.dataType,
+                   r_is_scaled_out=W.r_is_scaled_out, m_is_scaled_out=W.m_is_scaled_out)
+
+    @property
+    def plan(self):
+        return fourier_plan(self.n_times, self.dt, self.t0, self.taper_start, self.taper_end, self.padding_factor)
+
+    def to_waveform(self):
+        """Inverse Fourier transform, returning a `WaveformModes` object on the uniform time grid `t`
+
+        Frequencies that have been sliced away are treated as zero.  Any taper applied by the forward transform
+        remains in the result.
+
+        """
+        data = self.plan.inverse(self.data, self.frequency_indices)
+        return WaveformModes(t=self.t, frame=self.frame, data=data.astype(self.data.dtype, copy=False),
+                             ell_min=self.ell_min, ell_max=self.ell_max,
+                             history=self.history,
+                             constructor_statement='{0}.to_waveform()'.format(self),
+                             frameType=self.frameType, dataType=self.dataType,
+                             r_is_scaled_out=self.r_is_scaled_out, m_is_scaled_out=self.m_is_scaled_out)
+
+    def _with(self, history_line, **kwargs):
+        """Return new object with the same attributes as this one, except as given in `kwargs`"""
+        attributes = dict(f=self.f, data=self.data, frequency_indices=self.frequency_indices, ell_min=self.ell_min,
+                          ell_max=self.ell_max, frame=self.frame, n_times=self.n_times, dt=self.dt, t0=self.t0,
+                          taper_start=self.taper_start, taper_end=self.taper_end,
+                          padding_factor=self.padding_factor, history=self.history + [history_line],
+                          frameType=self.frameType, dataType=self.dataType,
+                          r_is_scaled_out=self.r_is_scaled_out, m_is_scaled_out=self.m_is_scaled_out)
+        attributes.update(kwargs)
+        return type(self)(**attributes)
+
+    def __getitem__(self, key):
+        """Select a subset of the frequencies, by slice, integer array, or boolean array"""
+        if isinstance(key, (int, np.integer)):
+            key = slice(key, key + 1 if key != -1 else None)
+        return self._with('F = {0}[{1}]'.format(self, key), f=self.f[key], data=self.data[key],
+                          frequency_indices=self.frequency_indices[key])
+
+    def band(self, f_min=0.0, f_max=np.inf):
+        """Select the frequencies with `f_min <= abs(f) <= f_max`"""
+        selection = (np.abs(self.f) >= f_min) & (np.abs(self.f) <= f_max)
+        return self._with('F = {0}.band({1}, {2})'.format(self, f_min, f_max), f=self.f[selection],
+                          data=self.data[selection], frequency_indices=self.frequency_indices[selection])
+
+    def __len__(self):
+        return self.f.size
+
+    @property
+    def n_frequencies(self):
+        return self.f.size
+
+    @property
+    def n_modes(self):
+        return self.ell_max * (self.ell_max + 2) - self.ell_min ** 2 + 1
+
+    @property
+    def LM(self):
+        return sf.LM_range(self.ell_min, self.ell_max)
+
+    def index(self, ell, m):
+        """Index of given (ell,m) mode in the data"""
+        return sf.LM_index(ell, m, self.ell_min)
+
+    @property
+    def df(self):
+        """Frequency step of the full transform"""
+        return 1.0 / (self.plan.n_fft * self.dt)
+
+    @property
+    def t(self):
+        """Uniform times on which the waveform was sampled"""
+        return self.t0 + self.dt * np.arange(self.n_times)
+
+    def __str__(self):
+        return '{0}_{1}'.format(type(self).__name__, self._num)
+
+    def __repr__(self):
+        return ("# WaveformModesFT with {0} frequencies; n_times={1}, dt={2}, ell_min={3}, ell_max={4}, frameType={5}, "
+                "dataType={6}".format(self.n_frequencies, self.n_times, self.dt, self.ell_min, self.ell_max,
+                                      FrameNames[self.frameType], DataNames[self.dataType]))